@@ -0,0 +1,343 @@
+from array import array
+from parser import (
+    Number, String, Boolean, Var, BinOp, UnaryOp,
+    AssignStat, PrintStat, IfStat, ForStat, InputExpr,
+    FunctionDecl, FunctionCall, ExprStat, ReturnStat, ErrorStat
+)
+
+"""
+Flat arena representation of the AST.
+Instead of one object per node, the whole tree is stored in a few parallel typed arrays indexed by node number, so it is
+cheap to allocate, compact in memory and can be saved or shared as plain bytes.
+"""
+
+# Kinds of the nodes. 'Block' is a list of statements, arguments or parameters.
+KINDS = ('Block', 'Number', 'String', 'Boolean', 'Var', 'InputExpr', 'BinOp', 'UnaryOp', 'AssignStat', 'PrintStat',
+         'ReturnStat', 'ExprStat', 'IfStat', 'ForStat', 'FunctionDecl', 'FunctionCall', 'ErrorStat')
+KIND = {name: index for index, name in enumerate(KINDS)}
+
+# Operators of BinOp and UnaryOp ('' for the other nodes)
+OPS = ('', '+', '-', '*', '/', '>', '<', '>=', '<=', '==', '!=', 'and', 'or', 'not')
+OP = {op: index for index, op in enumerate(OPS)}
+
+NONE = -1  # missing child, value or symbol ID
+
+class Arena:
+    """
+    Struct-of-arrays storage of an AST. Every node takes one entry in each array:
+    - kinds: index of the node class in KINDS
+    - ops: index of the operator in OPS
+    - first, second, third: indices of the children, in the order of the dataclass fields
+      (for a Block, first and second are the range of its elements in 'items')
+    - refs: index in 'values' of the literal value or of the identifier name (the line of an ErrorStat)
+    - syms: symbol ID of the identifier
+
+    Layout of the children:
+    - BinOp, UnaryOp, AssignStat, PrintStat, ReturnStat, ExprStat: first = operand/value (second = right operand)
+    - IfStat: condition, true block, false block (NONE without else)
+    - ForStat: start, end, body block (the iterator is the ref/sym of the node)
+    - FunctionDecl: block of the parameters (Var nodes), body block
+    - FunctionCall: block of the arguments
+    The program is the Block at index 'root'.
+    parse(source, arena=True) fills the arena while parsing (see ArenaBuilder), from_tree() converts a dataclass tree.
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.ops = array('B')
+        self.first = array('i')
+        self.second = array('i')
+        self.third = array('i')
+        self.refs = array('i')
+        self.syms = array('i')
+        self.items = array('i')
+        self.values = []
+        self.value_index = {}
+        self.root = NONE
+
+    def __len__(self):
+        return len(self.kinds)
+
+# --------------Construction---------------
+
+    def add(self, kind, op='', first=NONE, second=NONE, third=NONE, ref=NONE, sym=None):
+        """Appends a node and returns its index"""
+        self.kinds.append(KIND[kind])
+        self.ops.append(OP[op])
+        self.first.append(first)
+        self.second.append(second)
+        self.third.append(third)
+        self.refs.append(ref)
+        self.syms.append(NONE if sym is None else sym)
+        return len(self.kinds) - 1
+
+    def ref(self, value):
+        """Returns the index of a value in the pool, adding it if it isn't there (equal values are stored once)"""
+        key = (type(value), value)
+        index = self.value_index.get(key)
+        if index is None:
+            index = self.value_index[key] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def add_block(self, nodes):
+        """Appends a Block whose elements are the given node indices, stored contiguously in 'items'"""
+        start = len(self.items)
+        self.items.extend(nodes)
+        return self.add('Block', first=start, second=len(self.items))
+
+    @classmethod
+    def from_tree(cls, program):
+        """Builds the arena of a dataclass tree (the list of statements returned by the parser)"""
+        builder = ArenaBuilder(cls())
+        return builder.program([builder.convert(stmt) for stmt in program])
+
+# -----------------------------------------
+
+# ----------------Accessors----------------
+
+    def kind(self, index):
+        """Name of the class of the node"""
+        return KINDS[self.kinds[index]]
+
+    def op(self, index):
+        return OPS[self.ops[index]]
+
+    def value(self, index):
+        """Literal value or identifier name of the node"""
+        return self.values[self.refs[index]]
+
+    def sym_id(self, index):
+        """Symbol ID of the identifier of the node, or None"""
+        sym = self.syms[index]
+        return None if sym == NONE else sym
+
+    def block(self, index):
+        """Indices of the elements of a Block node"""
+        return self.items[self.first[index]:self.second[index]]
+
+    def params(self, index):
+        """(name, symbol ID) pairs of the parameters of a FunctionDecl node"""
+        return [(self.value(param), self.sym_id(param)) for param in self.block(self.first[index])]
+
+# -----------------------------------------
+
+# ------------------Parts------------------
+# A part holds only the nodes of some top-level statements, to send them to another process without the rest of the
+# program. It is made of slices of the arrays, so building it doesn't visit the nodes one by one.
+
+    def statement_ranges(self):
+        """
+        Index ranges (start, stop) of the nodes of the top-level statements, in order. Both the parser and from_tree()
+        store a statement after its children and right after the previous statement, so its range ends at its own node.
+        """
+        ranges, start = [], 0
+        for stmt in self.block(self.root):
+            ranges.append((start, stmt + 1))
+            start = stmt + 1
+        return ranges
+
+    def part(self, ranges):
+        """
+        Copy of the nodes in the given index ranges (see statement_ranges), with the block items and the values they use.
+        Arena.from_part() rebuilds it.
+        """
+        nodes, items, refs = [], [], set()
+        for start, stop in ranges:
+            nodes.append((start, self.kinds[start:stop], self.ops[start:stop], self.first[start:stop],
+                          self.second[start:stop], self.third[start:stop], self.refs[start:stop], self.syms[start:stop]))
+            refs.update(self.refs[start:stop])
+            # The elements of the Blocks are added to 'items' in the order of the Blocks: the ones of the range go from
+            # the first element of its first Block to the last element of its last Block
+            kinds = self.kinds[start:stop].tobytes()
+            first_block, last_block = kinds.find(KIND['Block']), kinds.rfind(KIND['Block'])
+            if first_block != -1:
+                low, high = self.first[start + first_block], self.second[start + last_block]
+                items.append((low, self.items[low:high]))
+        refs.discard(NONE)
+        return len(self), len(self.items), len(self.values), nodes, items, {ref: self.values[ref] for ref in refs}
+
+    @classmethod
+    def from_part(cls, part):
+        """
+        Arena of a part: its nodes keep their indices, the other ones are empty Blocks and the values it doesn't use are
+        None. It is meant to be read: nothing can be added to it.
+        """
+        length, item_count, value_count, nodes, items, values = part
+        arena = cls()
+        columns = (arena.kinds, arena.ops, arena.first, arena.second, arena.third, arena.refs, arena.syms)
+        for column in columns:
+            column.frombytes(bytes(column.itemsize * length))
+        arena.items.frombytes(bytes(arena.items.itemsize * item_count))
+
+        for start, *slices in nodes:
+            stop = start + len(slices[0])
+            for column, column_slice in zip(columns, slices):
+                column[start:stop] = column_slice
+        for low, items_slice in items:
+            arena.items[low:low + len(items_slice)] = items_slice
+        arena.values = [None] * value_count
+        for ref, value in values.items():
+            arena.values[ref] = value
+        return arena
+
+# -----------------------------------------
+
+    def to_tree(self):
+        """Rebuilds the dataclass tree of the whole program"""
+        return self.node(self.root)
+
+    def node(self, index):
+        """Rebuilds the dataclass node (or the list of nodes of a Block) at the given index"""
+        if index == NONE:
+            return None
+
+        first, second, third = self.first[index], self.second[index], self.third[index]
+        match self.kind(index):
+            case 'Block':
+                return [self.node(item) for item in self.block(index)]
+            case 'Number':
+                return Number(self.value(index))
+            case 'String':
+                return String(self.value(index))
+            case 'Boolean':
+                return Boolean(self.value(index))
+            case 'InputExpr':
+                return InputExpr(self.value(index))
+            case 'Var':
+                return Var(self.value(index), self.sym_id(index))
+            case 'BinOp':
+                return BinOp(self.node(first), self.op(index), self.node(second))
+            case 'UnaryOp':
+                return UnaryOp(self.op(index), self.node(first))
+            case 'AssignStat':
+                return AssignStat(self.value(index), self.node(first), self.sym_id(index))
+            case 'PrintStat':
+                return PrintStat(self.node(first))
+            case 'ReturnStat':
+                return ReturnStat(self.node(first))
+            case 'ExprStat':
+                return ExprStat(self.node(first))
+            case 'IfStat':
+                return IfStat(self.node(first), self.node(second), self.node(third))
+            case 'ForStat':
+                return ForStat(self.value(index), self.node(first), self.node(second), self.node(third), self.sym_id(index))
+            case 'FunctionDecl':
+                params = self.params(index)
+                return FunctionDecl(self.value(index), [name for name, _ in params], self.node(second), self.sym_id(index),
+                                    [sym for _, sym in params])
+            case 'FunctionCall':
+                return FunctionCall(self.value(index), self.node(first), self.sym_id(index))
+            case 'ErrorStat':
+                return ErrorStat(self.value(index))
+
+class ArenaBuilder:
+    """
+    Node builder of parse(arena=True) (see parser.TreeBuilder): the grammar rules append every node to the arena as soon
+    as it is reduced and pass its index around, so the dataclass tree is never built. The statements and the arguments
+    are lists of indices until their Block is added. The nodes discarded by the error recovery stay in the arena,
+    unreachable from the root.
+    """
+    def __init__(self, arena=None):
+        self.arena = Arena() if arena is None else arena
+
+    def number(self, value):
+        return self.arena.add('Number', ref=self.arena.ref(value))
+
+    def string(self, value):
+        return self.arena.add('String', ref=self.arena.ref(value))
+
+    def boolean(self, value):
+        return self.arena.add('Boolean', ref=self.arena.ref(value))
+
+    def var(self, name, sym_id=None):
+        return self.arena.add('Var', ref=self.arena.ref(name), sym=sym_id)
+
+    def input_expr(self, prompt):
+        return self.arena.add('InputExpr', ref=self.arena.ref(prompt))
+
+    def bin_op(self, left, op, right):
+        return self.arena.add('BinOp', op, left, right)
+
+    def unary_op(self, op, expr):
+        return self.arena.add('UnaryOp', op, expr)
+
+    def assign_stat(self, name, value, sym_id=None):
+        return self.arena.add('AssignStat', first=value, ref=self.arena.ref(name), sym=sym_id)
+
+    def print_stat(self, value):
+        return self.arena.add('PrintStat', first=value)
+
+    def return_stat(self, value):
+        return self.arena.add('ReturnStat', first=NONE if value is None else value)
+
+    def expr_stat(self, expr):
+        return self.arena.add('ExprStat', first=expr)
+
+    def if_stat(self, condition, true_block, false_block=None):
+        return self.arena.add('IfStat', first=condition, second=true_block,
+                              third=NONE if false_block is None else false_block)
+
+    def for_stat(self, iterator, start, end, body, iterator_id=None):
+        return self.arena.add('ForStat', first=start, second=end, third=body, ref=self.arena.ref(iterator),
+                              sym=iterator_id)
+
+    def function_decl(self, name, params, body, sym_id=None, param_ids=None):
+        param_nodes = [self.var(param, param_id) for param, param_id in zip(params, param_ids or [None] * len(params))]
+        return self.arena.add('FunctionDecl', first=self.arena.add_block(param_nodes), second=body,
+                              ref=self.arena.ref(name), sym=sym_id)
+
+    def function_call(self, name, args, sym_id=None):
+        return self.arena.add('FunctionCall', first=self.arena.add_block(args), ref=self.arena.ref(name), sym=sym_id)
+
+    def error_stat(self, line=None):
+        return self.arena.add('ErrorStat', ref=self.arena.ref(line))
+
+    def block(self, statements):
+        return self.arena.add_block(statements)
+
+    def program(self, statements):
+        """Adds the Block of the top-level statements as the root, returns the arena"""
+        self.arena.root = self.arena.add_block(statements)
+        return self.arena
+
+    def convert(self, node):
+        """Stores a dataclass node (or a list of them) and its children, returns its index"""
+        match node:
+            case list(nodes):
+                return self.block([self.convert(item) for item in nodes])
+            case None:
+                return NONE
+            case Number(value):
+                return self.number(value)
+            case String(value):
+                return self.string(value)
+            case Boolean(value):
+                return self.boolean(value)
+            case InputExpr(prompt):
+                return self.input_expr(prompt)
+            case Var(name, sym_id):
+                return self.var(name, sym_id)
+            case BinOp(left, op, right):
+                return self.bin_op(self.convert(left), op, self.convert(right))
+            case UnaryOp(op, expr):
+                return self.unary_op(op, self.convert(expr))
+            case AssignStat(name, value, sym_id):
+                return self.assign_stat(name, self.convert(value), sym_id)
+            case PrintStat(value):
+                return self.print_stat(self.convert(value))
+            case ReturnStat(value):
+                return self.return_stat(self.convert(value))
+            case ExprStat(expr):
+                return self.expr_stat(self.convert(expr))
+            case IfStat(condition, true_block, false_block):
+                return self.if_stat(self.convert(condition), self.convert(true_block), self.convert(false_block))
+            case ForStat(iterator, start, end, body, iterator_id):
+                return self.for_stat(iterator, self.convert(start), self.convert(end), self.convert(body), iterator_id)
+            case FunctionDecl(name, params, body, sym_id, param_ids):
+                return self.function_decl(name, params, self.convert(body), sym_id, param_ids)
+            case FunctionCall(name, args, sym_id):
+                return self.function_call(name, [self.convert(arg) for arg in args], sym_id)
+            case ErrorStat(line):
+                return self.error_stat(line)
+            case _:
+                raise Exception(f"Arena Error: Unknown node '{node}'")
@@ -0,0 +1,409 @@
+import hashlib
+import os
+import re
+import tempfile
+import types
+
+import lexer
+import parser
+import table_cache
+from inference_cache import code_signature, functions_signature
+from parser import (
+    Number, String, Boolean, Var, BinOp, UnaryOp,
+    AssignStat, PrintStat, IfStat, ForStat, InputExpr,
+    FunctionDecl, FunctionCall, ExprStat, ReturnStat, ErrorStat,
+    grammar_signature
+)
+
+"""
+Compact binary encoding of the AST, used as on-disk parse cache and to hand the AST to other processes.
+Layout of an encoded program:
+- header: MAGIC and FORMAT_VERSION
+- string table: number of strings, then every string as length + UTF-8 bytes (identifiers, string literals, prompts)
+- tag stream: length, then one byte per node with its kind, in postorder (children before their parent)
+- operand stream: the operands of the nodes (string indices, numbers, symbol IDs, operators, block sizes) in the same order
+All the integers are varints (7 bits per byte, the high bit set on every byte but the last).
+The encoder walks the tree with an explicit stack, so very deep trees are encoded without recursion.
+The decoder reads the operands in bulk, then walks the tag stream once keeping the decoded children on a stack,
+without recursion.
+
+The parse cache is controlled by the PY2JS_AST_CACHE environment variable:
+- not set: the encoded ASTs are stored in the user cache folder
+- '0': the cache is disabled
+- any other value: it is used as the cache folder
+"""
+
+MAGIC = b'PJAS'
+FORMAT_VERSION = 1
+
+CACHE_ENV = 'PY2JS_AST_CACHE'
+
+# Tags of the node stream. 'Block' is a list of nodes, 'None' a missing node (e.g. an IF without else).
+TAGS = ('None', 'Block', 'Number', 'String', 'Boolean', 'Var', 'InputExpr', 'BinOp', 'UnaryOp', 'AssignStat',
+        'PrintStat', 'ReturnStat', 'ExprStat', 'IfStat', 'ForStat', 'FunctionDecl', 'FunctionCall', 'ErrorStat')
+(NONE, BLOCK, NUMBER, STRING, BOOLEAN, VAR, INPUT, BINOP, UNARYOP, ASSIGN,
+ PRINT, RETURN, EXPR, IF, FOR, FUNCTION, CALL, ERROR) = range(len(TAGS))
+
+OPS = ('+', '-', '*', '/', '>', '<', '>=', '<=', '==', '!=', 'and', 'or', 'not')
+OP = {op: index for index, op in enumerate(OPS)}
+
+# ----------------Encoder------------------
+
+# Nodes without children, written as soon as they are reached
+LEAVES = {type(None), Number, String, Boolean, InputExpr, Var, ErrorStat}
+
+class Encoder:
+    """Encodes a program (the list of statements returned by the parser) in the binary format"""
+    def __init__(self):
+        self.tags = bytearray()
+        self.operands = bytearray()
+        self.strings = {}
+
+    def encode(self, program):
+        self.node(program)
+
+        out = bytearray(MAGIC)
+        out.append(FORMAT_VERSION)
+        write_varint(out, len(self.strings))
+        for string in self.strings:
+            data = string.encode('utf-8')
+            write_varint(out, len(data))
+            out += data
+        write_varint(out, len(self.tags))
+        out += self.tags
+        out += self.operands
+        return bytes(out)
+
+    def string(self, value):
+        """Writes the index of a string in the string table, adding it if it isn't there"""
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        write_varint(self.operands, index)
+
+    def symbol(self, sym_id):
+        """Writes an optional symbol ID (0 stands for None)"""
+        write_varint(self.operands, 0 if sym_id is None else sym_id + 1)
+
+    def node(self, root):
+        """
+        Writes a node and its subtree in postorder, without recursion (like the decoder, so very deep trees are supported).
+        A node with children is pushed back as a 1-tuple, written when popped after them, and then its children.
+        """
+        stack = [root]
+        push, pop, write = stack.append, stack.pop, self.write
+        while stack:
+            node = pop()
+            cls = type(node)
+            if cls is tuple:
+                write(node[0])
+            elif cls in LEAVES:
+                write(node)
+            else:
+                push((node,))
+                if cls is list:
+                    stack.extend(reversed(node))
+                elif cls is BinOp:
+                    push(node.right)
+                    push(node.left)
+                elif cls is AssignStat or cls is PrintStat or cls is ReturnStat:
+                    push(node.value)
+                elif cls is ExprStat or cls is UnaryOp:
+                    push(node.expr)
+                elif cls is FunctionCall:
+                    push(node.args)
+                elif cls is IfStat:
+                    push(node.false_block)
+                    push(node.true_block)
+                    push(node.condition)
+                elif cls is ForStat:
+                    push(node.body)
+                    push(node.end)
+                    push(node.start)
+                elif cls is FunctionDecl:
+                    push(node.body)
+                else:
+                    raise ValueError(f"Codec Error: Unknown node '{node}'")
+
+    def write(self, node):
+        """Writes the tag and the operands of a node whose children are already written"""
+        tags = self.tags
+        match node:
+            case list(nodes):
+                tags.append(BLOCK)
+                write_varint(self.operands, len(nodes))
+            case None:
+                tags.append(NONE)
+            case Number(value):
+                tags.append(NUMBER)
+                # Zigzag encoding, so hand-built negative numbers are supported too
+                write_varint(self.operands, value * 2 if value >= 0 else -value * 2 - 1)
+            case String(value):
+                tags.append(STRING)
+                self.string(value)
+            case Boolean(value):
+                tags.append(BOOLEAN)
+                self.string(value)
+            case InputExpr(prompt):
+                tags.append(INPUT)
+                self.string(prompt)
+            case Var(name, sym_id):
+                tags.append(VAR)
+                self.string(name)
+                self.symbol(sym_id)
+            case BinOp(_, op, _):
+                tags.append(BINOP)
+                self.operands.append(OP[op])
+            case UnaryOp(op, _):
+                tags.append(UNARYOP)
+                self.operands.append(OP[op])
+            case AssignStat(name, _, sym_id):
+                tags.append(ASSIGN)
+                self.string(name)
+                self.symbol(sym_id)
+            case PrintStat():
+                tags.append(PRINT)
+            case ReturnStat():
+                tags.append(RETURN)
+            case ExprStat():
+                tags.append(EXPR)
+            case IfStat():
+                tags.append(IF)
+            case ForStat(iterator, _, _, _, iterator_id):
+                tags.append(FOR)
+                self.string(iterator)
+                self.symbol(iterator_id)
+            case FunctionDecl(name, params, _, sym_id, param_ids):
+                tags.append(FUNCTION)
+                self.string(name)
+                self.symbol(sym_id)
+                write_varint(self.operands, len(params))
+                for param, param_id in zip(params, param_ids or [None] * len(params)):
+                    self.string(param)
+                    self.symbol(param_id)
+            case FunctionCall(name, _, sym_id):
+                tags.append(CALL)
+                self.string(name)
+                self.symbol(sym_id)
+            case ErrorStat(line):
+                tags.append(ERROR)
+                # The line is optional like a symbol ID
+                self.symbol(line)
+            case _:
+                raise ValueError(f"Codec Error: Unknown node '{node}'")
+
+def write_varint(out, value):
+    """Appends a non-negative integer to out, 7 bits per byte starting from the lowest ones"""
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def encode(program):
+    """Returns the binary encoding of a program"""
+    return Encoder().encode(program)
+
+# -----------------------------------------
+
+# ----------------Decoder------------------
+
+# A varint: any number of bytes with the high bit set, then one without it
+VARINT = re.compile(rb'[\x80-\xff]*[\x00-\x7f]')
+
+def read_varint(data, pos):
+    """Reads the varint starting at pos. Returns the value and the position after it"""
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def read_varints(data):
+    """Decodes a whole stream of varints"""
+    if data.isascii():
+        # No byte has the high bit set: every varint is a single byte
+        return list(data)
+    return [chunk[0] if len(chunk) == 1 else read_varint(chunk, 0)[0] for chunk in VARINT.findall(data)]
+
+def decode(data):
+    """
+    Rebuilds the program from its binary encoding.
+    Raises ValueError if the data isn't an encoded AST of this format version.
+    """
+    data = bytes(data)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not an encoded AST")
+    if len(data) <= len(MAGIC) or data[len(MAGIC)] != FORMAT_VERSION:
+        raise ValueError("Unsupported AST format version")
+
+    try:
+        count, pos = read_varint(data, len(MAGIC) + 1)
+        strings = []
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            strings.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+
+        length, pos = read_varint(data, pos)
+        tags = data[pos:pos + length]
+        if len(tags) != length:
+            raise IndexError
+        operands = iter(read_varints(data[pos + length:]))
+        operand = operands.__next__
+
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        # The tags are tested from the most frequent ones
+        for tag in tags:
+            if tag == VAR:
+                name = strings[operand()]
+                sym = operand()
+                push(Var(name, sym - 1 if sym else None))
+            elif tag == NUMBER:
+                value = operand()
+                push(Number(value >> 1 if not value & 1 else -(value >> 1) - 1))
+            elif tag == BINOP:
+                right = pop()
+                push(BinOp(pop(), OPS[operand()], right))
+            elif tag == BLOCK:
+                size = operand()
+                if size:
+                    block = stack[-size:]
+                    del stack[-size:]
+                    push(block)
+                else:
+                    push([])
+            elif tag == ASSIGN:
+                name = strings[operand()]
+                sym = operand()
+                push(AssignStat(name, pop(), sym - 1 if sym else None))
+            elif tag == CALL:
+                name = strings[operand()]
+                sym = operand()
+                push(FunctionCall(name, pop(), sym - 1 if sym else None))
+            elif tag == STRING:
+                push(String(strings[operand()]))
+            elif tag == UNARYOP:
+                push(UnaryOp(OPS[operand()], pop()))
+            elif tag == PRINT:
+                push(PrintStat(pop()))
+            elif tag == EXPR:
+                push(ExprStat(pop()))
+            elif tag == IF:
+                false_block = pop()
+                true_block = pop()
+                push(IfStat(pop(), true_block, false_block))
+            elif tag == NONE:
+                push(None)
+            elif tag == RETURN:
+                push(ReturnStat(pop()))
+            elif tag == FOR:
+                iterator = strings[operand()]
+                sym = operand()
+                body = pop()
+                end = pop()
+                push(ForStat(iterator, pop(), end, body, sym - 1 if sym else None))
+            elif tag == BOOLEAN:
+                push(Boolean(strings[operand()]))
+            elif tag == INPUT:
+                push(InputExpr(strings[operand()]))
+            elif tag == FUNCTION:
+                name = strings[operand()]
+                sym = operand()
+                params, param_ids = [], []
+                for _ in range(operand()):
+                    params.append(strings[operand()])
+                    param_sym = operand()
+                    param_ids.append(param_sym - 1 if param_sym else None)
+                push(FunctionDecl(name, params, pop(), sym - 1 if sym else None, param_ids))
+            elif tag == ERROR:
+                line = operand()
+                push(ErrorStat(line - 1 if line else None))
+            else:
+                raise ValueError(f"Unknown tag {tag} in the encoded AST")
+    except (IndexError, StopIteration):
+        raise ValueError("Truncated encoded AST") from None
+
+    if len(stack) != 1 or next(operands, None) is not None:
+        raise ValueError("Malformed encoded AST")
+    return stack[0]
+
+# -----------------------------------------
+
+# ---------------Parse cache---------------
+
+def cache_dir():
+    """Returns the folder of the parse cache, or None if it is disabled"""
+    override = os.environ.get(CACHE_ENV, '')
+    if override == '0':
+        return None
+    if override:
+        return override
+    return os.path.join(os.path.dirname(table_cache.user_dir()), 'ast')
+
+# Hash of the code building the AST (see builder_signature), computed once
+BUILDER_SIGNATURE = None
+
+def builder_signature():
+    """
+    Hash of the code that turns a source into an AST: the token rules (lexer.rules_signature()), the grammar
+    (grammar_signature()) and the code of every function and class of lexer.py and parser.py. The actions of the t_* and
+    p_* rules, the DescentParser and the node builders are covered, and so are the helpers they call.
+    """
+    global BUILDER_SIGNATURE
+    if BUILDER_SIGNATURE is None:
+        parts = [repr((lexer.rules_signature(), grammar_signature()))]
+        for module in (lexer, parser):
+            members = [value for value in vars(module).values() if getattr(value, '__module__', None) == module.__name__]
+            parts.append(functions_signature([value for value in members if isinstance(value, types.FunctionType)]))
+            parts += [code_signature(value) for value in members if isinstance(value, type)]
+        BUILDER_SIGNATURE = hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+    return BUILDER_SIGNATURE
+
+def cache_key(source, engine):
+    """
+    Name of the cache file of a source: a hash of the source, of the format version and of the code building the AST
+    (see builder_signature), so a change of the lexer, of the parser or of the format never reads a stale AST.
+    """
+    digest = hashlib.sha256(repr((FORMAT_VERSION, engine, builder_signature())).encode('utf-8'))
+    digest.update(source.encode('utf-8'))
+    return digest.hexdigest()[:32] + '.ast'
+
+def parse_cached(source, lexer=None, diagnostics=None, engine='yacc'):
+    """
+    Same as parser.parse(), reading the AST from the parse cache when the same source has already been parsed.
+    Only the sources parsed without errors are cached, so a cache hit has no diagnostics to report.
+    """
+    directory = cache_dir()
+    path = os.path.join(directory, cache_key(source, engine)) if directory else None
+
+    if path and os.path.isfile(path):
+        try:
+            with open(path, 'rb') as f:
+                return decode(f.read())
+        except (OSError, ValueError):
+            # Unreadable or corrupted entry: it is parsed again and overwritten
+            pass
+
+    if lexer is None:
+        lexer = parser.IndentLexer()
+    if diagnostics is not None:
+        lexer.diagnostics = diagnostics
+
+    program = parser.parse(source, lexer, engine=engine)
+    if path and program is not None and not lexer.diagnostics:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Written in a temporary file and renamed, so other processes never read a partial entry
+            with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as f:
+                f.write(encode(program))
+            os.replace(f.name, path)
+        except OSError:
+            pass
+    return program
+
+# -----------------------------------------
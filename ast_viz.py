@@ -1,27 +1,45 @@
 import graphviz
 from dataclasses import is_dataclass, fields
 import os
+import parser
+from typing import NamedTuple
+from visitor import Visitor, handles
 
 """
 AST Visualizer Module.
 Responsible for rendering the Abstract Syntax Tree using Graphviz.
 """
 
-class ASTVisualizer:
+# Node class -> names of the fields shown in the graph, read once with dataclasses reflection.
+# Hidden fields (e.g. the symbol IDs of the identifiers) are not part of the tree
+NODE_FIELDS = {
+    cls: tuple(field.name for field in fields(cls) if field.repr)
+    for cls in vars(parser).values() if isinstance(cls, type) and is_dataclass(cls)
+}
+
+class FieldList(NamedTuple):
+    """Non-empty list field of a node (e.g. the body of a function), visited as a child of the node"""
+    name: str
+    items: list
+
+class ASTVisualizer(Visitor):
     """
     Wrapper class to generate AST images.
     It uses Python's dataclasses reflection to automatically traverse the tree
     without manual rule updates.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, iterative=False):
+        self.count = 0  # nodes added to the current graph
+        # With iterative=True the tree is walked with an explicit stack instead of recursion, for very deep trees
+        self.iterative = iterative
 
     def generate(self, root_node, output_file='ast_graph'):
         """
         Generates the AST graph from the root node.
         """
         # Initialize a new graph for every run
+        self.count = 0
         dot = graphviz.Digraph(comment='Abstract Syntax Tree')
         dot.attr(rankdir='TB') # Top-Bottom layout
         dot.attr('node', shape='box', style='filled', fontname='Arial')
@@ -30,11 +48,12 @@ class ASTVisualizer:
         dot.node("ROOT", "PROGRAM", shape='doubleoctagon', fillcolor='orange', style='filled')
 
         # Start recursion
+        visit = self._walk if self.iterative else self._visit
         if isinstance(root_node, list):
             for stmt in root_node:
-                self._visit(dot, stmt, "ROOT")
+                visit(dot, stmt, "ROOT")
         else:
-            self._visit(dot, root_node, "ROOT")
+            visit(dot, root_node, "ROOT")
 
         # Render
         try:
@@ -47,55 +66,74 @@ class ASTVisualizer:
     def _visit(self, dot, node, parent_id=None, label_edge=""):
         """
         Recursive core function.
-        Uses dataclasses.fields to inspect nodes dynamically.
+        The handler of the node is found in the dispatch table (see visitor.Visitor): it adds the node to the graph and
+        returns its children, as (child, parent_id, label_edge) tuples.
         """
-        if node is None:
-            return
-
-        # Create unique ID
-        node_id = str(id(node))
-
-        # Determine style and label based on node type
-        if is_dataclass(node):
-            node_label = type(node).__name__
-            color = 'lightblue' # Structural Nodes
-        elif isinstance(node, list):
-            node_label = "Block []"
-            color = 'lightgrey'
-        else:
-            # Primitives (int, str, bool)
-            node_label = str(node)
-            color = 'white'
+        for child in self.dispatch[node.__class__](self, node, dot, parent_id, label_edge):
+            self._visit(dot, *child)
 
-        # Add node to graph
-        dot.node(node_id, node_label, fillcolor=color)
+    def _walk(self, dot, node, parent_id=None, label_edge=""):
+        """Same as _visit() with an explicit stack: the nodes are added in the same order (preorder)"""
+        stack = [(node, parent_id, label_edge)]
+        dispatch = self.dispatch
+        while stack:
+            node, parent_id, label_edge = stack.pop()
+            children = dispatch[node.__class__](self, node, dot, parent_id, label_edge)
+            # Reversed, so the first child is popped first
+            stack.extend(reversed(children))
+
+    def _add_node(self, dot, label, color, parent_id, label_edge):
+        """Adds a node to graph connected to its parent and returns its ID"""
+        # Unique ID: with parse(share=True) the same node object can appear in several places of the tree
+        self.count += 1
+        node_id = f"N{self.count}"
+        dot.node(node_id, label, fillcolor=color)
 
         # Connect to parent
         if parent_id:
             dot.edge(parent_id, node_id, label=label_edge, fontsize='10', fontcolor='gray')
+        return node_id
+
+    # ---RECURSION---
+
+    # Dataclasses
+    @handles(*NODE_FIELDS)
+    def _visit_node(self, node, dot, parent_id, label_edge):
+        node_id = self._add_node(dot, type(node).__name__, 'lightblue', parent_id, label_edge) # Structural Nodes
+
+        children = []
+        for name in NODE_FIELDS[type(node)]:
+            field_value = getattr(node, name)
+
+            # Handling lists (es: body, params)
+            if isinstance(field_value, list):
+                if field_value: # Only if list is not empty
+                    children.append((FieldList(name, field_value), node_id, ""))
+
+            # Handling single children (es: left, right, expr)
+            else:
+                children.append((field_value, node_id, name))
+        return children
+
+    # List fields of a node: their items hang from an ellipse with the name of the field
+    @handles(FieldList)
+    def _visit_field_list(self, node, dot, parent_id, label_edge):
+        list_id = parent_id + "_" + node.name
+        dot.node(list_id, f"{node.name} []", shape='ellipse', fillcolor='lightgrey', style='filled')
+        dot.edge(parent_id, list_id)
+        return [(item, list_id, "") for item in node.items]
+
+    # Lists
+    @handles(list)
+    def _visit_list(self, node, dot, parent_id, label_edge):
+        node_id = self._add_node(dot, "Block []", 'lightgrey', parent_id, label_edge)
+        return [(item, node_id, "") for item in node]
+
+    @handles(type(None))
+    def _visit_none(self, node, dot, parent_id, label_edge):
+        return ()
 
-        # ---RECURSION---
-
-        # Dataclasses
-        if is_dataclass(node):
-            for field in fields(node):
-                field_value = getattr(node, field.name)
-                
-                # Handling lists (es: body, params)
-                if isinstance(field_value, list):
-                    if field_value: # Only if list is not empty
-                        list_id = node_id + "_" + field.name
-                        dot.node(list_id, f"{field.name} []", shape='ellipse', fillcolor='lightgrey', style='filled')
-                        dot.edge(node_id, list_id)
-                        
-                        for item in field_value:
-                            self._visit(dot, item, list_id)
-                
-                # Handling single children (es: left, right, expr)
-                else:
-                    self._visit(dot, field_value, node_id, label_edge=field.name)
-
-        # Lists
-        elif isinstance(node, list):
-            for item in node:
-                self._visit(dot, item, node_id)
\ No newline at end of file
+    # Primitives (int, str, bool)
+    def generic_visit(self, node, dot, parent_id, label_edge):
+        self._add_node(dot, str(node), 'white', parent_id, label_edge)
+        return ()
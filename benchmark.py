@@ -0,0 +1,1678 @@
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+"""
+Performance benchmarks of the transpiler pipeline.
+Usage:
+- python benchmark.py           lists the available benchmarks
+- python benchmark.py <name>    runs a single benchmark
+"""
+
+BENCHMARKS = {}
+
+def benchmark(func):
+    """Registers a benchmark function under its name"""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+# --------------Helper functions-----------
+
+def run_python(code, env=None):
+    """Runs a snippet of code in a fresh interpreter and returns its stdout"""
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, **(env or {})},
+        check=True
+    )
+    return result.stdout
+
+def print_table(header, rows):
+    """Prints the results with the same table layout used by the lexer test"""
+    line = "| " + " | ".join(f"{h:<18}" for h in header) + " |"
+    print("-" * len(line))
+    print(line)
+    print("-" * len(line))
+    for row in rows:
+        print("| " + " | ".join(f"{str(c):<18}" for c in row) + " |")
+    print("-" * len(line))
+
+def best_time(func, repeat=3):
+    """Returns the best wall time (in seconds) of several runs of func"""
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# Snippet that defines peak_mb(): the peak resident memory of the process (in MB).
+# Where the resource module is not available (Windows) the peak of the Python allocations is used instead.
+PEAK_MEMORY_CODE = textwrap.dedent("""
+    import sys
+    try:
+        import resource
+        def peak_mb():
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import tracemalloc
+        tracemalloc.start()
+        def peak_mb():
+            return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+""")
+
+def write_temp_source(source):
+    """Saves a generated program in a temporary file (to be read by a subprocess) and returns its path"""
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as f:
+        f.write(source)
+    return f.name
+
+# -----------------------------------------
+
+# ------------Synthetic programs-----------
+
+def synthetic_program(statements, seed=0):
+    """
+    Generates a random program of the supported Python subset with the given number of top-level statements.
+    The program always defines the names it uses, so it passes the semantic analysis too.
+    """
+    rnd = random.Random(seed)
+    names = ['a', 'b', 'c', 'total', 'x1', 'y_2']
+    lines = [f"{name} = {rnd.randint(0, 9)}" for name in names]
+    lines += [
+        "s = 'hi'",
+        "def f(p, q):",
+        "    r = p + q",
+        "    return r",
+        "def g(p):",
+        "    if p > 1:",
+        "        return p * 2",
+        "    elif p == 1:",
+        "        return 1",
+        "    else:",
+        "        return 0",
+    ]
+
+    def expression(depth=0):
+        kind = rnd.randint(0, 8 if depth < 3 else 2)
+        if kind == 0: return str(rnd.randint(0, 99))
+        if kind <= 2: return rnd.choice(names)
+        if kind == 3: return f"({expression(depth + 1)})"
+        if kind == 4: return f"-{expression(depth + 1)}"
+        if kind == 5: return f"f({expression(depth + 1)}, {expression(depth + 1)})"
+        if kind == 6: return f"g({expression(depth + 1)})"
+        return f"{expression(depth + 1)} {rnd.choice(['+', '-', '*', '/'])} {expression(depth + 1)}"
+
+    def condition():
+        cond = f"{expression(2)} {rnd.choice(['<', '>', '<=', '>=', '==', '!='])} {expression(2)}"
+        if rnd.random() < 0.3:
+            cond += f" and not {rnd.choice(names)}"
+        return cond
+
+    def statement(indent, depth):
+        kind = rnd.randint(0, 7 if depth < 3 else 3)
+        pad = '    ' * indent
+        if kind <= 1: return [f"{pad}{rnd.choice(names)} = {expression()}"]
+        if kind == 2: return [f"{pad}print({expression()})"]
+        if kind == 3: return [f"{pad}f({expression()}, 1)"]
+        if kind == 4:
+            result = [f"{pad}if {condition()}:"] + block(indent + 1, depth + 1)
+            for _ in range(rnd.randint(0, 2)):
+                result += [f"{pad}elif {condition()}:"] + block(indent + 1, depth + 1)
+            if rnd.random() < 0.5:
+                result += [f"{pad}else:"] + block(indent + 1, depth + 1)
+            return result
+        if kind == 5:
+            return [f"{pad}for i in range(a, {rnd.randint(1, 9)}):"] + block(indent + 1, depth + 1)
+        if kind == 6:
+            return [f'{pad}s = input("value")', f"{pad}# comment", f'{pad}s = "q\\"x" + s  # trailing comment']
+        return ["", f"{pad}print(s * {rnd.randint(1, 3)})", f"{pad}flag = not {rnd.choice(names)}"]
+
+    def block(indent, depth):
+        result = []
+        for _ in range(rnd.randint(1, 3)):
+            result += statement(indent, depth)
+        return result
+
+    for _ in range(statements):
+        lines += statement(0, 0)
+    return "\n".join(lines) + "\n"
+
+def random_statements(count, seed=0):
+    """
+    Generates random statements exercising every rule of the grammar, including the corners that synthetic_program avoids:
+    every operator with unary and parenthesized operands, chained comparisons (a syntax error), both range forms,
+    empty and leading-empty parameter/argument lists, elif chains with and without else.
+    The programs aren't meant to pass the semantic analysis.
+    """
+    rnd = random.Random(seed)
+    operators = ['+', '-', '*', '/', '==', '!=', '<', '>', '<=', '>=', 'and', 'or']
+    comparisons = operators[4:10]
+
+    def expression(depth=0):
+        kind = rnd.randint(0, 9 if depth < 4 else 3)
+        if kind == 0: return str(rnd.randint(0, 99))
+        if kind == 1: return rnd.choice(['a', 'b', 'True', 'False', '"s"'])
+        if kind == 2: return rnd.choice(['x', 'y', 'input("p")'])
+        if kind == 3: return f"f({', '.join(expression(depth + 1) for _ in range(rnd.randint(0, 2)))})"
+        if kind == 4: return f"-{expression(depth + 1)}"
+        if kind == 5: return f"not {expression(depth + 1)}"
+        if kind == 6: return f"({expression(depth + 1)})"
+        if kind == 7: return f"g(, {expression(depth + 1)})"
+        op = rnd.choice(operators)
+        if op in comparisons and rnd.random() < 0.97:
+            # Comparisons are non-associative: the operands are grouped to keep most programs valid
+            comparison = f"({expression(depth + 1)}) {op} ({expression(depth + 1)})"
+            return f"({comparison})" if depth else comparison
+        return f"{expression(depth + 1)} {op} {expression(depth + 1)}"
+
+    def block(indent, depth):
+        return [line for _ in range(rnd.randint(1, 2)) for line in statement(indent, depth)]
+
+    def statement(indent, depth):
+        pad = '    ' * indent
+        kind = rnd.randint(0, 8 if depth < 2 else 3)
+        if kind == 0: return [f"{pad}x = {expression()}"]
+        if kind == 1: return [f"{pad}print({expression()})"]
+        if kind == 2: return [f"{pad}{expression()}"]
+        if kind == 3: return [f"{pad}return {expression()}"]
+        if kind == 4:
+            result = [f"{pad}if {expression()}:"] + block(indent + 1, depth + 1)
+            for _ in range(rnd.randint(0, 3)):
+                result += [f"{pad}elif {expression()}:"] + block(indent + 1, depth + 1)
+            if rnd.random() < 0.5:
+                result += [f"{pad}else:"] + block(indent + 1, depth + 1)
+            return result
+        if kind == 5:
+            return [f"{pad}for i in range({expression()}):"] + block(indent + 1, depth + 1)
+        if kind == 6:
+            return [f"{pad}for i in range({expression()}, {expression()}):"] + block(indent + 1, depth + 1)
+        if kind == 7:
+            params = rnd.choice(['', 'p', 'p, q', ', p', 'p, q, r'])
+            return [f"{pad}def h({params}):"] + block(indent + 1, depth + 1)
+        return ["", f"{pad}# comment"]
+
+    lines = []
+    for _ in range(count):
+        lines += statement(0, 0)
+    return "\n".join(lines) + "\n"
+
+def library_program(functions, called, seed=0):
+    """
+    Generates a library-style program: many functions whose bodies are generated programs (indented), of which only the
+    given fraction is called at the top level
+    """
+    rnd = random.Random(seed)
+    lines = []
+    for index in range(functions):
+        lines.append(f"def lib{index}(p):")
+        lines += ['    ' + line if line else line for line in synthetic_program(rnd.randint(2, 8), seed + index).splitlines()]
+        lines.append("    return p")
+    for index in sorted(rnd.sample(range(functions), int(functions * called))):
+        lines.append(f"print(lib{index}({index}))")
+    return "\n".join(lines) + "\n"
+
+def mutate(source, rnd):
+    """Breaks a program deleting, duplicating or swapping a few random lexemes"""
+    words = re.split(r'( +|\n)', source)
+    for _ in range(rnd.randint(1, 3)):
+        index = rnd.randrange(len(words))
+        action = rnd.randint(0, 2)
+        if action == 0:
+            del words[index]
+        elif action == 1:
+            words.insert(index, words[index])
+        else:
+            other = rnd.randrange(len(words))
+            words[index], words[other] = words[other], words[index]
+    return ''.join(words)
+
+# -----------------------------------------
+
+# --------------Benchmarks-----------------
+
+@benchmark
+def startup(repeat=7):
+    """
+    Import time of the parser module (lexer + parser construction) in a fresh interpreter.
+    - cold: table cache disabled, the master regex and the LALR automaton are built at every import
+    - first run: empty cache folder, the tables are built and saved
+    - warm: the tables are read from the cache folder
+    The TABLES column isolates the time spent building (or loading) the lexer and parser tables.
+    """
+    code = textwrap.dedent("""
+        import time
+        t = time.perf_counter()
+        import parser, lexer
+        total = time.perf_counter() - t
+        t = time.perf_counter()
+        lexer.build_lexer()
+        parser.build_parser()
+        print(total, time.perf_counter() - t)
+    """)
+
+    def measure(cache, times):
+        runs = [run_python(code, {'PY2JS_TABLE_CACHE': cache}).split() for _ in range(times)]
+        return (statistics.median(float(r[0]) for r in runs) * 1000,
+                statistics.median(float(r[1]) for r in runs) * 1000)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = measure('0', repeat)
+        first = measure(cache_dir, 1)
+        warm = measure(cache_dir, repeat)
+
+    print_table(["MODE", "IMPORT (ms)", "TABLES (ms)"], [
+        ["cold", f"{cold[0]:.1f}", f"{cold[1]:.1f}"],
+        ["first run", f"{first[0]:.1f}", "-"],
+        ["warm", f"{warm[0]:.1f}", f"{warm[1]:.1f}"],
+    ])
+    print(f"Import speedup: {cold[0] / warm[0]:.2f}x - Tables speedup: {cold[1] / warm[1]:.2f}x")
+
+@benchmark
+def lexer_engines(statements=20000):
+    """
+    Tokens per second of the PLY lexer and of the hand-written Scanner.
+    Before timing, the token streams of both engines are compared (raw and through the IndentLexer) over generated programs,
+    edge cases and the sources of this repository (full of characters that are illegal for the transpiler).
+    """
+    import lexer
+    from diagnostics import Diagnostics
+
+    def stream(source, engine, indent=True, diagnostics=None):
+        base = lexer.ENGINES[engine]()
+        base.lineno = 1
+        base.diagnostics = diagnostics
+        lex_obj = lexer.IndentLexer(base, diagnostics=diagnostics) if indent else base
+        lex_obj.input(source)
+        return [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in iter(lex_obj.token, None)]
+
+    corpus = [synthetic_program(200, seed) for seed in range(20)]
+    corpus += ["", "x = 1", "x = 1 ! 2\n", "a = 'unterminated\nb = 2\n", "\tx = 1\r\n", "x = \u0661\u0662\n",
+               "if a:\n  b = 1\n c = 2\n", "x = 1\n    \ny = 2\n\n\n", "print(\"a\\\\\")  # c\n#"]
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith('.py'):
+            with open(os.path.join(folder, filename), encoding='utf-8') as f:
+                corpus.append(f.read())
+
+    for source in corpus:
+        for indent in (False, True):
+            expected_errors = Diagnostics()
+            expected = stream(source, 'ply', indent, expected_errors)
+            actual_errors = Diagnostics()
+            actual = stream(source, 'scanner', indent, actual_errors)
+
+            if expected != actual or expected_errors.records != actual_errors.records:
+                raise AssertionError(f"Token streams differ for source:\n{source[:200]}")
+    print(f"Differential check passed on {len(corpus)} sources.\n")
+
+    source = synthetic_program(statements)
+    rows = []
+    for engine in ('ply', 'scanner'):
+        count = len(stream(source, engine, indent=False))
+        elapsed = best_time(lambda: stream(source, engine, indent=False))
+        rows.append([engine, count, f"{elapsed * 1000:.1f}", f"{count / elapsed:,.0f}"])
+
+    print(f"Source size: {len(source) / 1024:.0f} KB")
+    print_table(["ENGINE", "TOKENS", "TIME (ms)", "TOKENS/SEC"], rows)
+    print(f"Speedup: {float(rows[0][2]) / float(rows[1][2]):.2f}x")
+
+@benchmark
+def token_memory(statements=40000):
+    """
+    Peak memory needed to keep the whole token stream of a multi-MB source: list of tokens vs compact TokenBuffer.
+    Every configuration runs in a fresh interpreter, the memory is reported per MB of source.
+    The allocations are traced with tracemalloc from after the imports: the peak of the resident memory would include the
+    building of the lexer tables, larger than the compact stream of a small source.
+    """
+    code = textwrap.dedent("""
+        import sys
+        import tracemalloc
+        import lexer
+        with open(sys.argv[1], encoding='utf-8') as f:
+            source = f.read()
+        lex_obj = lexer.IndentLexer(engine=sys.argv[2], compact=sys.argv[3] == 'compact')
+        tracemalloc.start()
+        lex_obj.input(source)
+        kept = lex_obj.buffer if lex_obj.compact else list(iter(lex_obj.token, None))
+        print(len(kept), tracemalloc.get_traced_memory()[1] / 1024 / 1024)
+    """)
+
+    source = synthetic_program(statements)
+    size_mb = len(source.encode('utf-8')) / 1024 / 1024
+    path = write_temp_source(source)
+
+    rows = []
+    try:
+        for engine in ('ply', 'scanner'):
+            for mode in ('tokens', 'compact'):
+                result = subprocess.run([sys.executable, '-c', code, path, engine, mode], capture_output=True, text=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+                count, peak = result.stdout.split()
+                rows.append([engine, mode, count, f"{float(peak):.1f}", f"{float(peak) / size_mb:.1f}"])
+    finally:
+        os.remove(path)
+
+    print(f"Source size: {size_mb:.1f} MB")
+    print_table(["ENGINE", "MODE", "TOKENS", "PEAK (MB)", "MB PER MB"], rows)
+
+@benchmark
+def relex_edits(lines=50000, edits=30):
+    """
+    Latency of single-line edits in a 50k-line file: full tokenize() vs incremental relex() from the last checkpoint.
+    Every spliced stream is compared with a full tokenization of the edited source.
+    """
+    import lexer
+
+    statements = 100
+    source = synthetic_program(statements)
+    while source.count('\n') < lines:
+        statements *= 2
+        source = synthetic_program(statements)
+    source = ''.join(source.splitlines(keepends=True)[:lines])
+
+    def signature(stream):
+        return [(tok.type, tok.value, tok.lineno, tok.lexpos, tok.column) for tok in stream.tokens]
+
+    rnd = random.Random(0)
+    rows = []
+    for engine in ('ply', 'scanner'):
+        full_times = []
+        relex_times = {'replace': [], 'insert': [], 'new line': []}
+
+        stream = lexer.IndentLexer(engine=engine).tokenize(source)
+        for index in range(edits):
+            data = stream.data
+            kind = list(relex_times)[index % len(relex_times)]
+
+            # Pick a random line containing an assignment without strings and edit it
+            pos = data.find(' = ', rnd.randint(0, len(data) - 100))
+            line_end = data.find('\n', pos)
+            while '"' in data[data.rfind('\n', 0, pos) + 1:line_end]:
+                pos = data.find(' = ', line_end)
+                line_end = data.find('\n', pos)
+            if kind == 'replace':
+                start, end, text = pos + 3, pos + 4, '7'
+            elif kind == 'insert':
+                start, end, text = pos, pos, 'z'
+            else:
+                start, end, text = line_end, line_end, '\n' + ' ' * (pos - data.rfind('\n', 0, pos) - 1) + 'extra = 1'
+
+            t = time.perf_counter()
+            new_stream = lexer.IndentLexer(engine=engine).relex(stream, start, end, text)
+            relex_times[kind].append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            expected = lexer.IndentLexer(engine=engine).tokenize(new_stream.data)
+            full_times.append(time.perf_counter() - t)
+
+            if signature(new_stream) != signature(expected):
+                raise AssertionError(f"Spliced stream differs from a full tokenization (edit {kind} at {start})")
+            stream = new_stream
+
+        full_ms = statistics.median(full_times) * 1000
+        rows.append([engine, "full tokenize", f"{full_ms:.2f}", "1.00x"])
+        for kind, times in relex_times.items():
+            ms = statistics.median(times) * 1000
+            rows.append([engine, f"relex ({kind})", f"{ms:.2f}", f"{full_ms / ms:.2f}x"])
+
+    print(f"Source: {lines} lines, {len(source) / 1024:.0f} KB - {edits} edits per engine (median times)")
+    print_table(["ENGINE", "OPERATION", "TIME (ms)", "SPEEDUP"], rows)
+
+@benchmark
+def incremental_parse(statements=20000, edits=12):
+    """
+    Edit-to-AST latency in a large file: full parse() vs reparse() of the top-level statements touched by the edit.
+    Every updated AST is compared with a full parse of the edited source, and the statements that are the same objects
+    of the previous AST are counted.
+    """
+    import lexer
+    import parser
+    from diagnostics import Diagnostics
+
+    source = synthetic_program(statements)
+    rnd = random.Random(0)
+    kinds = ('replace', 'new line', 'new statement')
+    rows = []
+    for engine in ('yacc', 'descent'):
+        full_times = []
+        reparse_times = {kind: [] for kind in kinds}
+        reused = []
+
+        t = time.perf_counter()
+        parsed = parser.parse_incremental(source, lexer.IndentLexer(engine='scanner'), engine=engine)
+        initial = time.perf_counter() - t
+
+        for index in range(edits):
+            data = parsed.stream.data
+            kind = kinds[index % len(kinds)]
+
+            # Pick a random line containing an assignment without strings and edit it
+            pos = data.find(' = ', rnd.randint(0, len(data) - 100))
+            line_start = data.rfind('\n', 0, pos) + 1
+            line_end = data.find('\n', pos)
+            while '"' in data[line_start:line_end]:
+                pos = data.find(' = ', line_end)
+                line_start = data.rfind('\n', 0, pos) + 1
+                line_end = data.find('\n', pos)
+            if kind == 'replace':
+                # A digit of the line, or the whole value if there are none
+                digit = re.compile(r'\d').search(data, pos, line_end)
+                start, end, text = (digit.start(), digit.end(), '7') if digit else (pos + 3, line_end, '7')
+            elif kind == 'new line':
+                start, end, text = line_end, line_end, '\n' + ' ' * (len(data[line_start:pos]) - len(data[line_start:pos].lstrip())) + 'extra = 1'
+            else:
+                start = end = data.find('\n', line_end + 1) + 1
+                while not data[start].isalpha() or data.startswith(('elif', 'else'), start):
+                    start = end = data.find('\n', start) + 1
+                text = 'extra = 1\n'
+
+            old = set(map(id, parsed.program or []))
+            t = time.perf_counter()
+            parsed = parser.reparse(parsed, start, end, text, lexer.IndentLexer(engine='scanner'), engine=engine)
+            reparse_times[kind].append(time.perf_counter() - t)
+
+            diagnostics = Diagnostics()
+            t = time.perf_counter()
+            expected = parser.parse(parsed.stream.data, lexer.IndentLexer(engine='scanner'), diagnostics, engine=engine)
+            full_times.append(time.perf_counter() - t)
+
+            # A source with syntax errors has no incremental AST
+            if any(record.stage == 'parser' for record in diagnostics):
+                expected = None
+            if parsed.program != expected:
+                raise AssertionError(f"Incremental AST differs from a full parse (edit {kind} at {start})")
+            if expected is not None:
+                reused.append(sum(id(stmt) in old for stmt in parsed.program) / len(parsed.program))
+
+        full_ms = statistics.median(full_times) * 1000
+        rows.append([engine, "full parse", f"{full_ms:.1f}", "1.00x"])
+        rows.append([engine, "parse_incremental", f"{initial * 1000:.1f}", f"{full_ms / (initial * 1000):.2f}x"])
+        for kind, times in reparse_times.items():
+            ms = statistics.median(times) * 1000
+            rows.append([engine, f"reparse ({kind})", f"{ms:.2f}", f"{full_ms / ms:.0f}x"])
+        print(f"{engine}: {min(reused) * 100:.2f}% of the top-level statements reused at least")
+
+    print(f"Source: {statements} top-level statements, {len(source) / 1024:.0f} KB - {edits} edits per engine (median times)")
+    print_table(["ENGINE", "OPERATION", "TIME (ms)", "SPEEDUP"], rows)
+
+@benchmark
+def lazy_bodies(functions=2000, called=0.05):
+    """
+    Check-only mode on a library-style file where most functions are never called: time and memory of parsing and
+    analyzing it with the function bodies parsed eagerly and lazily (only when the semantic analyzer visits them).
+    The two modes must report the same errors.
+    """
+    import tracemalloc
+    import lexer
+    import parser
+    from diagnostics import Diagnostics
+    from semantic import SemanticAnalyzer
+
+    def run(source, lazy):
+        diagnostics = Diagnostics()
+        program = parser.parse(source, lexer.IndentLexer(engine='scanner'), diagnostics, engine='descent', lazy=lazy)
+        SemanticAnalyzer(diagnostics).analyze(program)
+        return program, diagnostics.messages()
+
+    # Valid programs, and programs with semantic errors in called and uncalled functions
+    for seed in range(10):
+        source = library_program(30, 0.3, seed)
+        broken = source.replace("    return p\n", "    return p + 's'\n", seed + 1)
+        for program in (source, broken):
+            if run(program, False)[1] != run(program, True)[1]:
+                raise AssertionError(f"Lazy parsing reported different errors for seed {seed}")
+    print("Differential check passed: the lazy mode reports the same errors.\n")
+
+    source = library_program(functions, called)
+    rows = []
+    for lazy in (False, True):
+        elapsed = best_time(lambda: run(source, lazy))
+        tracemalloc.start()
+        program, _ = run(source, lazy)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows.append(["lazy" if lazy else "eager", f"{elapsed * 1000:.1f}", f"{current / 1024 / 1024:.1f}",
+                     f"{peak / 1024 / 1024:.1f}"])
+        del program
+
+    print(f"Source: {functions} functions, {called:.0%} of them called, {source.count(chr(10))} lines")
+    print_table(["BODIES", "CHECK (ms)", "AST (MB)", "PEAK (MB)"], rows)
+    print(f"Check speedup: {float(rows[0][1]) / float(rows[1][1]):.2f}x, "
+          f"AST memory: {float(rows[1][2]) / float(rows[0][2]):.0%} of the eager one")
+
+@benchmark
+def symbol_ids(statements=40000, names=2000):
+    """
+    Identifier-heavy program: semantic analysis and code generation with scopes keyed by symbol ID vs by name,
+    and memory of the identifier strings in the AST with and without interning.
+    """
+    import dataclasses
+    import lexer
+    import parser
+    from semantic import SemanticAnalyzer
+    from codegen import CodeGenerator
+
+    rnd = random.Random(0)
+    pool = [f"customer_record_{index}" for index in range(names)]
+    lines = [f"{name} = {index}" for index, name in enumerate(pool)]
+    lines += [f"{rnd.choice(pool)} = {rnd.choice(pool)} + {rnd.choice(pool)} * {rnd.choice(pool)}" for _ in range(statements)]
+    source = "\n".join(lines) + "\n"
+
+    ast = parser.parser.parse(source, lexer=lexer.IndentLexer())
+
+    # Same tree without symbol IDs: the analyzers fall back to the names.
+    # The names are copied into new strings, as the lexer produced them before interning.
+    # The nodes are frozen, so the tree is rebuilt with dataclasses.replace.
+    def strip(node):
+        if isinstance(node, list):
+            return [strip(item) for item in node]
+        if dataclasses.is_dataclass(node):
+            changes = {}
+            for f in dataclasses.fields(node):
+                value = getattr(node, f.name)
+                if not f.repr:
+                    changes[f.name] = None
+                elif f.name == 'name':
+                    changes[f.name] = ''.join(value)
+                else:
+                    changes[f.name] = strip(value)
+            return dataclasses.replace(node, **changes)
+        return node
+    by_name = strip(ast)
+
+    def name_bytes(tree):
+        seen = {}
+        def walk(node):
+            if isinstance(node, list):
+                for item in node:
+                    walk(item)
+            elif dataclasses.is_dataclass(node):
+                for f in dataclasses.fields(node):
+                    value = getattr(node, f.name)
+                    if f.name == 'name':
+                        seen[id(value)] = sys.getsizeof(value)
+                    else:
+                        walk(value)
+        walk(tree)
+        return len(seen), sum(seen.values())
+
+    rows = []
+    for label, tree in (("symbol IDs", ast), ("names", by_name)):
+        semantic_ms = best_time(lambda: SemanticAnalyzer().visit(tree)) * 1000
+        codegen_ms = best_time(lambda: CodeGenerator().generate(tree)) * 1000
+        objects, size = name_bytes(tree)
+        rows.append([label, f"{semantic_ms:.1f}", f"{codegen_ms:.1f}", objects, f"{size / 1024:.0f}"])
+
+    print(f"Source: {len(lines)} statements, {names} distinct identifiers")
+    print_table(["SCOPE KEYS", "SEMANTIC (ms)", "CODEGEN (ms)", "NAME OBJECTS", "NAME MEMORY (KB)"], rows)
+
+@benchmark
+def garbage_input(size_mb=1):
+    """
+    Lexing of a binary input full of illegal characters: number of diagnostics records, memory and time,
+    with the runs of illegal characters collapsed and the records bounded by the limit.
+    """
+    import lexer
+    from diagnostics import Diagnostics
+
+    rnd = random.Random(0)
+    # Random bytes decoded as latin-1: mostly illegal characters, with some valid tokens and newlines in between
+    source = bytes(rnd.randrange(256) for _ in range(size_mb * 1024 * 1024)).decode('latin-1')
+
+    rows = []
+    for engine in ('ply', 'scanner'):
+        for limit in (100, 10 ** 9):
+            def run():
+                diagnostics = Diagnostics(limit=limit)
+                lex_obj = lexer.IndentLexer(engine=engine, diagnostics=diagnostics)
+                lex_obj.input(source)
+                for _ in iter(lex_obj.token, None):
+                    pass
+                return diagnostics
+
+            elapsed = best_time(run, repeat=1)
+            diagnostics = run()
+            rows.append([engine, limit if limit < 10 ** 9 else "unbounded", len(diagnostics.records),
+                         diagnostics.suppressed, f"{elapsed * 1000:.0f}"])
+
+    print(f"Source: {len(source) / 1024 / 1024:.1f} MB of random bytes")
+    print_table(["ENGINE", "LIMIT", "RECORDS", "SUPPRESSED", "TIME (ms)"], rows)
+
+@benchmark
+def parse_scaling(sizes=(1000, 10000, 100000)):
+    """
+    Parse time and peak memory of programs with a growing number of top-level statements, and of calls and
+    declarations with a growing number of arguments and parameters. With the lists built in place, the time and the
+    memory per item stay flat as the input grows.
+    """
+    import gc
+    import tracemalloc
+    import lexer
+    import parser
+
+    def measure(source):
+        # The garbage collector is disabled while timing (as timeit does): its full collections scan the whole growing
+        # heap and would hide the cost of the parser itself
+        gc.collect()
+        gc.disable()
+        try:
+            elapsed = best_time(lambda: parser.parse(source, lexer.IndentLexer(engine='scanner')), repeat=2)
+        finally:
+            gc.enable()
+        tracemalloc.start()
+        parser.parse(source, lexer.IndentLexer(engine='scanner'))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+
+    cases = []
+    for size in sizes:
+        cases.append(("statements", size, synthetic_program(size)))
+    for size in sizes:
+        args = ", ".join(f"x{index % 10}" for index in range(size))
+        cases.append(("call arguments", size, f"x0 = 1\nprint(f({args}))\n"))
+    for size in sizes:
+        params = ", ".join(f"p{index}" for index in range(size))
+        cases.append(("parameters", size, f"def f({params}):\n    return p0\n"))
+    cases.append(("elif chain", sizes[-1] // 10, "a = 1\nif a == 0:\n    a = 0\n" +
+                  "".join(f"elif a == {index}:\n    a = {index}\n" for index in range(1, sizes[-1] // 10)) + "else:\n    a = -1\n"))
+
+    rows = []
+    for label, size, source in cases:
+        elapsed, peak = measure(source)
+        rows.append([label, size, f"{elapsed * 1000:.0f}", f"{elapsed * 1e6 / size:.1f}", f"{peak / 1024 / 1024:.1f}",
+                     f"{peak / size:.0f}"])
+
+    print_table(["INPUT", "ITEMS", "PARSE (ms)", "US PER ITEM", "PEAK (MB)", "BYTES PER ITEM"], rows)
+
+@benchmark
+def error_recovery(programs=200, max_errors=5):
+    """
+    Compile passes needed to fix a corpus of broken programs: every program gets up to max_errors syntax errors in
+    different lines, and after every pass the reported errors are fixed, until a pass finds none. The DescentParser
+    stops at the first error, the yacc parser recovers and reports every error in the same pass.
+    """
+    import lexer
+    import parser
+    from diagnostics import Diagnostics
+
+    # Ways of breaking a line, with the test telling if they can be applied to it
+    breakers = [
+        (lambda line: ' = ' in line, lambda line: line.replace(' = ', ' = = ', 1)),
+        (lambda line: line.endswith(')'), lambda line: line[:-1]),
+        (lambda line: line.endswith(':'), lambda line: line[:-1]),
+        (lambda line: line.strip() and '#' not in line, lambda line: line + ' )'),
+    ]
+
+    rnd = random.Random(0)
+    corpus = []
+    for seed in range(programs):
+        lines = synthetic_program(30, seed).splitlines()
+        broken = {}
+        count = rnd.randint(1, max_errors)
+        for number in rnd.sample(range(len(lines)), len(lines)):
+            candidates = [breaker for test, breaker in breakers if test(lines[number])]
+            if candidates and len(broken) < count:
+                broken[number + 1] = lines[number]
+                lines[number] = rnd.choice(candidates)(lines[number])
+        corpus.append((lines, broken))
+
+    def syntax_errors(lines, engine):
+        diagnostics = Diagnostics()
+        parser.parse("\n".join(lines) + "\n", lexer.IndentLexer(engine='scanner'), diagnostics, engine=engine)
+        return [record.line for record in diagnostics if record.stage == 'parser']
+
+    # A broken first statement is recovered like the other ones: (source, lines of the errors, lines of the ErrorStat)
+    cases = [(")))\n)))\n", [1, 2], [1, 2]), ("x = = 1\ny = 2\nz = )\n", [1, 3], [1, 3]), ("if :\n    x = )\n", [1, 2], [1])]
+    for source, errors, skipped in cases:
+        diagnostics = Diagnostics()
+        program = parser.parse(source, diagnostics=diagnostics)
+        if ([record.line for record in diagnostics] != errors or
+                [stmt.line for stmt in program if isinstance(stmt, parser.ErrorStat)] != skipped):
+            raise AssertionError(f"Wrong recovery of the syntax errors of source:\n{source}")
+
+    rows = []
+    injected = sum(len(broken) for _, broken in corpus)
+    for engine in ('descent', 'yacc'):
+        passes = found = spurious = 0
+        t = time.perf_counter()
+        for lines, broken in corpus:
+            lines, broken = list(lines), dict(broken)
+            first = True
+            while True:
+                passes += 1
+                reported = syntax_errors(lines, engine)
+                if first:
+                    found += len(set(reported) & set(broken))
+                    spurious += len(set(reported) - set(broken))
+                    first = False
+                if not reported:
+                    break
+                # The reported lines are fixed, or the first broken one if the errors were reported elsewhere
+                fixed = sorted(broken.keys() & set(reported)) or [min(broken)]
+                for number in fixed:
+                    lines[number - 1] = broken.pop(number)
+        elapsed = time.perf_counter() - t
+        rows.append([engine, passes, f"{passes / programs:.2f}", f"{found}/{injected}", spurious, f"{elapsed * 1000:.0f}"])
+
+    print(f"Corpus: {programs} programs with 1 to {max_errors} syntax errors ({injected} in total)")
+    print_table(["ENGINE", "PASSES", "PASSES/PROGRAM", "FOUND IN 1ST PASS", "SPURIOUS", "TIME (ms)"], rows)
+    print(f"Passes saved with error recovery: {1 - rows[1][1] / rows[0][1]:.0%}")
+
+@benchmark
+def ast_memory(statements=40000):
+    """
+    Bytes per node and total memory of the AST of a large program, with the slotted node classes of the parser and with
+    plain dataclasses (one __dict__ per node) having the same fields.
+    Both trees are rebuilt from the same parsed tree, so they share the leaf values and differ only in the nodes.
+    """
+    import dataclasses
+    import tracemalloc
+    import parser
+
+    tree = parser.parse(synthetic_program(statements))
+    node_classes = [cls for cls in vars(parser).values() if isinstance(cls, type) and dataclasses.is_dataclass(cls)]
+    plain = {
+        cls: dataclasses.make_dataclass(cls.__name__, [(f.name, f.type, f) for f in dataclasses.fields(cls)])
+        for cls in node_classes
+    }
+
+    def rebuild(node, classes):
+        if isinstance(node, list):
+            return [rebuild(item, classes) for item in node]
+        if dataclasses.is_dataclass(node):
+            values = [rebuild(getattr(node, f.name), classes) for f in dataclasses.fields(node)]
+            return classes.get(type(node), type(node))(*values)
+        return node
+
+    def collect(node, nodes):
+        if isinstance(node, list):
+            for item in node:
+                collect(item, nodes)
+        elif dataclasses.is_dataclass(node):
+            nodes.append(node)
+            for f in dataclasses.fields(node):
+                collect(getattr(node, f.name), nodes)
+        return nodes
+
+    def node_bytes(node):
+        return sys.getsizeof(node) + (sys.getsizeof(node.__dict__) if hasattr(node, '__dict__') else 0)
+
+    rows = []
+    for label, classes in (("dataclass", plain), ("slotted", {})):
+        tracemalloc.start()
+        rebuilt = rebuild(tree, classes)
+        total = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        nodes = collect(rebuilt, [])
+        per_node = sum(node_bytes(node) for node in nodes) / len(nodes)
+        rows.append([label, len(nodes), f"{per_node:.0f}", f"{total / 1024 / 1024:.1f}"])
+        del rebuilt, nodes
+
+    print(f"Source: {statements} top-level statements")
+    print_table(["NODES", "COUNT", "BYTES PER NODE", "AST MEMORY (MB)"], rows)
+
+@benchmark
+def shared_nodes(statements=40000):
+    """
+    Memory of the AST of a large program with and without the hash-consing of the leaves and of the pure subexpressions
+    (parse(share=True)), number of node objects against node occurrences, and parse time with both parser engines.
+    The shared trees must be equal to the plain ones and give the same JavaScript.
+    """
+    import dataclasses
+    import tracemalloc
+    import lexer
+    import parser
+    from codegen import CodeGenerator
+
+    source = synthetic_program(statements)
+
+    def count(node, seen):
+        """Returns the node occurrences of the tree, collecting the distinct node objects in seen"""
+        if isinstance(node, list):
+            return sum(count(item, seen) for item in node)
+        if dataclasses.is_dataclass(node):
+            seen.add(id(node))
+            return 1 + sum(count(getattr(node, f.name), seen) for f in dataclasses.fields(node))
+        return 0
+
+    rows = []
+    trees = {}
+    for engine in ('yacc', 'descent'):
+        for share in (False, True):
+            def run():
+                return parser.parse(source, lexer.IndentLexer(engine='scanner'), engine=engine, share=share)
+
+            elapsed = best_time(run, repeat=2)
+            tracemalloc.start()
+            tree = run()
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            seen = set()
+            occurrences = count(tree, seen)
+            trees[engine, share] = tree
+            rows.append([engine, "shared" if share else "tree", occurrences, len(seen),
+                         f"{memory / 1024 / 1024:.1f}", f"{elapsed * 1000:.0f}"])
+
+    for engine in ('yacc', 'descent'):
+        plain, shared = trees[engine, False], trees[engine, True]
+        if plain != shared or CodeGenerator().generate(plain) != CodeGenerator().generate(shared):
+            raise AssertionError(f"The shared nodes changed the AST of the {engine} parser")
+    print("Shared trees equal to the plain ones, same JavaScript.")
+
+    print(f"Source: {statements} top-level statements")
+    print_table(["ENGINE", "AST", "NODES", "OBJECTS", "MEMORY (MB)", "PARSE (ms)"], rows)
+    print(f"Memory saved: {1 - float(rows[1][4]) / float(rows[0][4]):.0%} (yacc), "
+          f"{1 - float(rows[3][4]) / float(rows[2][4]):.0%} (descent)")
+
+@benchmark
+def arena(statements=40000):
+    """
+    Memory of the AST of a large program as a tree of dataclasses and as a flat Arena, time of the parsing into each of
+    them (the parser builds the arena directly, see parse(arena=True), instead of converting the tree with
+    Arena.from_tree), and time of the semantic analysis and of the code generation walking each representation, both
+    recursively and with the explicit stack. The arena walkers must give the diagnostics and the JavaScript of the tree ones.
+    """
+    import tracemalloc
+    import parser
+    from ast_arena import Arena
+    from diagnostics import Diagnostics
+    from semantic import SemanticAnalyzer
+    from codegen import CodeGenerator
+
+    source = synthetic_program(statements)
+
+    def memory(run):
+        tracemalloc.start()
+        result = run()
+        size = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+        tracemalloc.stop()
+        return result, size
+
+    tree, tree_mb = memory(lambda: parser.parse(source))
+    flat, arena_mb = memory(lambda: parser.parse(source, arena=True))
+
+    tree_parse_ms = best_time(lambda: parser.parse(source), repeat=2) * 1000
+    arena_parse_ms = best_time(lambda: parser.parse(source, arena=True), repeat=2) * 1000
+    to_arena_ms = best_time(lambda: Arena.from_tree(tree), repeat=2) * 1000
+    to_tree_ms = best_time(flat.to_tree, repeat=2) * 1000
+
+    def analyze(iterative, use_arena):
+        analyzer = SemanticAnalyzer(diagnostics=Diagnostics(), iterative=iterative)
+        (analyzer.analyze_arena if use_arena else analyzer.analyze)(flat if use_arena else tree)
+        return analyzer.diagnostics.records
+
+    def generate(iterative, use_arena):
+        codegen = CodeGenerator(iterative=iterative)
+        return codegen.generate_arena(flat) if use_arena else codegen.generate(tree)
+
+    rows = []
+    for iterative in (False, True):
+        if analyze(iterative, True) != analyze(iterative, False) or generate(iterative, True) != generate(iterative, False):
+            raise AssertionError("The arena walkers gave results different from the tree ones")
+        for use_arena in (False, True):
+            rows.append(["arena" if use_arena else "tree", "iterative" if iterative else "recursive",
+                         f"{best_time(lambda: analyze(iterative, use_arena)) * 1000:.1f}",
+                         f"{best_time(lambda: generate(iterative, use_arena)) * 1000:.1f}"])
+    print("Arena walkers equal to the tree ones (diagnostics and JavaScript).")
+
+    print(f"Source: {statements} top-level statements, {len(flat)} arena nodes")
+    print_table(["AST", "MEMORY (MB)", "PARSE (ms)"],
+                [["tree", f"{tree_mb:.1f}", f"{tree_parse_ms:.0f}"],
+                 ["arena (parser)", f"{arena_mb:.1f}", f"{arena_parse_ms:.0f}"],
+                 ["arena (from_tree)", "-", f"{tree_parse_ms + to_arena_ms:.0f}"]])
+    print_table(["AST", "WALK", "SEMANTIC (ms)", "CODEGEN (ms)"], rows)
+    print(f"Conversion: tree -> arena {to_arena_ms:.1f} ms, arena -> tree {to_tree_ms:.1f} ms")
+
+@benchmark
+def traversal(statements=40000):
+    """
+    Time of the tree walkers on the AST of a large program, all dispatching through visitor.Visitor.
+    The dispatch itself is measured with a walker counting the nodes, written with a match statement over the node
+    classes (in the order used by the analyzers) and with a Visitor dispatch table.
+    """
+    import gc
+    import parser
+    import semantic
+    import semantic_static
+    from codegen import CodeGenerator
+    from parser import (Number, String, Boolean, Var, BinOp, UnaryOp, AssignStat, PrintStat, IfStat, ForStat,
+                        InputExpr, FunctionDecl, FunctionCall, ExprStat, ReturnStat, ErrorStat)
+    from visitor import Visitor, handles
+
+    def match_count(node):
+        match node:
+            case list(statements): return sum(match_count(stmt) for stmt in statements)
+            case Number(_) | String(_) | Boolean(_) | InputExpr(_): return 1
+            case AssignStat(_, value): return 1 + match_count(value)
+            case Var(_): return 1
+            case BinOp(left, _, right): return 1 + match_count(left) + match_count(right)
+            case UnaryOp(_, expr): return 1 + match_count(expr)
+            case PrintStat(value) | ExprStat(value): return 1 + match_count(value)
+            case ReturnStat(value): return 1 + match_count(value)
+            case IfStat(condition, true_block, false_block):
+                return 1 + match_count(condition) + match_count(true_block) + match_count(false_block or [])
+            case ForStat(_, start, end, body): return 1 + match_count(start) + match_count(end) + match_count(body)
+            case FunctionDecl(_, _, body): return 1 + match_count(body)
+            case FunctionCall(_, args): return 1 + match_count(args)
+            case ErrorStat(_): return 1
+            case _: raise Exception(f"Unknown AST node: '{node}'")
+
+    class Counter(Visitor):
+        @handles(list)
+        def block(self, statements): return sum(self.visit(stmt) for stmt in statements)
+        @handles(Number, String, Boolean, InputExpr, Var, ErrorStat)
+        def leaf(self, node): return 1
+        @handles(AssignStat, PrintStat, ReturnStat)
+        def value(self, node): return 1 + self.visit(node.value)
+        @handles(ExprStat)
+        def expr(self, node): return 1 + self.visit(node.expr)
+        @handles(BinOp)
+        def binop(self, node): return 1 + self.visit(node.left) + self.visit(node.right)
+        @handles(UnaryOp)
+        def unary(self, node): return 1 + self.visit(node.expr)
+        @handles(IfStat)
+        def if_(self, node):
+            return 1 + self.visit(node.condition) + self.visit(node.true_block) + self.visit(node.false_block or [])
+        @handles(ForStat)
+        def for_(self, node): return 1 + self.visit(node.start) + self.visit(node.end) + self.visit(node.body)
+        @handles(FunctionDecl)
+        def function(self, node): return 1 + self.visit(node.body)
+        @handles(FunctionCall)
+        def call(self, node): return 1 + self.visit(node.args)
+
+    tree = parser.parse(synthetic_program(statements))
+    if match_count(tree) != Counter().visit(tree):
+        raise AssertionError("The two counting walkers disagree")
+
+    walkers = [
+        ("semantic.py", lambda: semantic.SemanticAnalyzer().analyze(tree)),
+        ("semantic_static.py", lambda: semantic_static.SemanticAnalyzer().analyze(tree)),
+        ("codegen.py", lambda: CodeGenerator().generate(tree)),
+    ]
+    try:
+        import ast_viz
+
+        class Sink:
+            """Records nothing: only the walk of the visualizer is timed, not Graphviz"""
+            def node(self, *args, **kwargs): pass
+            def edge(self, *args, **kwargs): pass
+
+        walkers.append(("ast_viz.py", lambda: [ast_viz.ASTVisualizer()._visit(Sink(), stmt, "ROOT") for stmt in tree]))
+    except ImportError:
+        print("graphviz is not installed: the AST visualizer is not timed.")
+
+    # The collector is disabled while timing, as in parse_scaling
+    gc.collect()
+    gc.disable()
+    try:
+        match_ms = best_time(lambda: match_count(tree)) * 1000
+        table_ms = best_time(lambda: Counter().visit(tree)) * 1000
+        rows = [[label, f"{best_time(walk) * 1000:.1f}"] for label, walk in walkers]
+    finally:
+        gc.enable()
+
+    print(f"Source: {statements} top-level statements, {match_count(tree)} nodes")
+    print_table(["WALKER", "TIME (ms)"], rows)
+    print(f"Node counting: match {match_ms:.1f} ms, dispatch table {table_ms:.1f} ms ({match_ms / table_ms:.2f}x)")
+
+@benchmark
+def deep_nesting(terms=100000, unary=100000, blocks=1500):
+    """
+    Recursive and iterative (explicit stack) walkers on very deep trees: a sum of many terms (a left-leaning chain of
+    BinOp), a chain of unary minus and if statements nested in each other (their source and their JavaScript grow with
+    the square of the depth, because of the indentation).
+    The recursive walkers fail with RecursionError. The iterative ones must give the same results as the recursive
+    ones on the same inputs made shallow enough for the recursion limit.
+    """
+    import parser
+    import semantic
+    import semantic_static
+    from codegen import CodeGenerator
+
+    def inputs(terms, unary, blocks):
+        return [
+            ("sum", terms, "a = 1\nx = " + " + ".join(["a"] * terms) + "\nprint(x)\n"),
+            ("unary minus", unary, "a = 1\nx = " + "-" * unary + "a\nprint(x)\n"),
+            # One space of indentation per level, so the source grows as blocks^2 / 2
+            ("nested if", blocks, "a = 1\n" + "".join(f"{' ' * level}if a < {level}:\n" for level in range(blocks))
+             + f"{' ' * blocks}a = a + 1\nprint(a)\n"),
+        ]
+
+    def walkers(iterative):
+        walkers = [
+            ("semantic.py", lambda tree: semantic.SemanticAnalyzer(iterative=iterative).analyze(tree)),
+            ("semantic_static.py", lambda tree: semantic_static.SemanticAnalyzer(iterative=iterative).analyze(tree)),
+            ("codegen.py", lambda tree: CodeGenerator(iterative=iterative).generate(tree)),
+        ]
+        try:
+            import ast_viz
+
+            class Recorder:
+                """Records the graph instead of passing it to Graphviz"""
+                def __init__(self): self.calls = []
+                def node(self, *args, **kwargs): self.calls.append(('node', args, kwargs))
+                def edge(self, *args, **kwargs): self.calls.append(('edge', args, kwargs))
+
+            def visualize(tree):
+                visualizer, dot = ast_viz.ASTVisualizer(iterative=iterative), Recorder()
+                walk = visualizer._walk if iterative else visualizer._visit
+                for stmt in tree:
+                    walk(dot, stmt, "ROOT")
+                return dot.calls
+            walkers.append(("ast_viz.py", visualize))
+        except ImportError:
+            pass
+        return walkers
+
+    # Same results on inputs the recursive walkers can handle
+    for label, depth, source in inputs(200, 200, 60):
+        tree = parser.parse(source)
+        for (name, recursive), (_, iterative) in zip(walkers(False), walkers(True)):
+            if recursive(tree) != iterative(tree):
+                raise AssertionError(f"Different results of the recursive and iterative {name} on the {label} input")
+    print("Iterative walkers equal to the recursive ones.")
+
+    rows = []
+    for label, depth, source in inputs(terms, unary, blocks):
+        tree = parser.parse(source)
+        for (name, recursive), (_, iterative) in zip(walkers(False), walkers(True)):
+            try:
+                recursive(tree)
+                recursive_ms = f"{best_time(lambda: recursive(tree), repeat=1) * 1000:.0f}"
+            except RecursionError:
+                recursive_ms = "RecursionError"
+            rows.append([label, depth, name, recursive_ms, f"{best_time(lambda: iterative(tree), repeat=1) * 1000:.0f}"])
+
+    print(f"Recursion limit: {sys.getrecursionlimit()}")
+    print_table(["INPUT", "DEPTH", "WALKER", "RECURSIVE (ms)", "ITERATIVE (ms)"], rows)
+
+@benchmark
+def scope_depth(depths=(10, 100, 1000), block_depths=(10, 50, 200), uses=10000):
+    """
+    Semantic analysis and code generation of programs whose variable uses sit below a growing number of scopes, with the
+    symbol table of symbol_table.SymbolTable and with a stack of dictionaries searched from the innermost scope (the
+    previous implementation). The results must be the same.
+    - semantic: a chain of functions, each one calling the next, the last one reading the global variables
+    - codegen: nested if statements, the innermost one assigning the global variables. Their depths are smaller, as the
+      indentation makes the code of nested blocks grow with the square of the depth.
+    The iterative walkers are used, so the depth isn't limited by the recursion limit.
+    """
+    import parser
+    from semantic import SemanticAnalyzer
+    from codegen import CodeGenerator
+    from diagnostics import Diagnostics
+    from symbol_table import SymbolTable
+
+    class ScopeStack:
+        """Previous symbol table: one dictionary per scope, looked up from the innermost one"""
+        def __init__(self): self.scopes = [{}]
+        def __len__(self): return len(self.scopes)
+        def __contains__(self, key): return any(key in scope for scope in self.scopes)
+        def enter(self): self.scopes.append({})
+        def exit(self): self.scopes.pop()
+        def define(self, key, value): self.scopes[-1][key] = value
+        def lookup(self, key):
+            for scope in reversed(self.scopes):
+                if key in scope:
+                    return scope[key]
+            return None
+
+    names = [f"g{index}" for index in range(50)]
+    rnd = random.Random(0)
+
+    def call_chain(depth):
+        lines = [f"{name} = {index}" for index, name in enumerate(names)]
+        body = [f"    t = {' + '.join(rnd.choice(names) for _ in range(10))}" for _ in range(uses // 10)]
+        lines += [f"def f{depth}():"] + body + ["    return t"]
+        for level in reversed(range(depth)):
+            lines += [f"def f{level}():", f"    return f{level + 1}()"]
+        return "\n".join(lines + ["print(f0())"]) + "\n"
+
+    def nested_ifs(depth):
+        lines = [f"{name} = {index}" for index, name in enumerate(names)]
+        lines += [f"{' ' * level}if g0 < {level}:" for level in range(depth)]
+        lines += [f"{' ' * depth}{rnd.choice(names)} = {index}" for index in range(uses)]
+        return "\n".join(lines) + "\n"
+
+    def analyze(tree, table):
+        analyzer = SemanticAnalyzer(Diagnostics(), iterative=True)
+        analyzer.symbol_table = table()
+        analyzer.analyze(tree)
+        return [str(record) for record in analyzer.diagnostics.records]
+
+    def generate(tree, table):
+        generator = CodeGenerator(iterative=True)
+        generator.scopes = table()
+        return generator.generate(tree)
+
+    cases = [("semantic", depth, call_chain(depth), analyze) for depth in depths]
+    cases += [("codegen", depth, nested_ifs(depth), generate) for depth in block_depths]
+
+    rows = []
+    for label, depth, source, run in cases:
+        tree = parser.parse(source)
+        if run(tree, SymbolTable) != run(tree, ScopeStack):
+            raise AssertionError(f"Different {label} results with the two symbol tables at depth {depth}")
+        stack_ms = best_time(lambda: run(tree, ScopeStack)) * 1000
+        table_ms = best_time(lambda: run(tree, SymbolTable)) * 1000
+        rows.append([label, depth, f"{stack_ms:.1f}", f"{table_ms:.1f}", f"{stack_ms / table_ms:.2f}x"])
+
+    print(f"{uses} variable uses below the scopes, same results with both symbol tables")
+    print_table(["WALKER", "SCOPES", "DICT STACK (ms)", "SYMBOL TABLE (ms)", "SPEEDUP"], rows)
+
+@benchmark
+def inference_cache(functions=400, helpers=40, statements=20):
+    """
+    Semantic analysis of an unchanged library analyzed again with an inference_cache.InferenceCache: without the cache,
+    with a cold one, with the one filled by the previous analysis (on the same tree, on a tree parsed again and loaded
+    from its file) and with one bounded to fewer entries than the library needs. The functions call helpers with several
+    argument types, so every helper body is inferred once for each of them. Every analysis must report the same errors
+    as the one without the cache.
+    """
+    import parser
+    from diagnostics import Diagnostics
+    from semantic import SemanticAnalyzer
+    from inference_cache import InferenceCache
+
+    def run(tree, cache):
+        diagnostics = Diagnostics()
+        SemanticAnalyzer(diagnostics, inference_cache=cache).analyze(tree)
+        return diagnostics.messages()
+
+    # Same errors with the cache, filled by the other programs of the corpus too
+    shared = InferenceCache()
+    for seed in range(100):
+        for source in (library_program(20, 0.5, seed), synthetic_program(30, seed), random_statements(30, seed)):
+            tree = parser.parse(source, diagnostics=Diagnostics())
+            if tree is not None and not run(tree, None) == run(tree, shared) == run(tree, shared):
+                raise AssertionError(f"The inference cache changed the errors of seed {seed}:\n{source[:200]}")
+    print(f"Differential check passed: {shared.hits} hits, {shared.misses} misses.\n")
+
+    # Helpers calling the previous ones, and functions calling the helpers with argument types picked among 8 tuples
+    rnd = random.Random(0)
+    values = ['1', '"s"', 'True']
+    lines = ["base = 1", "def h0(p, q):", "    return p"]
+    for index in range(1, helpers):
+        callee = f"h{rnd.randrange(index)}"
+        lines += [f"def h{index}(p, q):", f"    r = {callee}(q, p)", f"    t = {callee}(p, base)"]
+        lines += [f"    v{step} = {rnd.choice(['p', 'q', 'base'])} {rnd.choice(['==', '!=', 'and'])} {rnd.choice(['r', 't'])}"
+                  for step in range(statements)]
+        lines += ["    if p == q:", "        return r", "    return t"]
+    for index in range(functions):
+        lines.append(f"def lib{index}(p):")
+        lines += [f"    x = h{rnd.randrange(helpers)}({rnd.choice(values)}, {rnd.choice(values)})" for _ in range(3)]
+        lines.append("    return x")
+        lines.append(f"print(lib{index}({rnd.choice(values)}))")
+    source = "\n".join(lines) + "\n"
+    tree = parser.parse(source)
+
+    def measure(label, tree, cache_factory):
+        caches = [cache_factory() for _ in range(3)]
+        elapsed = best_time(lambda: run(tree, caches.pop()))
+        cache = cache_factory()
+        if cache is None:
+            return [label, f"{elapsed * 1000:.1f}", "-", "-", "-", "-"]
+        run(tree, cache)
+        return [label, f"{elapsed * 1000:.1f}", cache.hits, cache.misses, len(cache), cache.evictions]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'inference.json')
+        warm = InferenceCache(path=path)
+        run(tree, warm)
+        warm.save()
+        warm.hits = warm.misses = 0
+
+        def bounded():
+            cache = InferenceCache(max_entries=len(warm) // 4)
+            run(tree, cache)
+            cache.hits = cache.misses = cache.evictions = 0
+            return cache
+
+        rows = [
+            measure("no cache", tree, lambda: None),
+            measure("cold", tree, InferenceCache),
+            measure("warm (same tree)", tree, lambda: warm),
+            measure("warm (file)", parser.parse(source), lambda: InferenceCache(path=path)),
+            measure(f"bounded ({len(warm) // 4})", tree, bounded),
+        ]
+        file_kb = os.path.getsize(path) / 1024
+
+    print(f"Source: {functions} functions calling {helpers} helpers of {statements} statements - cache file: {file_kb:.0f} KB")
+    print_table(["CACHE", "SEMANTIC (ms)", "HITS", "MISSES", "ENTRIES", "EVICTIONS"], rows)
+    print(f"Warm speedup: {float(rows[0][1]) / float(rows[2][1]):.2f}x (same tree), "
+          f"{float(rows[0][1]) / float(rows[3][1]):.2f}x (file, loading excluded)")
+
+@benchmark
+def analysis_budget(params=(2, 3, 4, 5, 6), functions=30):
+    """
+    Semantic analysis of pathological call graphs: a chain of functions, each one calling the next with its arguments
+    rotated and with new int, str and bool values, so every function is analyzed for up to 3^params argument types.
+    Time and body visits without limits and with the default semantic.AnalysisBudget, whose widening keeps them bounded.
+    On a generated corpus the bounded analysis must report a subset of the errors of the unbounded one, and the same
+    errors when the limits are never reached.
+    """
+    import parser
+    from diagnostics import Diagnostics
+    from semantic import SemanticAnalyzer, AnalysisBudget
+
+    def run(tree, budget):
+        diagnostics = Diagnostics()
+        SemanticAnalyzer(diagnostics, budget=budget).analyze(tree)
+        return diagnostics.messages()
+
+    corpus = [library_program(20, 0.5, seed) for seed in range(30)] + [random_statements(30, seed) for seed in range(100)]
+    for index, source in enumerate(corpus):
+        tree = parser.parse(source, diagnostics=Diagnostics())
+        if tree is None:
+            continue
+        unbounded, budget = run(tree, None), AnalysisBudget(max_specializations=2, max_visits=50, max_depth=3)
+        bounded = run(tree, budget)
+        if not set(bounded) <= set(unbounded):
+            raise AssertionError(f"The budget added errors to program {index}:\n{source[:200]}")
+        if not budget.widened and not budget.cut and bounded != unbounded:
+            raise AssertionError(f"The budget changed the errors of program {index} without widening")
+    print(f"Subset check passed on {len(corpus)} programs.\n")
+
+    def pathological(count):
+        names = [f"a{index}" for index in range(count)]
+        rotated = ", ".join(names[1:] + names[:1])
+        shifted = ", ".join(names[:-1])
+        lines = []
+        for level in range(functions):
+            lines.append(f"def h{level}({', '.join(names)}):")
+            if level + 1 < functions:
+                lines += [f"    h{level + 1}({rotated})"]
+                lines += [f"    h{level + 1}({value}, {shifted})" for value in ('1', '"s"', 'True')]
+            lines.append("    return a0")
+        lines.append(f"print(h0({', '.join(['1'] * count)}))")
+        return "\n".join(lines) + "\n"
+
+    rows = []
+    for count in params:
+        tree = parser.parse(pathological(count))
+        results = []
+        for budget in (AnalysisBudget(None, None, None), AnalysisBudget()):
+            elapsed = best_time(lambda: run(tree, budget), repeat=1)
+            budget.visits = budget.widened = budget.cut = 0
+            run(tree, budget)
+            results.append((elapsed, budget))
+        (free_time, free), (bounded_time, bounded) = results
+        rows.append([count, free.visits, f"{free_time * 1000:.0f}", bounded.visits, f"{bounded_time * 1000:.0f}",
+                     bounded.widened])
+
+    default = AnalysisBudget()
+    print(f"Chain of {functions} functions - default budget: {default.max_specializations} specializations, "
+          f"{default.max_visits} visits, depth {default.max_depth}")
+    print_table(["PARAMS", "VISITS", "UNBOUNDED (ms)", "VISITS (BUDGET)", "BUDGET (ms)", "WIDENED"], rows)
+
+@benchmark
+def semantic_strategies():
+    """
+    Harness of semantic_bench.py: semantic.py and semantic_static.py on generated programs of growing function count,
+    call fan-out, argument type diversity and nesting (run semantic_bench.py directly to save and compare the results).
+    """
+    import semantic_bench
+
+    print("Programs: <functions>f x<fan-out> t<argument types> n<nesting>")
+    semantic_bench.print_results(semantic_bench.run())
+
+@benchmark
+def incremental_check(functions=2000, edits=20):
+    """
+    Edit-to-diagnostics latency of the semantic analysis in a large library-style file updated with reparse(): a new
+    SemanticAnalyzer on the whole program vs semantic.IncrementalAnalyzer, which analyzes again only the top-level
+    statements depending on the edited ones. The edits change the body of a function or the argument of a top-level
+    call. After every edit both analyzers must report the same errors.
+    """
+    import lexer
+    import parser
+    from diagnostics import Diagnostics
+    from semantic import SemanticAnalyzer, IncrementalAnalyzer
+
+    source = library_program(functions, 1.0)
+    rnd = random.Random(0)
+    kinds = ('function body', 'call argument')
+    full_times = []
+    times = {kind: [] for kind in kinds}
+    rechecked = {kind: [] for kind in kinds}
+
+    parsed = parser.parse_incremental(source, lexer.IndentLexer(engine='scanner'))
+    initial = best_time(lambda: IncrementalAnalyzer().analyze(parsed.program))
+    analyzer = IncrementalAnalyzer()
+    analyzer.analyze(parsed.program)
+
+    for index in range(edits):
+        data = parsed.stream.data
+        kind = kinds[index % len(kinds)]
+        target = rnd.randrange(functions)
+        if kind == 'function body':
+            # The last line of the body returns p, p * 2 or p + 's' (an error)
+            start = data.index("    return p", data.index(f"def lib{target}(p):"))
+            end = data.index("\n", start)
+            text = rnd.choice(["    return p", "    return p * 2", "    return p + 's'"])
+        else:
+            start = data.index(f"print(lib{target}(") + len(f"print(lib{target}(")
+            end = data.index(")", start)
+            text = rnd.choice([str(target), "'s'", "True"])
+
+        parsed = parser.reparse(parsed, start, end, text, lexer.IndentLexer(engine='scanner'))
+        program = parsed.program
+
+        diagnostics = Diagnostics()
+        t = time.perf_counter()
+        SemanticAnalyzer(diagnostics).analyze(program)
+        full_times.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        analyzer.analyze(program)
+        times[kind].append(time.perf_counter() - t)
+        rechecked[kind].append(analyzer.rechecked)
+
+        if analyzer.diagnostics.messages() != diagnostics.messages():
+            raise AssertionError(f"The incremental analysis reported different errors after edit {index} ({kind})")
+    print(f"Same errors as the full analysis after {edits} edits.")
+
+    full_ms = statistics.median(full_times) * 1000
+    rows = [["full analysis", f"{full_ms:.1f}", len(parsed.program), "1.00x"],
+            ["first incremental", f"{initial * 1000:.1f}", len(parsed.program), f"{full_ms / (initial * 1000):.2f}x"]]
+    for kind in kinds:
+        ms = statistics.median(times[kind]) * 1000
+        rows.append([f"edit ({kind})", f"{ms:.2f}", max(rechecked[kind]), f"{full_ms / ms:.0f}x"])
+
+    print(f"Source: {functions} functions, {len(parsed.program)} top-level statements - {edits} edits (median times)")
+    print_table(["ANALYSIS", "TIME (ms)", "RECHECKED (MAX)", "SPEEDUP"], rows)
+
+@benchmark
+def analysis_profile(functions=400):
+    """
+    Cost of the opt-in instrumentation of the semantic analysis (semantic.AnalysisProfile): time of SemanticAnalyzer without
+    and with a profile, in recursive and iterative mode, on a generated program of semantic_bench.py. The errors must be
+    the same with the profile, which is then printed as a summary.
+    """
+    import parser
+    import semantic_bench
+    from diagnostics import Diagnostics
+    from semantic import SemanticAnalyzer, AnalysisProfile
+
+    def run(tree, iterative, profile):
+        diagnostics = Diagnostics()
+        SemanticAnalyzer(diagnostics, iterative=iterative, profile=profile).analyze(tree)
+        return diagnostics.messages()
+
+    for seed in range(100):
+        tree = parser.parse(random_statements(30, seed), diagnostics=Diagnostics())
+        if tree is not None and run(tree, False, None) != run(tree, False, AnalysisProfile()):
+            raise AssertionError(f"The profile changed the errors of seed {seed}")
+    print("Same errors with and without the profile.\n")
+
+    tree = parser.parse(semantic_bench.generate_program(functions, 4, 3, 2))
+    rows = []
+    for iterative in (False, True):
+        # Interleaved, so both take the same share of the noise of the machine
+        off = on = float('inf')
+        for _ in range(10):
+            off = min(off, best_time(lambda: run(tree, iterative, None), repeat=1))
+            on = min(on, best_time(lambda: run(tree, iterative, AnalysisProfile()), repeat=1))
+        rows.append(["iterative" if iterative else "recursive", f"{off * 1000:.1f}", f"{on * 1000:.1f}",
+                     f"{(on / off - 1) * 100:+.0f}%"])
+
+    print(f"Source: {functions} functions, call fan-out 4, 3 argument types, nesting 2")
+    print_table(["WALKER", "NO PROFILE (ms)", "PROFILE (ms)", "OVERHEAD"], rows)
+
+    profile = AnalysisProfile()
+    run(tree, False, profile)
+    print(profile.summary(limit=5))
+
+@benchmark
+def parallel_codegen(functions=400, statements=40):
+    """
+    Speedup of the code generation of an arena with the top-level functions translated by worker processes
+    (CodeGenerator.generate_parallel) over the serial one, for every number of workers up to the cores of the machine, with
+    a new pool at every compilation and with a pool reused across them.
+    Then the break-even: the tasks of the workers are pickled, run and timed one by one in this process, and the time on N
+    cores with a reused pool is estimated as the time of the main process (pickling included) plus the slowest task.
+    Before timing, the parallel code must be identical to the serial one over a generated corpus.
+    """
+    import pickle
+    import parser
+    from codegen import CodeGenerator
+    from concurrent.futures import ProcessPoolExecutor
+
+    corpus = [random_statements(40, seed) for seed in range(100)] + [library_program(30, 0.2, seed) for seed in range(20)]
+    checked = 0
+    with ProcessPoolExecutor(3) as pool:
+        for source in corpus:
+            # A function assigning a global declared before it
+            arena = parser.parse("a = 0\n" + source + "def last(p):\n    a = p\n    return a\n", arena=True)
+            if arena is None:
+                continue
+            serial = CodeGenerator().generate_arena(arena)
+            for workers in (2, 3):
+                if CodeGenerator().generate_parallel(arena, workers, pool) != serial:
+                    raise AssertionError(f"The parallel code differs from the serial one for source:\n{source[:200]}")
+            checked += 1
+    print(f"Same code as the serial generator on {checked} programs.")
+
+    def functions_program(count, size):
+        rnd = random.Random(0)
+        lines = []
+        for index in range(count):
+            lines.append(f"def fn{index}(p):")
+            lines += ['    ' + line if line else line
+                      for line in synthetic_program(rnd.randint(size // 2, size), index).splitlines()]
+            lines.append("    return p")
+        return parser.parse("\n".join(lines) + "\n", arena=True)
+
+    class InlineExecutor:
+        """Runs the tasks here one by one, as a pool would pickle them: a task is timed with the unpickling of its part"""
+        def __init__(self):
+            self.tasks = []
+            self.sizes = []
+
+        def map(self, func, tasks):
+            results = []
+            for task in tasks:
+                data = pickle.dumps(task, protocol=pickle.HIGHEST_PROTOCOL)
+                start = time.perf_counter()
+                results.append(func(pickle.loads(data)))
+                self.tasks.append(time.perf_counter() - start)
+                self.sizes.append(len(data))
+            return results
+
+    cores = os.cpu_count() or 1
+    arena = functions_program(functions, statements)
+    serial = best_time(lambda: CodeGenerator().generate_arena(arena))
+    rows = [["1 (serial)", f"{serial * 1000:.1f}", "-", "1.00x", "-"]]
+    for workers in sorted({2, 4, cores} - {1}):
+        cold = best_time(lambda: CodeGenerator().generate_parallel(arena, workers))
+        with ProcessPoolExecutor(workers) as pool:
+            CodeGenerator().generate_parallel(arena, workers, pool)  # starts the processes
+            warm = best_time(lambda: CodeGenerator().generate_parallel(arena, workers, pool))
+        rows.append([workers, f"{cold * 1000:.1f}", f"{warm * 1000:.1f}", f"{serial / cold:.2f}x", f"{serial / warm:.2f}x"])
+
+    print(f"Source: {functions} functions of {statements // 2} to {statements} top-level statements each, {len(arena)} nodes, "
+          f"{cores} cores")
+    print(f"Whole arena: {len(pickle.dumps(arena, protocol=pickle.HIGHEST_PROTOCOL)) / 1024:.0f} KB pickled")
+    print_table(["WORKERS", "NEW POOL (ms)", "REUSED POOL (ms)", "SPEEDUP (NEW)", "SPEEDUP (REUSED)"], rows)
+
+    rows = []
+    for count, size in ((50, 10), (400, 4), (400, 40)):
+        arena = functions_program(count, size)
+        serial = best_time(lambda: CodeGenerator().generate_arena(arena))
+        estimates = []
+        for workers in (2, 4, 8, 16):
+            best = None
+            for _ in range(3):
+                executor = InlineExecutor()
+                start = time.perf_counter()
+                CodeGenerator().generate_parallel(arena, workers, executor)
+                main = time.perf_counter() - start - sum(executor.tasks)
+                estimate = main + max(executor.tasks)
+                if best is None or estimate < best[0]:
+                    best = (estimate, main, max(executor.sizes))
+            estimates.append(best)
+        even = next((workers for workers, (estimate, _, _) in zip((2, 4, 8, 16), estimates) if estimate < serial), None)
+        rows.append([f"{count} x {size // 2}-{size}", len(arena), f"{serial * 1000:.1f}",
+                     f"{estimates[0][1] * 1000:.1f}", f"{estimates[0][2] / 1024:.0f}"]
+                    + [f"{serial / estimate:.2f}x" for estimate, _, _ in estimates] + [even or "> 16"])
+
+    print("Estimated with a reused pool (main process + slowest task, without the transfer through the pipes):")
+    print_table(["FUNCTIONS x STMTS", "NODES", "SERIAL (ms)", "MAIN, 2 W. (ms)", "PART, 2 W. (KB)",
+                 "2 CORES", "4 CORES", "8 CORES", "16 CORES", "BREAK-EVEN"], rows)
+
+@benchmark
+def parser_engines(statements=20000):
+    """
+    Parse throughput of the ply.yacc parser and of the hand-written DescentParser.
+    Before timing, the two parsers are compared over a generated corpus: valid programs must give the same AST (symbol IDs
+    included), broken programs must report the same first syntax error, with the DescentParser returning None.
+    """
+    import lexer
+    import parser
+    from ast_arena import Arena
+    from diagnostics import Diagnostics
+
+    def run(source, engine):
+        diagnostics = Diagnostics()
+        ast = parser.parse(source, lexer.IndentLexer(engine='scanner'), diagnostics, engine=engine)
+        by_stage = {stage: [record for record in diagnostics if record.stage == stage] for stage in ('lexer', 'parser')}
+        return ast, by_stage
+
+    def flat(ast):
+        arena = Arena.from_tree(ast)
+        return (arena.kinds, arena.ops, arena.first, arena.second, arena.third, arena.refs, arena.syms, arena.items,
+                arena.values)
+
+    rnd = random.Random(0)
+    valid = [synthetic_program(50, seed) for seed in range(20)] + [random_statements(40, seed) for seed in range(300)]
+    broken = [mutate(source, rnd) for source in valid for _ in range(3)]
+    broken += ["", "\n", "x = \n", "if a:\nx = 1\n", "  x = 1\n", "a < b < c\n", "f(,)\n", "def h(p,):\n    x = 1\n",
+               "x = ) $ 1\ny = @ 2\n"]
+
+    accepted = rejected = 0
+    for source in valid + broken:
+        expected, expected_errors = run(source, 'yacc')
+        actual, actual_errors = run(source, 'descent')
+
+        if expected_errors['lexer'] != actual_errors['lexer']:
+            raise AssertionError(f"Lexer errors differ for source:\n{source[:200]}")
+        if not expected_errors['parser']:
+            if actual_errors['parser'] or expected is None or flat(expected) != flat(actual):
+                raise AssertionError(f"ASTs differ for source:\n{source[:200]}")
+            accepted += 1
+        else:
+            if actual is not None or actual_errors['parser'] != expected_errors['parser'][:1]:
+                raise AssertionError(f"Syntax errors differ for source:\n{source[:200]}")
+            rejected += 1
+    print(f"Differential check passed on {accepted} accepted and {rejected} rejected sources.\n")
+
+    source = synthetic_program(statements)
+
+    def lex():
+        lex_obj = lexer.IndentLexer(engine='scanner')
+        lex_obj.input(source)
+        return sum(1 for _ in iter(lex_obj.token, None))
+
+    # The tokens are produced by the Scanner for both parsers, the lexing time is measured apart
+    token_count = lex()
+    lexing = best_time(lex)
+    rows = []
+    for engine in ('yacc', 'descent'):
+        elapsed = best_time(lambda: parser.parse(source, lexer.IndentLexer(engine='scanner'), engine=engine))
+        parsing = elapsed - lexing
+        rows.append([engine, token_count, f"{elapsed * 1000:.1f}", f"{parsing * 1000:.1f}", f"{token_count / parsing:,.0f}"])
+
+    print(f"Source: {statements} top-level statements, lexing {lexing * 1000:.1f} ms")
+    print_table(["ENGINE", "TOKENS", "TOTAL (ms)", "PARSING (ms)", "TOKENS/SEC"], rows)
+    print(f"Parsing speedup: {float(rows[0][3]) / float(rows[1][3]):.2f}x")
+
+@benchmark
+def ast_codec(statements=20000):
+    """
+    Size of the binary AST encoding compared with the source and with pickle, and time to get the AST by parsing the
+    source (with both parser engines) or by decoding a cached encoding.
+    Before timing, every program of a generated corpus must survive an encode/decode round trip unchanged, and the parse
+    cache is exercised in a temporary folder.
+    """
+    import pickle
+    import lexer
+    import parser
+    import ast_codec as codec
+
+    corpus = [synthetic_program(50, seed) for seed in range(20)] + [random_statements(40, seed) for seed in range(300)]
+    checked = 0
+    for source in corpus:
+        tree = parser.parse(source)
+        if tree is None:
+            continue
+        if codec.decode(codec.encode(tree)) != tree:
+            raise AssertionError(f"Round trip changed the AST of source:\n{source[:200]}")
+        checked += 1
+    print(f"Round trip check passed on {checked} programs.")
+
+    # Deeper than the recursion limit: both the encoder and the decoder use an explicit stack
+    deep = parser.Number(0)
+    for index in range(100000):
+        deep = parser.BinOp(deep, '+', parser.Number(index)) if index % 2 else parser.UnaryOp('-', deep)
+    data = codec.encode([parser.PrintStat(deep)])
+    # Compared through the encoding: the dataclass equality is recursive
+    if codec.encode(codec.decode(data)) != data:
+        raise AssertionError("Round trip changed a deeply nested AST")
+    print("Round trip check passed on an expression nested 100000 levels deep.")
+
+    source = synthetic_program(statements)
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ[codec.CACHE_ENV] = directory
+        try:
+            miss = best_time(lambda: codec.parse_cached(source), repeat=1)
+            hit = best_time(lambda: codec.parse_cached(source))
+            if codec.parse_cached(source) != parser.parse(source):
+                raise AssertionError("The parse cache returned a different AST")
+        finally:
+            del os.environ[codec.CACHE_ENV]
+    print(f"Parse cache: miss {miss * 1000:.1f} ms, hit {hit * 1000:.1f} ms\n")
+
+    tree = parser.parse(source)
+    data = codec.encode(tree)
+    pickled = pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL)
+
+    yacc = best_time(lambda: parser.parse(source))
+    descent = best_time(lambda: parser.parse(source, lexer.IndentLexer(engine='scanner'), engine='descent'))
+    decoding = best_time(lambda: codec.decode(data))
+    rows = [
+        ["source", f"{len(source) / 1024:.0f}", f"{yacc * 1000:.1f} (yacc)", "-"],
+        ["source", f"{len(source) / 1024:.0f}", f"{descent * 1000:.1f} (descent)", "-"],
+        ["binary", f"{len(data) / 1024:.0f}", f"{decoding * 1000:.1f}", f"{best_time(lambda: codec.encode(tree)) * 1000:.1f}"],
+        ["pickle", f"{len(pickled) / 1024:.0f}", f"{best_time(lambda: pickle.loads(pickled)) * 1000:.1f}",
+         f"{best_time(lambda: pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL)) * 1000:.1f}"],
+    ]
+
+    print(f"Source: {statements} top-level statements")
+    print_table(["FORMAT", "SIZE (KB)", "LOAD (ms)", "SAVE (ms)"], rows)
+    print(f"Decoding speedup: {yacc / decoding:.2f}x over yacc, {descent / decoding:.2f}x over descent")
+
+# -----------------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Available benchmarks:")
+        for name, func in BENCHMARKS.items():
+            print(f"- {name}: {func.__doc__.strip().splitlines()[0]}")
+        sys.exit(0 if len(sys.argv) < 2 else 1)
+
+    BENCHMARKS[sys.argv[1]]()
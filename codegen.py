@@ -3,20 +3,45 @@ from parser import parser
 from parser import (
     Number, String, Boolean, Var, BinOp, UnaryOp, 
     AssignStat, PrintStat, IfStat, ForStat, InputExpr, 
-    FunctionDecl, FunctionCall, ExprStat, ReturnStat
+    FunctionDecl, FunctionCall, ExprStat, ReturnStat, ErrorStat,
+    symbol_key, param_keys
 )
+from ast_arena import Arena, NONE, KIND
+from visitor import Visitor, handles, steps, visits
+from symbol_table import SymbolTable
+import os
 import textwrap
-
-class CodeGenerator:
+from concurrent.futures import ProcessPoolExecutor
+
+# Python operators -> JS equivalents (the missing ones are the same in JS)
+JS_OPERATORS = {
+    'and': '&&',
+    'or': '||',
+    '==': '===',
+    '!=': '!==',
+    'not': '!'
+}
+
+# Comments added to the JS code of the operators whose behaviour differs from Python
+OPERATOR_WARNINGS = {
+    '*': "If multiplying a string by an int, use .repeat()",
+    '/': "JS division is always a float. Use Math.floor() for integer division"
+}
+
+class CodeGenerator(Visitor):
     """
     Translates the AST into JavaScript code
     """
 
-    def __init__(self):
+    def __init__(self, iterative=False):
         self.indent_level = 0
-        # Stack of sets to track declared variables in nested scopes.
-        # Index 0 is the global scope
-        self.scopes = [set()]
+        # Declared variables in nested scopes (by symbol ID, see parser.symbol_key)
+        self.scopes = SymbolTable()
+        self.arena = None  # AST translated by generate_node
+        if iterative:
+            # Explicit stack instead of recursion (see visitor.Visitor.walk), for very deep trees
+            self.generate = self.walk
+            self.generate_node = self.walk_arena
 
 # -------------------Helper Methods------------------
 
@@ -30,27 +55,24 @@ class CodeGenerator:
         return "    " * self.indent_level
 
     def enter_scope(self):
-        """Increases indent level and appends a new scope set"""
+        """Increases indent level and opens a new scope"""
         self.indent_level += 1
-        self.scopes.append(set())
+        self.scopes.enter()
 
     def exit_scope(self):
-        """Decreases indent level and pops the current scope set"""
+        """Decreases indent level and closes the current scope"""
         self.indent_level -= 1
-        self.scopes.pop()
+        self.scopes.exit()
 
     def declare_var(self, name):
         """Declare a new variable in the current scope"""
-        self.scopes[-1].add(name)
+        self.scopes.define(name, True)
 
     def is_var_declared(self, name):
-        """Checks if a variable is already defined starting from the current scope to the global scope.
+        """Checks if a variable is already defined in the current scope or in an enclosing one, in constant time.
         - Returns True: if the variable already exists
         - Returns False: if it's a new variable"""
-        for scope in reversed(self.scopes):
-            if name in scope:
-                return True
-        return False
+        return name in self.scopes
     
     def add_warning(self, code, message):
         """Adds a comment to the generated JS code to make it quick and easy for humans to identify parts of the code that exhibit ambiguous behaviour following translation from Python to JavaScript."""
@@ -72,174 +94,487 @@ class CodeGenerator:
         return code, ""
 # -------------------------------------------------------------
 
-    def generate(self, node):
-        """Generates JavaScript code passing through the AST nodes"""
-        match node:
-            # ---Statement Lists---
-            case list(statements):
-                results = []
-                for stmt in statements:
-                    res = self.generate(stmt)
-                    if res:
-                        results.append(res)
-                return "\n".join(results)
-
-            # ---Primitives---
-            case Number(value):
-                return str(value)
-            
-            case String(value):
-                # String must have " " 
-                return f'"{value}"'
-            
-            case Boolean(value):
-                # Python 'True' -> JS 'true'
-                return str(value).lower()
+# ---------------JS templates--------------
+# Shared by the generator of the dataclass tree (generate) and the one of the arena (generate_node). The templates of
+# the nodes with children are generators of steps (see visitor.run_steps) taking the fields of a node: they yield its
+# children (tree nodes or arena indices) and the blocks to translate and receive their code. The ones of the most
+# frequent nodes only put together the code of the children (the *_text templates), so that the recursive handlers of
+# generate() and generate_node() can use them too (see visitor.visits).
 
-            case Var(name):
-                return name
-            
-            # ---Operations---
-            case BinOp(left, op, right):
-                js_left = self.generate(left)
-                js_right = self.generate(right)
-
-                if op == '*' and isinstance(left, String):
-                    return f"{js_left}.repeat({js_right})"
-                
-                # Map Python operators to JS equivalents
-                op_map = {
-                    'and': '&&',
-                    'or': '||',
-                    '==': '===',
-                    '!=': '!==',
-                    'not': '!'
-                }
-                js_op = op_map.get(op, op) # Keep the original op if op is not in op_man
-                result =  f"{js_left} {js_op} {js_right}"
-
-                warning = None
-
-                if op == '*':
-                    warning = "If multiplying a string by an int, use .repeat()"
-
-                elif op == '/':
-                    warning = "JS division is always a float. Use Math.floor() for integer division"
-                
-                return self.add_warning(result, warning)
-
-            case UnaryOp(op, expr):
-                js_expr = self.generate(expr)
-                return f"{op}{js_expr}"
-            
-            # ---Statements and Assignments---
-            case AssignStat(name, value):
-                js_val = self.generate(value)
-                indent = self.get_indent()
-                
-                # If variable exists reassign it. If it's new declare it with 'let'
-                if self.is_var_declared(name):
-                    return f"{indent}{name} = {js_val};"
-                else:
-                    self.declare_var(name)
-                    return f"{indent}let {name} = {js_val};"
-
-            case PrintStat(value):
-                indent = self.get_indent()
-                js_val = self.generate(value)
-                return f'{indent}console.log({js_val});'
-
-            case ReturnStat(value):
-                indent = self.get_indent()
-                js_val = self.generate(value)
-                return f'{indent}return {js_val};'
-            
-            case ExprStat(expr):
-                indent = self.get_indent()
-                js_expr = self.generate(expr)
-                return f'{indent}{js_expr};'
-
-            case InputExpr(prompt):
-                code =  f'prompt("{prompt}")'
-
-                warning = "prompt() can be used only in Browser environment. If using Node.js switch to prompt-sync or handle this case differently"
-
-                return self.add_warning(code, warning)
-
-            # ---Control flow---
-            case IfStat(condition, true_block, false_block):
-                indent = self.get_indent()
-                raw_cond = self.generate(condition)
-                js_cond, warning_suffix = self.extract_warning(raw_cond)
-
-                # IF block
-                result = f"{indent}if ({js_cond}) {{{warning_suffix}\n"
-                
-                self.enter_scope()
-                result += self.generate(true_block) + "\n"
-                self.exit_scope()
-                
-                result += f"{indent}}}"
-
-                # ELSE block (handles ELIF recursively nesting other IFStats)
-                if false_block:
-                    result += " else {\n"
-                    self.enter_scope()
-                    result += self.generate(false_block) + "\n"
-                    self.exit_scope()
-                    result += f"{indent}}}"
-                
-                return result
-
-            case ForStat(iterator, start, end, body):
-                # Python: for i in range(start, end)
-                # JS: for (let i = start; i < end; i++)
-                
-                indent = self.get_indent()
-                js_start = self.generate(start)
-                js_end = self.generate(end)
-                
-                self.enter_scope()
-                self.declare_var(iterator)
-                
-                header = f"for (let {iterator} = {js_start}; {iterator} < {js_end}; {iterator}++)"
-                
-                result = f"{indent}{header} {{\n"
-                result += self.generate(body) + "\n"
-                
-                self.exit_scope()
-                result += f"{indent}}}"
-                return result
-
-            case FunctionDecl(name, params, body):
-                indent = self.get_indent()
-                params_str = ", ".join(params)
-                
-                self.declare_var(name) # Function name is visible in current scope
-                
-                result = f"{indent}function {name}({params_str}) {{\n"
-                
-                self.enter_scope()
-                # Parameters are local variables inside the function
-                for p in params:
-                    self.declare_var(p)
-                    
-                result += self.generate(body) + "\n"
-                self.exit_scope()
-                
-                result += f"{indent}}}"
-                return result
-
-            # ---Functions---
-            case FunctionCall(name, args):
-                js_args = ", ".join([self.generate(arg) for arg in args])
-                return f"{name}({js_args})"
-
-            case None:
-                return ""
+    def string_code(self, value):
+        # String must have " "
+        return f'"{value}"'
+
+    def boolean_code(self, value):
+        # Python 'True' -> JS 'true'
+        return str(value).lower()
+
+    def input_code(self, prompt):
+        code =  f'prompt("{prompt}")'
+
+        warning = "prompt() can be used only in Browser environment. If using Node.js switch to prompt-sync or handle this case differently"
+
+        return self.add_warning(code, warning)
+
+    def block_text(self, results):
+        return "\n".join([res for res in results if res])
+
+    def binop_text(self, op, js_left, js_right, left_is_string):
+        if op == '*' and left_is_string:
+            return f"{js_left}.repeat({js_right})"
+
+        # Python operators are mapped to their JS equivalents, the other ones are kept
+        result = f"{js_left} {JS_OPERATORS.get(op, op)} {js_right}"
+        return self.add_warning(result, OPERATOR_WARNINGS.get(op))
+
+    def unary_text(self, op, js_expr):
+        return f"{op}{js_expr}"
+
+    def assign_text(self, name, key, js_val):
+        indent = self.get_indent()
+
+        # If variable exists reassign it. If it's new declare it with 'let'
+        if self.is_var_declared(key):
+            return f"{indent}{name} = {js_val};"
+        else:
+            self.declare_var(key)
+            return f"{indent}let {name} = {js_val};"
+
+    def print_text(self, js_val):
+        return f'{self.get_indent()}console.log({js_val});'
+
+    def expr_text(self, js_expr):
+        return f'{self.get_indent()}{js_expr};'
+
+    def call_text(self, name, js_args):
+        return f"{name}({', '.join(js_args)})"
+
+    def block_code(self, statements):
+        results = []
+        for stmt in statements:
+            results.append((yield stmt))
+        return self.block_text(results)
+
+    def binop_code(self, op, left, right, left_is_string):
+        return self.binop_text(op, (yield left), (yield right), left_is_string)
+
+    def unary_code(self, op, expr):
+        return self.unary_text(op, (yield expr))
+
+    def assign_code(self, name, key, value):
+        return self.assign_text(name, key, (yield value))
+
+    def print_code(self, value):
+        return self.print_text((yield value))
+
+    def return_code(self, value):
+        indent = self.get_indent()
+        js_val = (yield value) if value is not None else ""
+        return f'{indent}return {js_val};'
+
+    def expr_code(self, expr):
+        return self.expr_text((yield expr))
+
+    def if_code(self, condition, true_block, false_block):
+        indent = self.get_indent()
+        raw_cond = yield condition
+        js_cond, warning_suffix = self.extract_warning(raw_cond)
+
+        # IF block
+        result = f"{indent}if ({js_cond}) {{{warning_suffix}\n"
+        
+        self.enter_scope()
+        result += (yield true_block) + "\n"
+        self.exit_scope()
+        
+        result += f"{indent}}}"
+
+        # ELSE block (handles ELIF recursively nesting other IFStats)
+        if false_block is not None:
+            result += " else {\n"
+            self.enter_scope()
+            result += (yield false_block) + "\n"
+            self.exit_scope()
+            result += f"{indent}}}"
+        
+        return result
+
+    def for_code(self, iterator, key, start, end, body):
+        # Python: for i in range(start, end)
+        # JS: for (let i = start; i < end; i++)
+        
+        indent = self.get_indent()
+        js_start = yield start
+        js_end = yield end
+        
+        self.enter_scope()
+        self.declare_var(key)
+        
+        header = f"for (let {iterator} = {js_start}; {iterator} < {js_end}; {iterator}++)"
+        
+        result = f"{indent}{header} {{\n"
+        result += (yield body) + "\n"
+        
+        self.exit_scope()
+        result += f"{indent}}}"
+        return result
+
+    def function_code(self, name, key, params, keys, body):
+        indent = self.get_indent()
+        params_str = ", ".join(params)
+        
+        self.declare_var(key) # Function name is visible in current scope
+        
+        result = f"{indent}function {name}({params_str}) {{\n"
+        
+        self.enter_scope()
+        # Parameters are local variables inside the function
+        for p in keys:
+            self.declare_var(p)
             
-            case _:
-                raise Exception(f"Codegen Error: Unknown node '{node}'")
+        result += (yield body) + "\n"
+        self.exit_scope()
+        
+        result += f"{indent}}}"
+        return result
+
+    def call_code(self, name, args):
+        js_args = []
+        for arg in args:
+            js_args.append((yield arg))
+        return self.call_text(name, js_args)
+
+# -------------------------------------------------------------
+
+# -------------------Tree generator------------------
+# generate(node) (see visitor.Visitor) returns the JavaScript code of a node of the dataclass tree
+
+    generate = Visitor.visit
+
+    def generic_visit(self, node, *args):
+        raise Exception(f"Codegen Error: Unknown node '{node}'")
+
+    # ---Primitives---
+    @handles(Number)
+    def generate_number(self, node):
+        return str(node.value)
+
+    @handles(String)
+    def generate_string(self, node):
+        return self.string_code(node.value)
+
+    @handles(Boolean)
+    def generate_boolean(self, node):
+        return self.boolean_code(node.value)
+
+    @handles(Var)
+    def generate_var(self, node):
+        return node.name
+
+    @handles(InputExpr)
+    def generate_input(self, node):
+        return self.input_code(node.prompt)
+
+    # Statements skipped by the parser after a syntax error produce no code
+    @handles(type(None), ErrorStat)
+    def generate_nothing(self, node):
+        return ""
+
+    # ---Statement Lists---
+    @steps(list)
+    def walk_block(self, statements):
+        return self.block_code(statements)
+
+    # ---Operations---
+    @steps(BinOp)
+    def walk_binop(self, node):
+        left = node.left
+        return self.binop_code(node.op, left, node.right, isinstance(left, String))
+
+    @steps(UnaryOp)
+    def walk_unary(self, node):
+        return self.unary_code(node.op, node.expr)
+
+    # ---Statements and Assignments---
+    @steps(AssignStat)
+    def walk_assign(self, node):
+        return self.assign_code(node.name, symbol_key(node.name, node.sym_id), node.value)
+
+    @steps(PrintStat)
+    def walk_print(self, node):
+        return self.print_code(node.value)
+
+    @steps(ReturnStat)
+    def generate_return(self, node):
+        return self.return_code(node.value)
+
+    @steps(ExprStat)
+    def walk_expr(self, node):
+        return self.expr_code(node.expr)
+
+    # ---Control flow---
+    @steps(IfStat)
+    def generate_if(self, node):
+        return self.if_code(node.condition, node.true_block, node.false_block or None)
+
+    @steps(ForStat)
+    def generate_for(self, node):
+        iterator = node.iterator
+        return self.for_code(iterator, symbol_key(iterator, node.iterator_id), node.start, node.end, node.body)
+
+    @steps(FunctionDecl)
+    def generate_function(self, node):
+        name, params = node.name, node.params
+        return self.function_code(name, symbol_key(name, node.sym_id), params, param_keys(params, node.param_ids),
+                                  node.body)
+
+    # ---Functions---
+    @steps(FunctionCall)
+    def walk_call(self, node):
+        return self.call_code(node.name, node.args)
+
+    # ---Recursive handlers (see visitor.visits)---
+    @visits(list)
+    def generate_block(self, statements):
+        return self.block_text([self.generate(stmt) for stmt in statements])
+
+    @visits(BinOp)
+    def generate_binop(self, node):
+        left = node.left
+        return self.binop_text(node.op, self.generate(left), self.generate(node.right), isinstance(left, String))
+
+    @visits(UnaryOp)
+    def generate_unary(self, node):
+        return self.unary_text(node.op, self.generate(node.expr))
+
+    @visits(AssignStat)
+    def generate_assign(self, node):
+        return self.assign_text(node.name, symbol_key(node.name, node.sym_id), self.generate(node.value))
+
+    @visits(PrintStat)
+    def generate_print(self, node):
+        return self.print_text(self.generate(node.value))
+
+    @visits(ExprStat)
+    def generate_expr(self, node):
+        return self.expr_text(self.generate(node.expr))
+
+    @visits(FunctionCall)
+    def generate_call(self, node):
+        return self.call_text(node.name, [self.generate(arg) for arg in node.args])
+
+# -------------------Arena generator------------------
+# generate_node(index) (see visitor.Visitor.visit_arena) returns the JavaScript code of the node at the given index of
+# self.arena, dispatched on its kind ID
+
+    generate_node = Visitor.visit_arena
+
+    def generate_arena(self, arena):
+        """Generates JavaScript code from an AST stored in an ast_arena.Arena"""
+        self.arena = arena
+        return self.generate_node(arena.root)
+
+    # ---Primitives---
+    @handles(KIND['Number'])
+    def generate_arena_number(self, index):
+        return str(self.arena.value(index))
+
+    @handles(KIND['String'])
+    def generate_arena_string(self, index):
+        return self.string_code(self.arena.value(index))
+
+    @handles(KIND['Boolean'])
+    def generate_arena_boolean(self, index):
+        return self.boolean_code(self.arena.value(index))
+
+    @handles(KIND['Var'])
+    def generate_arena_var(self, index):
+        return self.arena.value(index)
+
+    @handles(KIND['InputExpr'])
+    def generate_arena_input(self, index):
+        return self.input_code(self.arena.value(index))
+
+    @handles(KIND['ErrorStat'])
+    def generate_arena_nothing(self, index):
+        return ""
+
+    # ---Statement Lists---
+    @steps(KIND['Block'])
+    def walk_arena_block(self, index):
+        return self.block_code(self.arena.block(index))
+
+    # ---Operations---
+    @steps(KIND['BinOp'])
+    def walk_arena_binop(self, index):
+        arena = self.arena
+        first = arena.first[index]
+        return self.binop_code(arena.op(index), first, arena.second[index], arena.kinds[first] == KIND['String'])
+
+    @steps(KIND['UnaryOp'])
+    def walk_arena_unary(self, index):
+        return self.unary_code(self.arena.op(index), self.arena.first[index])
+
+    # ---Statements and Assignments---
+    @steps(KIND['AssignStat'])
+    def walk_arena_assign(self, index):
+        arena = self.arena
+        name = arena.value(index)
+        return self.assign_code(name, symbol_key(name, arena.sym_id(index)), arena.first[index])
+
+    @steps(KIND['PrintStat'])
+    def walk_arena_print(self, index):
+        return self.print_code(self.arena.first[index])
+
+    @steps(KIND['ReturnStat'])
+    def generate_arena_return(self, index):
+        first = self.arena.first[index]
+        return self.return_code(None if first == NONE else first)
+
+    @steps(KIND['ExprStat'])
+    def walk_arena_expr(self, index):
+        return self.expr_code(self.arena.first[index])
+
+    # ---Control flow---
+    @steps(KIND['IfStat'])
+    def generate_arena_if(self, index):
+        arena = self.arena
+        third = arena.third[index]
+        return self.if_code(arena.first[index], arena.second[index],
+                            third if third != NONE and arena.block(third) else None)
+
+    @steps(KIND['ForStat'])
+    def generate_arena_for(self, index):
+        arena = self.arena
+        iterator = arena.value(index)
+        return self.for_code(iterator, symbol_key(iterator, arena.sym_id(index)), arena.first[index],
+                             arena.second[index], arena.third[index])
+
+    @steps(KIND['FunctionDecl'])
+    def generate_arena_function(self, index):
+        arena = self.arena
+        name = arena.value(index)
+        params = arena.params(index)
+        return self.function_code(name, symbol_key(name, arena.sym_id(index)), [param for param, _ in params],
+                                  [symbol_key(param, sym_id) for param, sym_id in params], arena.second[index])
+
+    # ---Functions---
+    @steps(KIND['FunctionCall'])
+    def walk_arena_call(self, index):
+        arena = self.arena
+        return self.call_code(arena.value(index), arena.block(arena.first[index]))
+
+    # ---Recursive handlers (see visitor.visits)---
+    @visits(KIND['Block'])
+    def generate_arena_block(self, index):
+        return self.block_text([self.generate_node(stmt) for stmt in self.arena.block(index)])
+
+    @visits(KIND['BinOp'])
+    def generate_arena_binop(self, index):
+        arena = self.arena
+        first = arena.first[index]
+        return self.binop_text(arena.op(index), self.generate_node(first), self.generate_node(arena.second[index]),
+                               arena.kinds[first] == KIND['String'])
+
+    @visits(KIND['UnaryOp'])
+    def generate_arena_unary(self, index):
+        return self.unary_text(self.arena.op(index), self.generate_node(self.arena.first[index]))
+
+    @visits(KIND['AssignStat'])
+    def generate_arena_assign(self, index):
+        arena = self.arena
+        name = arena.value(index)
+        return self.assign_text(name, symbol_key(name, arena.sym_id(index)), self.generate_node(arena.first[index]))
+
+    @visits(KIND['PrintStat'])
+    def generate_arena_print(self, index):
+        return self.print_text(self.generate_node(self.arena.first[index]))
+
+    @visits(KIND['ExprStat'])
+    def generate_arena_expr(self, index):
+        return self.expr_text(self.generate_node(self.arena.first[index]))
+
+    @visits(KIND['FunctionCall'])
+    def generate_arena_call(self, index):
+        arena = self.arena
+        return self.call_text(arena.value(index), [self.generate_node(arg) for arg in arena.block(arena.first[index])])
+
+# -------------------Parallel generator------------------
+
+    def generate_parallel(self, arena, workers=None, executor=None):
+        """
+        Same as generate_arena(arena), translating the top-level functions in worker processes: the returned code is
+        identical. The code of a top-level function depends only on its body and on the global variables declared before
+        it (an assignment to one of them is not a 'let'), so the other top-level statements are translated here in order
+        while the functions are split in one contiguous chunk per worker. Every worker receives only the nodes of its own
+        functions (see ast_arena.Arena.part), with the global keys declared before every function.
+        workers is the number of processes (default: os.cpu_count()); with 1 the arena is translated here.
+        An executor (e.g. a concurrent.futures.ProcessPoolExecutor) reused across compilations saves the start of the pool.
+        Scope:
+        - Only an arena is accepted: its parts are slices of its arrays, while sending a tree of dataclasses (pickled or
+          with ast_codec) costs more than translating it.
+        - Only the code generation is parallel. The semantic analysis (semantic.py) infers a function body at its calls,
+          from the argument types and the globals bound at that point of the program, so no body can be analyzed before
+          the serial analysis reaches its calls.
+        - It pays off only with several cores and enough code in the functions to cover the start of the workers and the
+          transfer of the parts: python benchmark.py parallel_codegen shows where it breaks even.
+        """
+        if not isinstance(arena, Arena):
+            raise TypeError("generate_parallel() translates an ast_arena.Arena, see parse(source, arena=True)")
+        workers = workers or os.cpu_count() or 1
+        statements = arena.block(arena.root)
+        functions = [index for index in statements if arena.kind(index) == 'FunctionDecl']
+        if (workers <= 1 and executor is None) or not functions:
+            return self.generate_arena(arena)
+
+        self.arena = arena
+        results = {}
+        declared = self.scopes.log[0]  # global keys in declaration order
+        marks = []  # number of global keys declared before every function
+        for index in statements:
+            if arena.kind(index) == 'FunctionDecl':
+                marks.append(len(declared))
+                self.declare_var(symbol_key(arena.value(index), arena.sym_id(index)))
+            else:
+                results[index] = self.generate_node(index)
+
+        ranges = dict(zip(statements, arena.statement_ranges()))
+        size = -(-len(functions) // workers)
+        tasks = []
+        for start in range(0, len(functions), size):
+            chunk, chunk_marks = functions[start:start + size], marks[start:start + size]
+            # Keys declared before the chunk, then the ones declared before each function since the previous one
+            added = [declared[previous:mark] for previous, mark in zip(chunk_marks, chunk_marks[1:])]
+            tasks.append((arena.part([ranges[index] for index in chunk]), chunk, declared[:chunk_marks[0]], [[]] + added))
+
+        pool = executor if executor is not None else ProcessPoolExecutor(len(tasks))
+        try:
+            codes = [code for chunk in pool.map(generate_functions, tasks) for code in chunk]
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+        results.update(zip(functions, codes))
+        return "\n".join([res for res in (results[index] for index in statements) if res])
+
+def generate_functions(task):
+    """
+    Worker of CodeGenerator.generate_parallel: translates a chunk of top-level functions of an arena.
+    task: (part of the arena with the functions, see ast_arena.Arena.part, indices of the functions, global keys declared
+    before the first one, keys declared before every function since the previous one). Returns the code of every function.
+    """
+    part, functions, declared, added = task
+    codegen = CodeGenerator()
+    codegen.arena = Arena.from_part(part)
+    for key in declared:
+        codegen.declare_var(key)
+
+    codes = []
+    for index, keys in zip(functions, added):
+        for key in keys:
+            codegen.declare_var(key)
+        codes.append(codegen.generate_node(index))
+    return codes
 
 # ---TEST---
 if __name__ == '__main__':
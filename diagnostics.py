@@ -0,0 +1,105 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+"""
+Diagnostics collected during a compilation.
+A Diagnostics object is created for every compilation and passed through the pipeline: the lexer reads it from its
+'diagnostics' attribute, the parser from the 'current' context variable (p_error doesn't receive the lexer at the end of
+the input) and the semantic analyzer receives it in the constructor.
+Nothing is printed: the caller decides how to show the records.
+"""
+
+# Diagnostics of the compilation running in the current thread/context, set by IndentLexer.input() and parser.parse()
+current = ContextVar('diagnostics', default=None)
+
+# Longest text of illegal characters shown in a message
+MAX_TEXT = 20
+
+@dataclass
+class Diagnostic:
+    stage: str              # 'lexer', 'parser' or 'semantic'
+    code: str               # kind of error, e.g. 'illegal-character'
+    line: Optional[int]     # None if the position is unknown (the AST doesn't store positions)
+    column: Optional[int]
+    message: str
+
+    def __str__(self):
+        return self.message
+
+class SemanticError(Exception):
+    """
+    Error found by the semantic analyzer. The message is the one shown to the user, the code identifies the kind of error.
+    """
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+class Diagnostics:
+    """
+    Bounded collector of the errors of a compilation.
+    After 'limit' records the new errors are only counted in 'suppressed', so a garbage input costs constant memory.
+    Consecutive illegal characters are collapsed in a single record.
+    """
+    def __init__(self, limit=100):
+        self.limit = limit
+        self.records = []
+        self.suppressed = 0
+        # Last illegal characters record and the offset right after it, to extend it with the following characters
+        self._run = None
+        self._run_start = 0
+        self._run_end = -1
+
+    def __len__(self):
+        return len(self.records) + self.suppressed
+
+    def __bool__(self):
+        return bool(self.records) or self.suppressed > 0
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def add(self, stage, code, message, line=None, column=None):
+        """
+        Records an error.
+        - Returns the new Diagnostic, or None if the limit has been reached
+        """
+        if len(self.records) >= self.limit:
+            self.suppressed += 1
+            return None
+
+        record = Diagnostic(stage, code, line, column, message)
+        self.records.append(record)
+        return record
+
+    def illegal_characters(self, data, start, end, line):
+        """
+        Records the unrecognised characters data[start:end] found by the lexer in the given line.
+        If they follow directly the previous illegal characters, the previous record is extended instead.
+        """
+        if start == self._run_end and (self._run is None or self.records[-1] is self._run):
+            # The run goes on: a suppressed run stays a single suppressed error
+            self._run_end = end
+            if self._run is not None:
+                self._run.message = illegal_message(data[self._run_start:end], line)
+            return
+
+        column = start - data.rfind('\n', 0, start)
+        self._run = self.add('lexer', 'illegal-character', illegal_message(data[start:end], line), line, column)
+        self._run_start = start
+        self._run_end = end
+
+    def messages(self):
+        """Returns the messages of the records, followed by the number of suppressed errors if any"""
+        messages = [record.message for record in self.records]
+        if self.suppressed:
+            messages.append(f"... {self.suppressed} more errors not shown")
+        return messages
+
+def illegal_message(text, line):
+    """Message of a run of illegal characters"""
+    if len(text) == 1:
+        return f"Illegal character '{text}' in line {line}"
+    if len(text) > MAX_TEXT:
+        return f"Illegal characters '{text[:MAX_TEXT]}...' ({len(text)} characters) in line {line}"
+    return f"Illegal characters '{text}' in line {line}"
@@ -17,8 +17,9 @@ except ImportError:
 try:
     import lexer as lexer_mod 
     import parser as parser_mod 
-    from semantic import SemanticAnalyzer
+    from semantic import SemanticAnalyzer, AnalysisBudget
     from codegen import CodeGenerator
+    from diagnostics import Diagnostics
 except ImportError:
     # Fallback to prevent IDE crash if modules are missing
     lexer_mod = None
@@ -123,36 +124,26 @@ def compile_source():
     txt_output.config(state=tk.NORMAL)
     txt_output.delete("1.0", tk.END)
 
-    if lexer_mod: lexer_mod.errors = []
-    if parser_mod: parser_mod.errors = []
-    
     try:
-        # Parsing
-        if lexer_mod and hasattr(lexer_mod, 'lexer'):
-            lexer_mod.lexer.lineno = 1
-        
         if not parser_mod: raise Exception("Compiler modules not found.")
 
-        ast = parser_mod.parser.parse(source_code, lexer=lexer_mod.lexer)
-
-        found_errors = []
-        if lexer_mod and hasattr(lexer_mod, 'errors'):
-            found_errors.extend(lexer_mod.errors)
-        if parser_mod and hasattr(parser_mod, 'errors'):
-            found_errors.extend(parser_mod.errors)
+        # Parsing, with the errors of this compilation collected in a new Diagnostics object
+        diagnostics = Diagnostics()
+        ast = parser_mod.parse(source_code, diagnostics=diagnostics)
 
-        if ast is None or len(found_errors) > 0:
+        if ast is None or diagnostics:
             error_text = "/* COMPILATION FAILED */\n\n"
-            if found_errors:
-                error_text += "\n".join(found_errors)
+            if diagnostics:
+                error_text += "\n".join(diagnostics.messages())
             else:
                 error_text += "Unknown Syntax Error (Parser returned None)"
 
             raise Exception(error_text)
 
         # Semantic analysis
-        semantic = SemanticAnalyzer()
-        semantic.visit(ast)
+        semantic = SemanticAnalyzer(diagnostics, budget=AnalysisBudget())
+        if not semantic.analyze(ast):
+            raise Exception("\n".join(diagnostics.messages()))
         
         # Code generation
         codegen = CodeGenerator() 
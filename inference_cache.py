@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import tempfile
+import types
+from collections import OrderedDict
+from dataclasses import fields
+
+from parser import Var, FunctionCall, LazyBody
+
+"""
+Inference cache of the semantic analyzer, shared by several compilations.
+The analyzer infers the return type of a function visiting its body once for every tuple of argument types. Those
+results are stored in the symbol table, so they are lost at the end of the analysis. This cache keeps them across
+analyses, keyed by a hash of:
+- the structure of the function (parameter names and body), without the symbol IDs, which depend on the compilation
+- the types of the arguments
+- the types of the names the function reads from outside, and of the ones read by the functions it calls
+- the code of the analyzer, so a change of the type rules never reads a stale result
+The entries are evicted in least recently used order when there are more than max_entries of them, or when their size
+is more than max_bytes. With a path, the cache is loaded from that file and save() writes it back.
+"""
+
+FORMAT_VERSION = 1
+
+# Fields of the nodes holding symbol IDs: they are left out of the structure of a function
+SYMBOL_FIELDS = frozenset(('sym_id', 'iterator_id', 'param_ids'))
+
+# ---------------Cache keys----------------
+
+# Node class -> names of its fields in the structure of a function
+STRUCTURE_FIELDS = {}
+
+def function_signature(params, body):
+    """
+    Structure of a function with the given parameter names and body (a list of statements).
+    - Returns (hash, names): names are the (name, sym_id) pairs of the variables and functions read by the body
+      (nested functions included), without the parameters. Returns None if the body contains lazy bodies not parsed yet.
+    """
+    parts = [tuple(params)]
+    names = set()
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            parts.append(len(node))
+            stack.extend(reversed(node))
+            continue
+
+        cls = node.__class__
+        node_fields = STRUCTURE_FIELDS.get(cls)
+        if node_fields is None:
+            if cls is LazyBody:
+                return None
+            if not hasattr(node, '__dataclass_fields__'):
+                # Operators, names and literal values
+                parts.append(repr(node))
+                continue
+            node_fields = STRUCTURE_FIELDS[cls] = tuple(f.name for f in fields(node) if f.name not in SYMBOL_FIELDS)
+
+        if cls is Var or cls is FunctionCall:
+            names.add((node.name, node.sym_id))
+        parts.append(cls.__name__)
+        stack.extend(getattr(node, name) for name in reversed(node_fields))
+
+    # The parameters are always defined when the body reads them
+    names = frozenset(pair for pair in names if pair[0] not in params)
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest(), names
+
+# Class -> hash of its code, computed once
+CODE_SIGNATURES = {}
+
+def describe(value):
+    """Representation of code and tables that doesn't change between processes (no addresses, sets in a fixed order)"""
+    if isinstance(value, types.CodeType):
+        return repr([value.co_code, value.co_names, [describe(const) for const in value.co_consts]])
+    if isinstance(value, types.FunctionType):
+        return value.__qualname__
+    if isinstance(value, frozenset):
+        return repr(sorted(map(describe, value)))
+    if type(value) is dict:
+        return repr(sorted((describe(key), describe(item)) for key, item in value.items()))
+    return repr(value)
+
+def code_signature(cls):
+    """
+    Hash of the code of the methods of a class and of its base classes, and of the tables (dict attributes) mapping
+    values to methods, like SemanticAnalyzer.BINOP_RULES
+    """
+    signature = CODE_SIGNATURES.get(cls)
+    if signature is not None:
+        return signature
+
+    digest = hashlib.sha256()
+    for klass in cls.__mro__:
+        for name, value in sorted(vars(klass).items()):
+            # Class and static methods too
+            value = getattr(value, '__func__', value)
+            if isinstance(value, types.FunctionType):
+                value = value.__code__
+            elif type(value) is not dict or name.startswith('__'):
+                # The other attributes, and the tables of Python (e.g. the fields of a dataclass, whose generated
+                # methods are hashed instead)
+                continue
+            digest.update(f"{klass.__name__}.{name}={describe(value)}".encode('utf-8'))
+    signature = CODE_SIGNATURES[cls] = digest.hexdigest()
+    return signature
+
+def functions_signature(functions):
+    """Hash of the code of the given functions (e.g. the rules of a module), in the given order"""
+    digest = hashlib.sha256()
+    for function in functions:
+        digest.update(f"{function.__qualname__}={describe(function.__code__)}".encode('utf-8'))
+    return digest.hexdigest()
+
+def cache_key(*parts):
+    """Key of an entry: a hash of the format version and of the given parts"""
+    return hashlib.sha256(repr((FORMAT_VERSION,) + parts).encode('utf-8')).hexdigest()[:32]
+
+# -----------------------------------------
+
+# ----------------LRU cache----------------
+
+def entry_size(key, value):
+    """Approximate size of an entry in bytes: the length of the key and of the representation of the value"""
+    return len(key) + len(repr(value))
+
+class InferenceCache:
+    """
+    Cache key -> value, in least recently used order. The values are built by the semantic analyzer (the inferred type
+    and the types inferred for other functions, see SemanticAnalyzer.store) and must be JSON lists or strings.
+    - hits, misses: number of get() calls that found or didn't find their key
+    - evictions: number of entries dropped to stay within the limits
+    - size: approximate size of the entries in bytes (see entry_size)
+    """
+    def __init__(self, max_entries=100000, max_bytes=None, path=None):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self.signatures = {}  # id(body) -> (body, params, signature), see signature()
+        if path is not None:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Returns the value stored under the key, or None if there is none"""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Stores a value under the key, evicting the least recently used entries if the cache is full"""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= entry_size(key, old)
+        self.entries[key] = value
+        self.size += entry_size(key, value)
+        self.evict()
+
+    def signature(self, params, body):
+        """
+        function_signature() of a function, remembered for the same body object: the trees analyzed again (e.g. the
+        statements kept by parser.reparse) aren't hashed again. Forgotten when there are more than max_entries of them.
+        """
+        known = self.signatures.get(id(body))
+        if known is not None and known[0] is body and known[1] == params:
+            return known[2]
+        if self.max_entries is not None and len(self.signatures) >= self.max_entries:
+            self.signatures.clear()
+        signature = function_signature(params, body)
+        self.signatures[id(body)] = (body, params, signature)
+        return signature
+
+    def evict(self):
+        """Drops the least recently used entries until the cache is within its limits"""
+        entries = self.entries
+        while entries and ((self.max_entries is not None and len(entries) > self.max_entries) or
+                           (self.max_bytes is not None and self.size > self.max_bytes)):
+            key, value = entries.popitem(last=False)
+            self.size -= entry_size(key, value)
+            self.evictions += 1
+
+    def clear(self):
+        """Drops all the entries (the counters are kept)"""
+        self.entries.clear()
+        self.signatures.clear()
+        self.size = 0
+
+    def load(self):
+        """
+        Reads the entries stored in the file of the cache, if any.
+        A missing, unreadable or outdated file leaves the cache empty.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != FORMAT_VERSION:
+                return
+            entries = [(str(key), value) for key, value in data['entries']]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return
+
+        self.clear()
+        for key, value in entries:
+            self.put(key, value)
+
+    def save(self):
+        """Writes the entries in the file of the cache, from the least recently used one"""
+        if self.path is None:
+            raise ValueError("The inference cache has no file")
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Written in a temporary file and renamed, so other processes never read a partial file
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as f:
+            json.dump({'version': FORMAT_VERSION, 'entries': list(self.entries.items())}, f)
+        os.replace(f.name, self.path)
+
+# -----------------------------------------
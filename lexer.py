@@ -1,6 +1,11 @@
 import ply.lex as lex
-
-errors = []
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+import table_cache
+import diagnostics as diag
+from diagnostics import Diagnostics
 
 # ------------Token declaration------------
 reserved = {
@@ -83,6 +88,9 @@ t_COMMA = r','
 def t_ID(t):
     r'[a-zA-Z_][a-zA-Z0-9_]*'
     t.type = reserved.get(t.value, 'ID')
+    if t.type == 'ID' and t.lexer.symbols is not None:
+        t.sym = t.lexer.symbols.intern(t.value)
+        t.value = t.lexer.symbols.names[t.sym]
     return t
 
 # Identify integer numbers
@@ -104,17 +112,400 @@ def t_newline(t):
     t.type = 'NEWLINE'
     return t
 
-# Identify unrecognised characters and skip them
+# Identify unrecognised characters and skip them (the whole run of characters that can't start a token at once)
 def t_error(t):
-    error_msg = f"Illegal character '{t.value[0]}' in line {t.lexer.lineno}"
-    print(error_msg)
-    errors.append(error_msg)
-    t.lexer.skip(1)
+    end = illegal_run(t.lexer.lexdata, t.lexpos)
+    illegal_characters(t.lexer, t.lexpos, end)
+    t.lexer.skip(end - t.lexpos)
 
 # Characters to ignore
 t_ignore = ' '
 t_ignore_COMMENT = r'\#.*'
 
+def illegal_characters(lexer, start, end):
+    """
+    Reports the unrecognised characters from start to end to the diagnostics of the lexer. Shared by the PLY rules and the Scanner
+    """
+    if lexer.diagnostics is not None:
+        lexer.diagnostics.illegal_characters(lexer.lexdata, start, end, lexer.lineno)
+
+def illegal_run(data, pos):
+    """
+    Returns the end of the run of unrecognised characters starting at pos (the character at pos is known to be illegal).
+    The run stops at the first character that can start a token, so skipping it gives the same tokens as skipping one character at a time.
+    """
+    match = ILLEGAL_RUN.match(data, pos + 1)
+    return match.end() if match else pos + 1
+
+# -----------------------------------------
+
+# ----------Identifier interning-----------
+class Symbols:
+    """
+    Per-compilation table of the identifiers. Every distinct name gets a dense integer ID (its index in 'names'),
+    and all the occurrences of a name share the same string object.
+    The ID is stored by the lexers in the 'sym' attribute of the ID tokens and carried by the parser into the AST.
+    """
+    def __init__(self):
+        self.ids = {}     # name -> ID
+        self.names = []   # ID -> name
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Returns the ID of the name, assigning a new one the first time the name is seen"""
+        sym = self.ids.get(name)
+        if sym is None:
+            sym = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return sym
+
+# -----------------------------------------
+
+# ------------Hand-written scanner---------
+class Token:
+    """
+    Lightweight token produced by the Scanner. It has the same attributes of lex.LexToken read by the IndentLexer and the parser
+    ('lexer' is set by PLY on the token passed to p_error, 'sym' only on the identifiers).
+    """
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'column', 'lexer', 'sym')
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.type},{self.value!r},{self.lineno},{self.lexpos})"
+
+class Scanner:
+    """
+    Alternative engine to the PLY lexer. It recognises exactly the same tokens of the rules above in a single pass,
+    dispatching on the first character of each token instead of trying the PLY master regex and calling the t_ functions.
+    It exposes the same input()/token() interface and lexdata/lexpos/lineno attributes, so the IndentLexer and the parser
+    can use it in place of the PLY lexer.
+    """
+    # The regexes of the complex rules are reused as they are (PLY compiles them in verbose mode)
+    id_re = re.compile(t_ID.__doc__, re.VERBOSE)
+    number_re = re.compile(t_NUMBER.__doc__, re.VERBOSE)
+    string_re = re.compile(t_STRING.__doc__, re.VERBOSE)
+
+    # First character -> kind of token to scan
+    dispatch = {' ': 'IGNORE', '\n': 'NEWLINE', '#': 'COMMENT', '"': 'STRING', "'": 'STRING'}
+    dispatch.update({c: 'ID' for c in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_'})
+    dispatch.update({c: 'NUMBER' for c in '0123456789'})
+    dispatch.update({'+': 'PLUS', '-': 'MINUS', '*': 'TIMES', '/': 'DIVIDE',
+                     '(': 'LPAREN', ')': 'RPAREN', ':': 'COLON', ',': 'COMMA'})
+
+    # Operators that can be followed by '=': character -> (single token, token with '=')
+    compound = {'=': ('ASSIGN', 'EQ'), '!': (None, 'NEQ'), '<': ('LT', 'LE'), '>': ('GT', 'GE')}
+
+    def __init__(self):
+        self.lexdata = None
+        self.lexpos = 0
+        self.lexlen = 0
+        self.lineno = 1
+        self.symbols = None
+        self.diagnostics = None
+
+    def clone(self):
+        """Returns a new Scanner (the PLY lexer has the same method)"""
+        return Scanner()
+
+    def input(self, data):
+        """
+        Inputs data to the scanner. Like the PLY lexer, the line number is not reset
+        """
+        self.lexdata = data
+        self.lexpos = 0
+        self.lexlen = len(data)
+
+    def token(self):
+        """
+        Returns the next token, or None at the end of the input
+        """
+        data = self.lexdata
+        pos = self.lexpos
+        length = self.lexlen
+        dispatch = self.dispatch
+
+        while pos < length:
+            char = data[pos]
+            kind = dispatch.get(char)
+
+            if kind == 'IGNORE':
+                pos += 1
+                continue
+
+            if kind == 'ID':
+                end = self.id_re.match(data, pos).end()
+                value = data[pos:end]
+                type_ = reserved.get(value, 'ID')
+                if type_ == 'ID' and self.symbols is not None:
+                    sym = self.symbols.intern(value)
+                    tok = Token(type_, self.symbols.names[sym], self.lineno, pos)
+                    tok.sym = sym
+                else:
+                    tok = Token(type_, value, self.lineno, pos)
+
+            elif kind == 'NEWLINE':
+                end = pos + 1
+                while end < length and data[end] == '\n':
+                    end += 1
+                tok = Token('NEWLINE', data[pos:end], self.lineno, pos)
+                self.lineno += end - pos
+
+            elif kind == 'COMMENT':
+                end = data.find('\n', pos)
+                pos = length if end < 0 else end
+                continue
+
+            elif kind == 'STRING':
+                m = self.string_re.match(data, pos)
+                if not m:
+                    end = illegal_run(data, pos)
+                    illegal_characters(self, pos, end)
+                    pos = end
+                    continue
+                end = m.end()
+                tok = Token('STRING', data[pos + 1:end - 1], self.lineno, pos)
+
+            elif kind is not None and kind != 'NUMBER':
+                end = pos + 1
+                tok = Token(kind, char, self.lineno, pos)
+
+            elif char in self.compound:
+                single, double = self.compound[char]
+                if data.startswith('=', pos + 1):
+                    end = pos + 2
+                    tok = Token(double, data[pos:end], self.lineno, pos)
+                elif single:
+                    end = pos + 1
+                    tok = Token(single, char, self.lineno, pos)
+                else:
+                    end = illegal_run(data, pos)
+                    illegal_characters(self, pos, end)
+                    pos = end
+                    continue
+
+            else:
+                # Digits, including the unicode ones matched by \d in t_NUMBER
+                m = self.number_re.match(data, pos)
+                if not m:
+                    end = illegal_run(data, pos)
+                    illegal_characters(self, pos, end)
+                    pos = end
+                    continue
+                end = m.end()
+                tok = Token('NUMBER', int(data[pos:end]), self.lineno, pos)
+
+            self.lexpos = end
+            return tok
+
+        # Same as the PLY lexer: the position is moved past the end of the input
+        self.lexpos = pos + 1
+        return None
+
+# Characters that can't start a token or be ignored (the digits matched by \d are excluded too)
+ILLEGAL_RUN = re.compile('[^\\d' + re.escape(''.join(Scanner.dispatch) + ''.join(Scanner.compound)) + ']+')
+
+# -----------------------------------------
+
+# --------------Line index-----------------
+class LineIndex:
+    """
+    Start offset and indentation width (leading spaces) of every line of the input.
+    It is computed once per input with bulk string operations, then lines and columns are found with a binary search.
+    """
+    def __init__(self, data):
+        lines = data.split('\n')
+        self.starts = array('l', accumulate((len(line) + 1 for line in lines[:-1]), initial=0))
+        self.indents = array('l', [len(line) - len(line.lstrip(' ')) for line in lines])
+
+    def line_of(self, pos):
+        """Returns the index (starting from 0) of the line containing the given offset"""
+        return bisect_right(self.starts, pos) - 1
+
+    def column(self, pos):
+        """Returns the column (starting from 1) of the given offset"""
+        return pos - self.starts[self.line_of(pos)] + 1
+
+# -----------------------------------------
+
+# ------------Compact token buffer---------
+# Token kinds are stored as small integers: the index of the token name in the tokens list
+KIND = {name: index for index, name in enumerate(tokens)}
+
+class TokenBuffer:
+    """
+    Struct-of-arrays storage of a whole token stream, used by the IndentLexer in compact mode.
+    Every token takes a few bytes in typed arrays instead of a LexToken object:
+    - kinds: index of the token name in the tokens list
+    - starts, ends: offsets of the lexeme in the source (for INDENT/DEDENT 'ends' stores the indentation level)
+    - linenos: line numbers
+    Identifiers, strings and numbers are not copied: their values are rebuilt from the source only when they are read
+    (the symbol ID of an identifier is looked up again in the symbol table).
+    """
+    def __init__(self, source, line_index=None, symbols=None):
+        self.source = source
+        self.line_index = line_index
+        self.symbols = symbols
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.linenos = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield TokenView(self, index)
+
+    def append(self, tok):
+        """Stores a token produced by the IndentLexer"""
+        type_ = tok.type
+        start = tok.lexpos
+
+        if type_ == 'INDENT' or type_ == 'DEDENT':
+            end = tok.value
+        elif type_ == 'STRING':
+            end = start + len(tok.value) + 2
+        elif type_ == 'NUMBER':
+            end = Scanner.number_re.match(self.source, start).end()
+        else:
+            end = start + len(tok.value)
+
+        self.kinds.append(KIND[type_])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.linenos.append(tok.lineno)
+
+    def extend(self, token_stream):
+        """Stores every token of the stream"""
+        for tok in token_stream:
+            self.append(tok)
+
+    def value(self, index):
+        """Rebuilds the value of a token as the t_ rules would have produced it"""
+        type_ = tokens[self.kinds[index]]
+        start = self.starts[index]
+        end = self.ends[index]
+
+        if type_ == 'INDENT' or type_ == 'DEDENT':
+            return end
+        if type_ == 'STRING':
+            return self.source[start + 1:end - 1]
+        if type_ == 'NUMBER':
+            return int(self.source[start:end])
+        return self.source[start:end]
+
+class TokenView:
+    """
+    Lightweight view on a token of a TokenBuffer. It has the attributes of lex.LexToken read by the parser.
+    """
+    __slots__ = ('buffer', 'index', 'lexer')  # 'lexer' is set by PLY on the token passed to p_error
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def type(self):
+        return tokens[self.buffer.kinds[self.index]]
+
+    @property
+    def value(self):
+        return self.buffer.value(self.index)
+
+    @property
+    def lineno(self):
+        return self.buffer.linenos[self.index]
+
+    @property
+    def lexpos(self):
+        return self.buffer.starts[self.index]
+
+    @property
+    def column(self):
+        return self.buffer.line_index.column(self.lexpos)
+
+    @property
+    def sym(self):
+        symbols = self.buffer.symbols
+        if symbols is None or self.type != 'ID':
+            raise AttributeError('sym')
+        return symbols.ids[self.value]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.type},{self.value!r},{self.lineno},{self.lexpos})"
+
+# -----------------------------------------
+
+# -----------Incremental lexing------------
+class Checkpoints:
+    """
+    State of the IndentLexer at the start of every logical line (after its indentation), stored in parallel arrays:
+    - offsets: position of the logical line start
+    - tokens: index in the token stream of the first token of the line
+    - lines, linenos: index of the line in the line index and line number of the base lexer
+    - stacks: indentation stack (consecutive lines share the same tuple)
+    """
+    def __init__(self):
+        self.offsets = array('l')
+        self.tokens = array('l')
+        self.lines = array('l')
+        self.linenos = array('l')
+        self.stacks = []
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def record(self, offset, token_index, line, lineno, indent_stack):
+        """Records the state at the start of a logical line"""
+        stack = tuple(indent_stack)
+        if self.stacks and self.stacks[-1] == stack:
+            stack = self.stacks[-1]
+
+        self.offsets.append(offset)
+        self.tokens.append(token_index)
+        self.lines.append(line)
+        self.linenos.append(lineno)
+        self.stacks.append(stack)
+
+    def extend(self, other, offset_delta=0, token_delta=0, line_delta=0, start=0, stop=None):
+        """Appends the checkpoints of other[start:stop], shifting them by the given deltas"""
+        self.offsets.extend(map(offset_delta.__add__, other.offsets[start:stop]))
+        self.tokens.extend(map(token_delta.__add__, other.tokens[start:stop]))
+        self.lines.extend(map(line_delta.__add__, other.lines[start:stop]))
+        self.linenos.extend(map(line_delta.__add__, other.linenos[start:stop]))
+        self.stacks.extend(other.stacks[start:stop])
+
+    def find(self, offset, stack):
+        """
+        Returns the index of the checkpoint at the given offset with the given indentation stack, otherwise returns None
+        """
+        index = bisect_left(self.offsets, offset)
+        if index < len(self.offsets) and self.offsets[index] == offset and self.stacks[index] == stack:
+            return index
+        return None
+
+class TokenStream:
+    """
+    Result of IndentLexer.tokenize(): the source, its tokens, the checkpoints, the line index and the symbol table.
+    """
+    def __init__(self, data, tokens, checkpoints, line_index, symbols):
+        self.data = data
+        self.tokens = tokens
+        self.checkpoints = checkpoints
+        self.line_index = line_index
+        self.symbols = symbols
+
 # -----------------------------------------
 
 # --------------Indent Lexer---------------
@@ -123,17 +514,43 @@ class IndentLexer:
     Wrapper for the standard PLY Lexer. It uses the standard PLY Lexer as a base component but it handles the spacing introducing
     the INDENT and DEDENT.
     """
-    def __init__(self, lexer):
+    def __init__(self, lexer=None, engine='ply', compact=False, diagnostics=None):
+        """
+        Wraps the given base lexer. If it is not given, a new one is created with the chosen engine:
+        - 'ply': the PLY lexer built from the rules above
+        - 'scanner': the hand-written Scanner
+        In compact mode the whole input is tokenized into a TokenBuffer and token() returns views on it.
+        Every input gets a new symbol table where the base lexer interns the identifiers.
+        The errors are collected in diagnostics (a new Diagnostics object if it is not given).
+        """
+        if lexer is None:
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown lexer engine '{engine}'. Available engines: {', '.join(ENGINES)}")
+            lexer = ENGINES[engine]()
+
         self.lexer = lexer
+        self.compact = compact
         self.token_stream = None
+        self.line_index = None
+        self.buffer = None
+        self.symbols = None
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
 
     def input(self, data):
         """
         Inputs data to the lexer and initialize the filtering process
         """
         self.lexer.input(data)
+        self.symbols = self.lexer.symbols = Symbols()
+        self.start_diagnostics()
+        self.line_index = LineIndex(data)
         self.token_stream = self.filter()
 
+        if self.compact:
+            self.buffer = TokenBuffer(data, self.line_index, self.symbols)
+            self.buffer.extend(self.token_stream)
+            self.token_stream = iter(self.buffer)
+
     def token(self):
         """
         Return the next token from the filtered token stream
@@ -142,33 +559,39 @@ class IndentLexer:
             return next(self.token_stream)
         except StopIteration:
             return None
+
+    def start_diagnostics(self):
+        """Makes the diagnostics of this lexer the ones used by the base lexer and by the parser in the current context"""
+        self.lexer.diagnostics = self.diagnostics
+        diag.current.set(self.diagnostics)
         
-    def filter(self):
+    def filter(self, line=0, indent_stack=(0,), checkpoints=None):
         """
-        Iterates over the tokens and inserts INDENT or DEDENT tokens for the spacing or newlines handling
+        Iterates over the tokens and inserts INDENT or DEDENT tokens for the spacing or newlines handling.
+        The indentation of each line is read from the line index, and every token gets its column.
+        - line, indent_stack: state to resume from (index of the current line and indentation stack at its start)
+        - checkpoints: if given, the state at the start of every logical line is recorded in it
         """
         tokens = iter(self.lexer.token, None)
+        indents = self.line_index.indents
 
-        indent_stack = [0]
+        indent_stack = list(indent_stack)
+        line_start = self.line_index.starts[line]  # offset of the first character of the current line
+        emitted = 0                                 # number of tokens yielded so far
 
         for token in tokens:
             if token.type == 'NEWLINE':
+                token.column = token.lexpos - line_start + 1
+                emitted += 1
                 yield token
 
-                try:
-                    next_char = self.lexer.lexdata[self.lexer.lexpos]
-                except IndexError:
-                    next_char = ''
+                # The NEWLINE token contains every consecutive newline, so the next token starts a new logical line
+                line += len(token.value)
+                line_start = token.lexpos + len(token.value)
 
-                if next_char == '\n':
-                    continue
-                
-                indent_level = 0
+                indent_level = indents[line]
+                self.lexer.lexpos = line_start + indent_level
 
-                while self.lexer.lexpos < len(self.lexer.lexdata) and self.lexer.lexdata[self.lexer.lexpos] == ' ':
-                    indent_level += 1
-                    self.lexer.lexpos += 1
-                
                 current_level = indent_stack[-1]
 
                 if indent_level > current_level:
@@ -178,6 +601,8 @@ class IndentLexer:
                     tok.value = indent_level
                     tok.lineno = token.lineno
                     tok.lexpos = token.lexpos
+                    tok.column = token.column
+                    emitted += 1
                     yield tok
                 
                 elif indent_level < current_level:
@@ -188,12 +613,20 @@ class IndentLexer:
                         tok.value = indent_level
                         tok.lineno = token.lineno
                         tok.lexpos = token.lexpos
+                        tok.column = token.column
+                        emitted += 1
                         yield tok
                     
                     if indent_level != indent_stack[-1]:
-                        print('Error: Indentation not aligned')
+                        self.diagnostics.add('lexer', 'indentation', f"Indentation not aligned in line {self.lexer.lineno}",
+                                             self.lexer.lineno, indent_level + 1)
+
+                if checkpoints is not None:
+                    checkpoints.record(self.lexer.lexpos, emitted, line, self.lexer.lineno, indent_stack)
             
             else:
+                token.column = token.lexpos - line_start + 1
+                emitted += 1
                 yield token
 
         while len(indent_stack) > 1:
@@ -203,18 +636,177 @@ class IndentLexer:
             tok.value = indent_stack[-1]
             tok.lineno = self.lexer.lineno
             tok.lexpos = 0
+            tok.column = 1
             yield tok
 
+# ----------Incremental lexing methods----------
+
+    def tokenize(self, data):
+        """
+        Tokenizes the whole input, recording a checkpoint at the start of every logical line.
+        Returns a TokenStream that can be updated with relex() after an edit.
+        """
+        self.lexer.input(data)
+        self.symbols = self.lexer.symbols = Symbols()
+        self.start_diagnostics()
+        self.line_index = LineIndex(data)
+
+        checkpoints = Checkpoints()
+        checkpoints.record(0, 0, 0, self.lexer.lineno, [0])
+        tokens = list(self.filter(checkpoints=checkpoints))
+
+        return TokenStream(data, tokens, checkpoints, self.line_index, self.symbols)
+
+    def relex(self, stream, start, end, text):
+        """
+        Updates a TokenStream after the edit that replaces the characters from start to end with text.
+        Lexing resumes from the last checkpoint before the edit and stops at the first line after the edit where the
+        position and the indentation stack match an old checkpoint: from there on the old tokens are reused.
+        The tokens and the symbol table of the old stream are moved to the new one, so the old stream must not be used anymore.
+        Only the errors found in the relexed lines are reported to the diagnostics.
+        """
+        data = stream.data[:start] + text + stream.data[end:]
+        delta = len(text) - (end - start)
+        edit_end = start + len(text)
+        old = stream.checkpoints
+
+        # The checkpoint must be before the edit: an edit at the start of a logical line can change its indentation
+        k = max(bisect_left(old.offsets, start) - 1, 0)
+        base = old.tokens[k]
+
+        self.lexer.input(data)
+        self.lexer.lexpos = old.offsets[k]
+        self.lexer.lineno = old.linenos[k]
+        self.symbols = self.lexer.symbols = stream.symbols
+        self.start_diagnostics()
+        self.line_index = LineIndex(data)
+
+        old_starts = stream.line_index.starts
+        relexed = []
+        new = Checkpoints()
+        resync = None
+
+        for tok in self.filter(old.lines[k], old.stacks[k], new):
+            # A new logical line has started with this token: if the whole line is after the edit, check if the old stream
+            # can be reused from here
+            if len(new) and new.tokens[-1] == len(relexed) and self.line_index.starts[new.lines[-1]] >= edit_end:
+                j = old.find(new.offsets[-1] - delta, new.stacks[-1])
+                # The old line must start at the same place too: an edit ending at the start of the line can change its
+                # indentation width without moving its first token (e.g. on misaligned lines), and the columns with it
+                if j is not None and old_starts[old.lines[j]] == self.line_index.starts[new.lines[-1]] - delta:
+                    resync = j
+                    break
+            relexed.append(tok)
+
+        checkpoints = Checkpoints()
+        checkpoints.extend(old, stop=k + 1)
+
+        if resync is None:
+            checkpoints.extend(new, token_delta=base)
+            return TokenStream(data, stream.tokens[:base] + relexed, checkpoints, self.line_index, self.symbols)
+
+        token_delta = base + len(relexed) - old.tokens[resync]
+        line_delta = new.linenos[-1] - old.linenos[resync]
+
+        tail = stream.tokens[old.tokens[resync]:]
+        if delta or line_delta:
+            for tok in tail:
+                tok.lineno += line_delta
+                if tok.lexpos or tok.type != 'DEDENT':  # the DEDENT tokens at the end of the file are always at position 0
+                    tok.lexpos += delta
+
+        checkpoints.extend(new, token_delta=base, stop=len(new) - 1)
+        checkpoints.extend(old, delta, token_delta, line_delta, start=resync)
+
+        return TokenStream(data, stream.tokens[:base] + relexed + tail, checkpoints, self.line_index, self.symbols)
+
+    def resume(self, data, line_index, symbols, offset, line, lineno, indent_stack):
+        """
+        Lexes data from the given offset, with the state at the start of its line (index and number of the line, indentation
+        stack) and the line index and the symbol table of a previous input of the same data.
+        Used to lex again a part of an input, e.g. the body of a function skimmed by the parser in lazy mode.
+        """
+        self.lexer.input(data)
+        self.lexer.lexpos = offset
+        self.lexer.lineno = lineno
+        self.symbols = self.lexer.symbols = symbols
+        self.lexer.diagnostics = self.diagnostics
+        self.line_index = line_index
+        self.token_stream = self.filter(line, indent_stack)
+
+    def replay(self, stream, start=0, stop=None):
+        """
+        Serves the tokens of a TokenStream (or only the ones from index start to stop) through token(), e.g. to parse it
+        with parser.parse(None, lexer=lexer)
+        """
+        self.line_index = stream.line_index
+        self.symbols = stream.symbols
+        self.token_stream = iter(stream.tokens[start:stop] if start or stop is not None else stream.tokens)
+
 # -----------------------------------------
 
-raw_lexer = lex.lex()
+# --------------Table cache----------------
+
+def rules_signature():
+    """
+    Collects every token rule of this module (in definition order) to identify the lexer tables
+    """
+    rules = []
+    for name, rule in globals().items():
+        if name.startswith('t_'):
+            rules.append((name, rule if isinstance(rule, str) else rule.__doc__))
+    return (tuple(tokens), tuple(reserved.items()), tuple(rules))
+
+def build_lexer():
+    """
+    Builds the PLY lexer reading the master regex from the table cache when possible.
+    On a cache miss the lexer is built and validated as usual and the table is saved for the next run.
+    """
+    if not table_cache.enabled():
+        return lex.lex()
+
+    lextab = table_cache.table_name('lextab', *rules_signature())
+    cached = table_cache.load_module(lextab)
+
+    if cached is not None:
+        try:
+            return lex.lex(optimize=True, lextab=cached)
+        except Exception:
+            pass
+
+    built = lex.lex()
+    outputdir = table_cache.write_dir()
+
+    if outputdir:
+        try:
+            built.writetab(lextab, outputdir)
+        except OSError:
+            pass
+    return built
+
+# -----------------------------------------
+
+raw_lexer = build_lexer()
+# Set by the IndentLexer for every input (cloned lexers start without a symbol table and without diagnostics)
+raw_lexer.symbols = None
+raw_lexer.diagnostics = None
 lexer = IndentLexer(raw_lexer)
 
+# Base lexers that can be wrapped by the IndentLexer
+ENGINES = {
+    'ply': raw_lexer.clone,
+    'scanner': Scanner
+}
+
 # --------Just for testing purposes--------
 def find_column(input_text, token):
     """
-    Helper function that computes the column of each token
+    Helper function that computes the column of each token.
+    Tokens produced by the IndentLexer already carry their column, so the text is scanned only for other tokens.
     """
+    if hasattr(token, 'column'):
+        return token.column
+
     line_start = input_text.rfind('\n', 0, token.lexpos) + 1
     return (token.lexpos - line_start) + 1
 
@@ -281,4 +873,7 @@ if workingOnTranspiler:
         print(f"| {tok.type:<15} | {val:<25} | {tok.lineno:<5} | {col:<5} | {tok.lexpos:<5} |")
 
     print("-" * len(header))
+
+    for message in lexer.diagnostics.messages():
+        print(message)
     print("---TEST LEXER END---")
\ No newline at end of file
@@ -1,86 +1,212 @@
 import ply.yacc as yacc
-from lexer import tokens, lexer
+from lexer import tokens, lexer, IndentLexer, Token
+import diagnostics as diag
+import table_cache
 import textwrap
+import os
+import copy
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from typing import List, Optional, Any
 import pprint
 
-errors = []
-
 # --------------Dataclass definiment---------------
+# The nodes are slotted (no per-instance __dict__, large programs produce millions of them) and frozen: the tree is never
+# modified after parsing. The blocks and the argument lists are still plain lists built by the grammar rules.
 Expr = Any
 
-@dataclass
+# Symbol IDs assigned by the lexer to the identifiers (see lexer.Symbols). They are not shown and not compared,
+# so two trees are equal when they differ only in the numbering of the names. Hand-built nodes leave them to None.
+def symbol_id():
+    return field(default=None, repr=False, compare=False)
+
+def symbol_key(name, sym_id):
+    """Key of an identifier in the scopes of the semantic analyzer and the code generator: the symbol ID, or the name if it is None"""
+    return name if sym_id is None else sym_id
+
+def param_keys(params, param_ids):
+    """Keys of the parameters of a function declaration"""
+    return [symbol_key(name, sym_id) for name, sym_id in zip(params, param_ids or [None] * len(params))]
+
+@dataclass(slots=True, frozen=True)
 class Number:
     value: int
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class String:
     value: str
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Boolean:
     value: str
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BinOp:
     left: Expr
     op: str
     right: Expr
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UnaryOp:
     op: str
     expr: Expr
     
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AssignStat:
     name: str
     value: Expr
+    sym_id: Optional[int] = symbol_id()
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PrintStat:
     value: Expr
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ReturnStat:
     value: Expr
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Var:
     name: str
+    sym_id: Optional[int] = symbol_id()
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class InputExpr:
     prompt: str
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FunctionCall:
     name: str
     args: List[Expr] = field(default_factory=list)
+    sym_id: Optional[int] = symbol_id()
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExprStat:
     expr: Expr
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class IfStat:
     condition: Expr
     true_block: List[Any]
     false_block: Optional[List[Any]] = None  # false_block is defined only if Else statement is present
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ForStat:
     iterator: str
     start: Expr
     end: Expr
     body: List[Any]
+    iterator_id: Optional[int] = symbol_id()
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FunctionDecl:
     name: str # function name
     params: List[str] # List of parameters
     body: List[Any] # block of code of the function
+    sym_id: Optional[int] = symbol_id()
+    param_ids: Optional[List[int]] = symbol_id()
+
+@dataclass(slots=True, frozen=True)
+class ErrorStat:
+    """Statement skipped by the error recovery of the parser: the next stages ignore it"""
+    line: Optional[int] = None # line of the syntax error
+
+# -----------------------------------------
+
+# --------------Node builders--------------
+
+class TreeBuilder:
+    """
+    Builds the nodes of the grammar rules and of the DescentParser: one method per node class, taking the fields of the
+    dataclass, block() for the blocks of statements and program() for the whole program.
+    This one builds the dataclass tree (the methods are the classes themselves). NodeTable shares the identical nodes,
+    and ast_arena.ArenaBuilder appends the nodes to an arena instead (parse(arena=True)).
+    """
+    number = Number
+    string = String
+    boolean = Boolean
+    var = Var
+    input_expr = InputExpr
+    bin_op = BinOp
+    unary_op = UnaryOp
+    assign_stat = AssignStat
+    print_stat = PrintStat
+    return_stat = ReturnStat
+    expr_stat = ExprStat
+    if_stat = IfStat
+    for_stat = ForStat
+    function_decl = FunctionDecl
+    function_call = FunctionCall
+    error_stat = ErrorStat
+
+    @staticmethod
+    def block(statements):
+        return statements
+
+    @staticmethod
+    def program(statements):
+        return statements
+
+class NodeTable(TreeBuilder):
+    """
+    Hash-consing of the nodes of one compilation (parse(share=True)): the identical literals and variable references, and
+    the operations whose operands are all shared (pure subexpressions like 'x + 1'), are built once and reused.
+    The operations are keyed by the identity of their operands, so looking them up doesn't walk the subtree.
+    The calls and input() are never shared. As the nodes are frozen the tree is the same, and the equality of two
+    shared subtrees is decided by the identity check of their fields.
+    """
+    def __init__(self):
+        self.nodes = {}
+        self.ids = set()  # id() of the shared nodes, kept alive by self.nodes
+
+    def add(self, key, node):
+        self.nodes[key] = node
+        self.ids.add(id(node))
+        return node
+
+    def leaf(self, cls, *fields):
+        """Number, String, Boolean or Var with the given fields (for Var the symbol ID too)"""
+        key = (cls, *fields)
+        node = self.nodes.get(key)
+        return node if node is not None else self.add(key, cls(*fields))
+
+    def number(self, value):
+        return self.leaf(Number, value)
+
+    def string(self, value):
+        return self.leaf(String, value)
+
+    def boolean(self, value):
+        return self.leaf(Boolean, value)
+
+    def var(self, name, sym_id=None):
+        return self.leaf(Var, name, sym_id)
+
+    def bin_op(self, left, op, right):
+        ids = self.ids
+        if id(left) not in ids or id(right) not in ids:
+            return BinOp(left, op, right)
+        key = (BinOp, id(left), op, id(right))
+        node = self.nodes.get(key)
+        return node if node is not None else self.add(key, BinOp(left, op, right))
+
+    def unary_op(self, op, expr):
+        if id(expr) not in self.ids:
+            return UnaryOp(op, expr)
+        key = (UnaryOp, op, id(expr))
+        node = self.nodes.get(key)
+        return node if node is not None else self.add(key, UnaryOp(op, expr))
+
+    def __len__(self):
+        return len(self.nodes)
+
+TREE_BUILDER = TreeBuilder()
+
+# Node builder of the compilation running in the current thread/context. Set by parse()
+node_builder = ContextVar('node_builder', default=TREE_BUILDER)
 
 # -----------------------------------------
 
@@ -95,16 +221,20 @@ precedence = (
 )
 
 # -----------Basic grammar rules-----------
+def symbol(p, n):
+    """Returns the symbol ID of the identifier p[n], or None if the lexer doesn't intern the identifiers"""
+    return getattr(p.slice[n], 'sym', None)
+
 def p_program(p):
     '''program : statements'''
-    p[0] = p[1]
+    p[0] = node_builder.get().program(p[1])
 
 def p_statements_multi(p):
     '''statements : statements statement'''
+    # The list is extended in place: copying it at every reduction would make the parsing quadratic in the number of statements
     if p[2] is not None:
-        p[0] = p[1] + [p[2]]
-    else:
-        p[0] = p[1]
+        p[1].append(p[2])
+    p[0] = p[1]
     
 def p_statements_single(p):
     '''statements : statement'''
@@ -119,69 +249,92 @@ def p_statement_newline(p):
 
 def p_statement_assign(p):
     '''statement : ID ASSIGN expression NEWLINE'''
-    p[0] = AssignStat(p[1], p[3])
+    p[0] = node_builder.get().assign_stat(p[1], p[3], symbol(p, 1))
 
 def p_statement_print(p):
     '''statement : PRINT LPAREN expression RPAREN NEWLINE'''
-    p[0] = PrintStat(p[3])
+    p[0] = node_builder.get().print_stat(p[3])
 
 def p_statement_return(p):
     '''statement : RETURN expression NEWLINE'''
-    p[0] = ReturnStat(p[2])
+    p[0] = node_builder.get().return_stat(p[2])
 
 def p_statement_if(p):
     '''statement : IF expression COLON block
                  | IF expression COLON block ELSE COLON block'''
+    build = node_builder.get()
     if len(p) == 5: 
-        p[0] = IfStat(p[2], p[4]) 
+        p[0] = build.if_stat(p[2], p[4]) 
     else:
-        p[0] = IfStat(p[2], p[4], p[7])
+        p[0] = build.if_stat(p[2], p[4], p[7])
 
 def p_statement_elif(p):
-    '''statement : IF expression COLON block elif_blocks'''
-    p[0] = IfStat(p[2], p[4], p[5])
+    '''statement : IF expression COLON block elif_blocks
+                 | IF expression COLON block elif_blocks ELSE COLON block'''
+    # Every elif becomes an IfStat nested in the false block of the previous one, built from the last to the first
+    build = node_builder.get()
+    false_block = p[8] if len(p) == 9 else None
+    for condition, block in reversed(p[5]):
+        false_block = build.block([build.if_stat(condition, block, false_block)])
+    p[0] = build.if_stat(p[2], p[4], false_block)
 
 def p_elif_blocks(p):
-    '''elif_blocks : ELIF expression COLON block elif_blocks
-                   | ELIF expression COLON block ELSE COLON block
+    '''elif_blocks : elif_blocks ELIF expression COLON block
                    | ELIF expression COLON block'''
+    # (condition, block) pairs of the elif chain, collected left to right like the statements
     if len(p) == 6:
-        p[0] = [IfStat(p[2], p[4], p[5])] if p[5] else [IfStat(p[2], p[4])]
-    elif len(p) == 8:
-        p[0] = [IfStat(p[2], p[4], p[7])]
-    elif len(p) == 5:
-        p[0] = [IfStat(p[2], p[4])]
+        p[1].append((p[3], p[5]))
+        p[0] = p[1]
+    else:
+        p[0] = [(p[2], p[4])]
 
 def p_block(p):
     '''block : NEWLINE INDENT statements DEDENT'''
-    p[0] = p[3]
+    p[0] = node_builder.get().block(p[3])
 
 def p_statement_for(p):
     '''statement : FOR ID IN RANGE LPAREN expression RPAREN COLON block
                  | FOR ID IN RANGE LPAREN expression COMMA expression RPAREN COLON block'''
+    build = node_builder.get()
     if len(p) == 10:
-        p[0] = ForStat(p[2], Number(0), p[6], p[9])
+        p[0] = build.for_stat(p[2], build.number(0), p[6], p[9], symbol(p, 2))
     else:
-        p[0] = ForStat(p[2], p[6], p[8], p[11])
+        p[0] = build.for_stat(p[2], p[6], p[8], p[11], symbol(p, 2))
 
 def p_statement_def(p):
     '''statement : DEF ID LPAREN parameters RPAREN COLON block'''
-    p[0] = FunctionDecl(p[2], p[4], p[7])
+    params = [name for name, _ in p[4]]
+    param_ids = [sym for _, sym in p[4]]
+    p[0] = node_builder.get().function_decl(p[2], params, p[7], symbol(p, 2), param_ids)
 
 def p_parameters(p):
     '''parameters : parameters COMMA ID
                   | ID
                   | empty'''
+    # Every parameter is a (name, symbol ID) pair, split by the function declaration
     if len(p) == 4:
-        p[0] = p[1] + [p[3]]
+        p[1].append((p[3], symbol(p, 3)))
+        p[0] = p[1]
     elif len(p) == 2 and p[1] is not None:
-        p[0] = [p[1]]
+        p[0] = [(p[1], symbol(p, 1))]
     else:
         p[0] = []
 
+def p_statement_error(p):
+    '''statement : error NEWLINE
+                 | error block
+                 | error block ELSE COLON block
+                 | error block elif_blocks
+                 | error block elif_blocks ELSE COLON block'''
+    # Panic mode recovery: after a syntax error the tokens are skipped up to the end of the line, so the parsing goes on
+    # from the next statement. The block of a broken header (and its elif/else) is still parsed to report its errors.
+    p[0] = node_builder.get().error_stat(p.lineno(1))
+    # The next syntax error is reported even if it is in the following statement
+    p.parser.errok()
+
 def p_statement_expr(p):
     '''statement : expression NEWLINE'''
-    p[0] = ExprStat(p[1])
+    p[0] = node_builder.get().expr_stat(p[1])
 
 def p_expression_binop(p):
     '''expression : expression PLUS expression
@@ -196,23 +349,24 @@ def p_expression_binop(p):
                   | expression NEQ expression
                   | expression AND expression
                   | expression OR expression'''
-    p[0] = BinOp(p[1], p[2], p[3])
+    p[0] = node_builder.get().bin_op(p[1], p[2], p[3])
 
 def p_expression_unary(p):
     '''expression : MINUS  expression %prec UMINUS
                   | NOT expression'''
-    p[0] = UnaryOp(p[1], p[2])
+    p[0] = node_builder.get().unary_op(p[1], p[2])
 
 def p_expression_call(p):
     '''expression : ID LPAREN arguments RPAREN'''
-    p[0] = FunctionCall(p[1], p[3])
+    p[0] = node_builder.get().function_call(p[1], p[3], symbol(p, 1))
 
 def p_arguments(p):
     '''arguments : arguments COMMA expression
                  | expression
                  | empty'''
     if len(p) == 4:
-        p[0] = p[1] + [p[3]]
+        p[1].append(p[3])
+        p[0] = p[1]
     elif len(p) == 2 and p[1] is not None:
         p[0] = [p[1]]
     else: 
@@ -220,7 +374,7 @@ def p_arguments(p):
 
 def p_expression_input(p):
     '''expression : INPUT LPAREN STRING RPAREN'''
-    p[0] = InputExpr(p[3])
+    p[0] = node_builder.get().input_expr(p[3])
 
 def p_expression_group(p):
     '''expression : LPAREN expression RPAREN'''
@@ -228,34 +382,37 @@ def p_expression_group(p):
 
 def p_expression_number(p):
     '''expression : NUMBER'''
-    p[0] = Number(p[1])
+    p[0] = node_builder.get().number(p[1])
 
 def p_expression_string(p):
     '''expression : STRING'''
-    p[0] = String(p[1])
+    p[0] = node_builder.get().string(p[1])
 
 def p_expression_bool(p):
     '''expression : TRUE
                   | FALSE'''
-    p[0] = Boolean(p[1])
+    p[0] = node_builder.get().boolean(p[1])
 
 def p_expression_id(p):
     '''expression : ID'''
-    p[0] = Var(p[1])
+    p[0] = node_builder.get().var(p[1], symbol(p, 1))
 
 def p_empty(p):
     'empty :'
     pass
 
 def p_error(p):
+    # The diagnostics of the running compilation (p_error doesn't receive the lexer at the end of the file)
+    diagnostics = diag.current.get()
+    if diagnostics is None:
+        return
+
     if p:
         error_msg = f"Syntax error for token {repr(p.value)} (line {p.lineno})"
-        print(error_msg)
-        errors.append(error_msg)
+        diagnostics.add('parser', 'syntax-error', error_msg, p.lineno, getattr(p, 'column', None))
     else:
         error_msg = "Syntax error at the end of the file"
-        print(error_msg)
-        errors.append(error_msg)
+        diagnostics.add('parser', 'syntax-error', error_msg)
 
 # -----------------------------------------
 
@@ -266,8 +423,645 @@ class SilentLogger:
     def info(self, msg, *args, **kwargs): pass
     def debug(self, msg, *args, **kwargs): pass
 
-# PLY writes on this silentlogger which does nothing. This prevents crashes due to the absence of console while using the gui.
-parser = yacc.yacc(write_tables=False, debug=False, errorlog=SilentLogger())
+# -----------------------------------------
+
+# --------------Table cache----------------
+
+def grammar_signature():
+    """
+    Collects precedence, tokens and every grammar rule of this module (in definition order) to identify the parser tables
+    """
+    rules = []
+    for name, rule in globals().items():
+        if name.startswith('p_') and callable(rule):
+            rules.append((name, rule.__doc__))
+    return (tuple(precedence), tuple(tokens), tuple(rules))
+
+def build_parser():
+    """
+    Builds the LALR parser reading the tables from the table cache when possible.
+    The tables are stored with PLY's pickle format, which loads faster than a table module.
+    PLY compares the grammar signature stored in the table too, so a stale table is always regenerated.
+    """
+    # PLY writes on this silentlogger which does nothing. This prevents crashes due to the absence of console while using the gui.
+    if table_cache.enabled():
+        filename = table_cache.table_name('parsetab', *grammar_signature()) + '.pickle'
+        picklefile = table_cache.find_table(filename)
+
+        if picklefile is None:
+            outputdir = table_cache.write_dir()
+            picklefile = os.path.join(outputdir, filename) if outputdir else None
+
+        if picklefile:
+            try:
+                return yacc.yacc(picklefile=picklefile, debug=False, errorlog=SilentLogger())
+            except Exception:
+                # Unreadable table (e.g. written by another process at the same time): build it in memory
+                pass
+
+    return yacc.yacc(write_tables=False, debug=False, errorlog=SilentLogger())
+
+# -----------------------------------------
+
+# ----------Recursive descent parser-------
+
+# Binary operator token -> (precedence level, associativity), taken from the precedence table used by yacc
+LEVELS = {token: (level, assoc) for level, (assoc, *names) in enumerate(precedence, 1) for token in names}
+BINARY = {token: LEVELS[token] for token in LEVELS if token not in ('NOT', 'UMINUS')}
+
+class ParseError(Exception):
+    """Raised by the DescentParser on the first token (None at the end of the input) that doesn't fit the grammar"""
+    def __init__(self, token):
+        super().__init__(token)
+        self.token = token
+
+class DescentParser:
+    """
+    Alternative engine to ply.yacc. It is a hand-written recursive descent parser of exactly the grammar rules above,
+    with precedence climbing for the expressions driven by the same precedence table (including UMINUS and the
+    non-associative comparisons), and it builds the same AST.
+    It exposes the parse(input, lexer) method of the yacc parser. The first syntax error is reported through p_error
+    with the same message as yacc, then the parsing stops and None is returned (yacc tries to resume after the error).
+    The tokens are pulled from the lexer one at a time with one token of lookahead, so they are freed as soon as they are
+    consumed. A new DescentParser is used for every compilation.
+    """
+    def __init__(self, lazy=False):
+        self.lexer = None
+        # Current token and the next one, with their types (None at the end of the input)
+        self.tok = self.next_tok = None
+        self.type = self.next_type = None
+        # In lazy mode the function bodies are skimmed and returned as LazyBody objects reading the input from source
+        self.lazy = lazy
+        self.source = None
+        self.build = TREE_BUILDER  # node builder of the compilation
+
+    def parse(self, input=None, lexer=None):
+        if input is not None:
+            lexer.input(input)
+        if self.lazy:
+            self.source = LazySource(lexer)
+        self.start(lexer)
+
+        try:
+            return self.build.program(self.statements(None))
+        except ParseError as e:
+            p_error(e.token)
+            # The rest of the input is still lexed, so the lexer errors are the same reported with yacc
+            if self.next_tok is not None:
+                for _ in iter(lexer.token, None):
+                    pass
+            return None
+
+    def parse_body(self, lexer, source):
+        """Parses the statements of a LazyBody, up to the DEDENT closing it. Returns None after a syntax error"""
+        self.source = source
+        self.start(lexer)
+        try:
+            return self.statements('DEDENT')
+        except ParseError as e:
+            p_error(e.token)
+            return None
+
+# --------------Helper methods-------------
+
+    def start(self, lexer):
+        """Starts reading the tokens of the lexer"""
+        self.lexer = lexer
+        self.build = node_builder.get()
+        self.next_tok = lexer.token()
+        self.next_type = self.next_tok.type if self.next_tok is not None else None
+        self.advance()
+
+    def advance(self):
+        """Moves to the next token and returns the one consumed"""
+        tok = self.tok
+        self.tok, self.type = self.next_tok, self.next_type
+        if self.next_tok is not None:
+            self.next_tok = self.lexer.token()
+            self.next_type = self.next_tok.type if self.next_tok is not None else None
+        return tok
+
+    def error(self):
+        """Raises the syntax error for the current token"""
+        raise ParseError(self.tok)
+
+    def expect(self, type_):
+        """Consumes the current token if it has the given type, otherwise it is a syntax error"""
+        if self.type != type_:
+            self.error()
+        return self.advance()
+
+# -----------------------------------------
+
+    def statements(self, end):
+        """statements : statements statement | statement, up to the token of type 'end' (not consumed)"""
+        result = []
+        while True:
+            stmt = self.statement()
+            if stmt is not None:
+                result.append(stmt)
+            if self.type == end:
+                return result
+
+    def block(self):
+        """block : NEWLINE INDENT statements DEDENT"""
+        self.expect('NEWLINE')
+        self.expect('INDENT')
+        body = self.statements('DEDENT')
+        self.advance()
+        return self.build.block(body)
+
+    def statement(self):
+        """Dispatches on the first token of the statement: anything that isn't a keyword starts an expression statement"""
+        return self.STATEMENTS.get(self.type, DescentParser.expression_statement)(self)
+
+    def newline_statement(self):
+        self.advance()
+        return None
+
+    def expression_statement(self):
+        """statement : ID ASSIGN expression NEWLINE | expression NEWLINE"""
+        if self.next_type == 'ASSIGN' and self.type == 'ID':
+            tok = self.advance()
+            self.advance()
+            value = self.expression()
+            self.expect('NEWLINE')
+            return self.build.assign_stat(tok.value, value, getattr(tok, 'sym', None))
+
+        value = self.expression()
+        self.expect('NEWLINE')
+        return self.build.expr_stat(value)
+
+    def print_statement(self):
+        self.advance()
+        self.expect('LPAREN')
+        value = self.expression()
+        self.expect('RPAREN')
+        self.expect('NEWLINE')
+        return self.build.print_stat(value)
+
+    def return_statement(self):
+        self.advance()
+        value = self.expression()
+        self.expect('NEWLINE')
+        return self.build.return_stat(value)
+
+    def if_statement(self):
+        """IF expression COLON block, followed by the optional elif chain and else block"""
+        self.advance()
+        condition = self.expression()
+        self.expect('COLON')
+        true_block = self.block()
+
+        elifs = []
+        while self.type == 'ELIF':
+            self.advance()
+            elif_condition = self.expression()
+            self.expect('COLON')
+            elifs.append((elif_condition, self.block()))
+
+        false_block = None
+        if self.type == 'ELSE':
+            self.advance()
+            self.expect('COLON')
+            false_block = self.block()
+
+        # Same nesting of p_statement_elif
+        build = self.build
+        for elif_condition, block in reversed(elifs):
+            false_block = build.block([build.if_stat(elif_condition, block, false_block)])
+        return build.if_stat(condition, true_block, false_block)
+
+    def for_statement(self):
+        """Both forms of range(): the start is Number(0) if it is missing"""
+        self.advance()
+        tok = self.expect('ID')
+        self.expect('IN')
+        self.expect('RANGE')
+        self.expect('LPAREN')
+        start = self.expression()
+        if self.type == 'COMMA':
+            self.advance()
+            end = self.expression()
+        else:
+            start, end = self.build.number(0), start
+        self.expect('RPAREN')
+        self.expect('COLON')
+        return self.build.for_stat(tok.value, start, end, self.block(), getattr(tok, 'sym', None))
+
+    def def_statement(self):
+        self.advance()
+        tok = self.expect('ID')
+        self.expect('LPAREN')
+        params = self.sequence(lambda: self.expect('ID'))
+        self.expect('RPAREN')
+        self.expect('COLON')
+        body = self.skim_block() if self.lazy else self.block()
+        return self.build.function_decl(tok.value, [param.value for param in params], body, getattr(tok, 'sym', None),
+                                        [getattr(param, 'sym', None) for param in params])
+
+    def skim_block(self):
+        """
+        Lazy version of block() for the function bodies: the tokens are skipped following the INDENT/DEDENT balance
+        without building any node, and the returned LazyBody records where the body starts to parse it when needed
+        """
+        self.expect('NEWLINE')
+        indent = self.expect('INDENT').value
+        line = self.source.line_index.line_of(self.tok.lexpos)
+        body = LazyBody(self.source, self.source.line_index.starts[line] + indent, line, self.tok.lineno, indent)
+
+        depth = 1
+        while depth:
+            if self.type == 'INDENT':
+                depth += 1
+            elif self.type == 'DEDENT':
+                depth -= 1
+            elif self.type is None:
+                self.error()
+            self.advance()
+        return body
+
+    def sequence(self, item):
+        """
+        Comma separated items of the parameters and arguments rules, up to the closing RPAREN (not consumed).
+        As in the grammar, the first item can be empty: '(, a)' is the same as '(a)'.
+        """
+        result = []
+        if self.type == 'RPAREN':
+            return result
+        if self.type != 'COMMA':
+            result.append(item())
+        while self.type == 'COMMA':
+            self.advance()
+            result.append(item())
+        return result
+
+    def expression(self, min_level=1):
+        """Precedence climbing: parses an expression whose binary operators have at least the given precedence level"""
+        left = self.OPERANDS.get(self.type, DescentParser.error)(self)
+        while True:
+            info = BINARY.get(self.type)
+            if info is None or info[0] < min_level:
+                return left
+
+            level, assoc = info
+            op = self.advance().value
+            right = self.expression(level if assoc == 'right' else level + 1)
+            left = self.build.bin_op(left, op, right)
+
+            # a < b < c is a syntax error on the second operator
+            if assoc == 'nonassoc' and BINARY.get(self.type, (None,))[0] == level:
+                self.error()
+
+    def unary(self):
+        """MINUS expression %prec UMINUS, NOT expression: the operand takes the operators binding tighter than the prefix"""
+        tok = self.advance()
+        level, assoc = LEVELS['UMINUS' if tok.type == 'MINUS' else 'NOT']
+        expr = self.expression(level if assoc == 'right' else level + 1)
+        return self.build.unary_op(tok.value, expr)
+
+    def literal(self):
+        """NUMBER, STRING, TRUE and FALSE"""
+        tok = self.advance()
+        return getattr(self.build, self.LITERALS[tok.type])(tok.value)
+
+    def identifier(self):
+        """ID (a variable) or ID LPAREN arguments RPAREN (a call)"""
+        tok = self.advance()
+        if self.type != 'LPAREN':
+            return self.build.var(tok.value, getattr(tok, 'sym', None))
+
+        self.advance()
+        args = self.sequence(self.expression)
+        self.expect('RPAREN')
+        return self.build.function_call(tok.value, args, getattr(tok, 'sym', None))
+
+    def input_expression(self):
+        self.advance()
+        self.expect('LPAREN')
+        prompt = self.expect('STRING')
+        self.expect('RPAREN')
+        return self.build.input_expr(prompt.value)
+
+    def group(self):
+        self.advance()
+        value = self.expression()
+        self.expect('RPAREN')
+        return value
+
+    # First token -> method parsing the statement or the operand (looked up once instead of a chain of comparisons)
+    STATEMENTS = {
+        'NEWLINE': newline_statement,
+        'PRINT': print_statement,
+        'RETURN': return_statement,
+        'IF': if_statement,
+        'FOR': for_statement,
+        'DEF': def_statement
+    }
+    OPERANDS = {
+        'NUMBER': literal, 'STRING': literal, 'TRUE': literal, 'FALSE': literal,
+        'ID': identifier,
+        'INPUT': input_expression,
+        'LPAREN': group,
+        'MINUS': unary, 'NOT': unary
+    }
+    # Token type -> name of the method of the node builder
+    LITERALS = {'NUMBER': 'number', 'STRING': 'string', 'TRUE': 'boolean', 'FALSE': 'boolean'}
+
+# -----------------------------------------
+
+# ----------Lazy function bodies-----------
+
+class LazySource:
+    """Input of a lazy parsing, shared by its LazyBody objects: what is needed to lex again a part of it"""
+    __slots__ = ('data', 'line_index', 'symbols', 'new_lexer', 'diagnostics', 'builder')
+
+    def __init__(self, lexer):
+        self.data = lexer.lexer.lexdata
+        self.line_index = lexer.line_index
+        self.symbols = lexer.symbols
+        self.new_lexer = lexer.lexer.clone  # a new base lexer of the same engine
+        self.diagnostics = lexer.diagnostics
+        self.builder = node_builder.get()
+
+@dataclass(slots=True, eq=False)
+class LazyBody:
+    """
+    Body of a FunctionDecl skimmed by the DescentParser in lazy mode. Only the state of the lexer at its first line is
+    recorded: the statements are parsed at the first call of parse().
+    """
+    source: LazySource = field(repr=False)
+    offset: int  # position of the first token of the body
+    line: int    # index of its line in the line index
+    lineno: int
+    indent: int  # indentation of the body
+    statements: Optional[List[Any]] = field(default=None, repr=False)
+
+    def parse(self):
+        """
+        Returns the statements of the body, parsing them the first time.
+        The syntax errors are reported to the diagnostics of the parsing that skimmed the body, which is then empty.
+        """
+        if self.statements is None:
+            source = self.source
+            # The lexer errors of the body have already been reported while skimming it
+            lexer = IndentLexer(source.new_lexer(), diagnostics=diag.Diagnostics())
+            lexer.resume(source.data, source.line_index, source.symbols, self.offset, self.line, self.lineno,
+                         (0, self.indent))
+
+            token = diag.current.set(source.diagnostics)
+            builder_token = node_builder.set(source.builder)
+            try:
+                self.statements = DescentParser(lazy=True).parse_body(lexer, source) or []
+            finally:
+                node_builder.reset(builder_token)
+                diag.current.reset(token)
+        return self.statements
+
+# -----------------------------------------
+
+parser = build_parser()
+
+def recovery_tokens(lexer):
+    """
+    Token function of the yacc engine: the tokens of the lexer, preceded by a NEWLINE (an empty statement) if the input
+    isn't empty. When the first statement is broken PLY is still in its start state, where it drops the tokens one at a
+    time instead of shifting the 'error' token of p_statement_error: the line would have no ErrorStat, and the error
+    of the next line would be swallowed by the recovery. After the NEWLINE the start state is never the current one.
+    """
+    def tokens():
+        first = lexer.token()
+        if first is None:
+            return
+        newline = Token('NEWLINE', '', first.lineno, first.lexpos)
+        newline.column = getattr(first, 'column', None)
+        yield newline
+        yield first
+        yield from iter(lexer.token, None)
+
+    stream = tokens()
+    return lambda: next(stream, None)
+
+# Parser of every thread (see thread_parser)
+threads = threading.local()
+
+def thread_parser():
+    """
+    The LALR parser of the current thread. PLY keeps the state of a parsing (state and symbol stacks, error recovery flag)
+    on the parser object, so two threads parsing with the same one corrupt each other: every thread gets a shallow copy
+    of the module parser, sharing its read-only tables.
+    """
+    local_parser = getattr(threads, 'parser', None)
+    if local_parser is None:
+        local_parser = threads.parser = copy.copy(parser)
+    return local_parser
+
+class YaccParser:
+    """
+    The 'yacc' engine of parse(): the LALR parser built by ply.yacc (the one of the current thread, see thread_parser),
+    reading the tokens through recovery_tokens
+    """
+    def parse(self, input=None, lexer=None):
+        if input is not None:
+            lexer.input(input)
+        return thread_parser().parse(lexer=lexer, tokenfunc=recovery_tokens(lexer))
+
+# Parsers that can be used by parse()
+ENGINES = {
+    'yacc': YaccParser,
+    'descent': DescentParser
+}
+
+def parse(source, lexer=None, diagnostics=None, arena=False, engine='yacc', lazy=False, share=False):
+    """
+    Parses the source with a new IndentLexer (or the given one), collecting the errors of the lexer and of the parser in diagnostics.
+    It can be used for several compilations in the same process, also from different threads (every thread parses with its
+    own yacc parser, see thread_parser).
+    The parser is chosen with engine:
+    - 'yacc': the LALR parser built by ply.yacc from the rules above
+    - 'descent': the hand-written DescentParser
+    With arena=True the AST is returned as a flat ast_arena.Arena instead of a tree of dataclasses: the parser appends the
+    nodes to it directly (see ast_arena.ArenaBuilder), without building the tree.
+    After a syntax error the yacc parser skips to the end of the line and goes on, so every error is reported in a single
+    pass: the skipped statements are ErrorStat nodes in the returned (partial) AST. The DescentParser stops at the first
+    error instead.
+    With lazy=True (only with the 'descent' engine) the function bodies are LazyBody objects, parsed when the semantic
+    analyzer visits them: the syntax errors in the bodies of the functions never called are not found. It is meant for
+    checking a program, the tree can't be converted to an arena or to JavaScript.
+    With share=True the identical leaves and pure subexpressions are a single object (see NodeTable): the tree takes less
+    memory, but the same node object can appear in several places of it. The values of an arena are always stored once,
+    so it isn't supported with arena=True.
+    - Returns the AST, or None if the parsing failed
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown parser engine '{engine}'. Available engines: {', '.join(ENGINES)}")
+    if lazy and (engine != 'descent' or arena):
+        raise ValueError("Lazy parsing is supported only by the 'descent' engine, without arena")
+    if share and arena:
+        raise ValueError("Shared nodes are supported only without arena")
+    if lexer is None:
+        lexer = IndentLexer()
+    if diagnostics is not None:
+        lexer.diagnostics = diagnostics
+
+    if arena:
+        from ast_arena import ArenaBuilder
+        builder = ArenaBuilder()
+    else:
+        builder = NodeTable() if share else TREE_BUILDER
+
+    token = diag.current.set(lexer.diagnostics)
+    builder_token = node_builder.set(builder)
+    try:
+        return (DescentParser(lazy=True) if lazy else ENGINES[engine]()).parse(source, lexer=lexer)
+    finally:
+        node_builder.reset(builder_token)
+        diag.current.reset(token)
+
+# ----------Incremental parsing------------
+
+# First tokens of the lines that continue the IF statement above them instead of starting a new statement
+CONTINUATIONS = ('ELIF', 'ELSE')
+
+class ParsedSource:
+    """
+    Result of parse_incremental(): the TokenStream of the source and its top-level statements, that can be updated with
+    reparse() after an edit.
+    The source is split in segments, each one starting with a top-level statement (or a blank/comment line) and ending
+    where the next one starts. They are stored in parallel:
+    - offsets: position in the source of the first character of every segment
+    - nodes: list of the statements parsed from the segment (empty for a blank line), None if it has syntax errors
+    The nodes are frozen and don't store positions, so the spans are kept here and the nodes of the segments not touched
+    by an edit are reused as they are.
+    """
+    def __init__(self, stream, offsets, nodes):
+        self.stream = stream
+        self.offsets = offsets
+        self.nodes = nodes
+        # The AST of the whole source, None if a segment has syntax errors
+        self.program = None if None in nodes else [stmt for segment in nodes for stmt in segment]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def span(self, index):
+        """(start, end) positions in the source of the segment at the given index"""
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self.stream.data)
+        return self.offsets[index], end
+
+def statement_start(stream, k):
+    """Tells if the logical line of the checkpoint k of the stream starts a top-level statement"""
+    if k == 0:
+        return True
+    checkpoints, tokens = stream.checkpoints, stream.tokens
+    index = checkpoints.tokens[k]
+    return len(checkpoints.stacks[k]) == 1 and index < len(tokens) and tokens[index].type not in CONTINUATIONS
+
+def checkpoint_at(stream, offset):
+    """Index of the checkpoint of the stream at the given position, or None"""
+    offsets = stream.checkpoints.offsets
+    k = bisect_left(offsets, offset)
+    return k if k < len(offsets) and offsets[k] == offset else None
+
+def parse_segments(stream, starts, stop, lexer, engine):
+    """
+    Parses one by one the segments starting at the given checkpoints, the last one ends at the checkpoint stop
+    (None for the end of the stream). Returns the statements of every segment, None for the ones with syntax errors.
+    """
+    checkpoints = stream.checkpoints
+    ends = [checkpoints.tokens[k] for k in starts[1:]]
+    ends.append(len(stream.tokens) if stop is None else checkpoints.tokens[stop])
+
+    nodes = []
+    for k, end in zip(starts, ends):
+        lexer.replay(stream, checkpoints.tokens[k], end)
+        errors = len(lexer.diagnostics)
+        result = parse(None, lexer, engine=engine)
+        nodes.append(None if result is None or len(lexer.diagnostics) > errors else result)
+    return nodes
+
+def parse_incremental(source, lexer=None, diagnostics=None, engine='yacc'):
+    """
+    Same as parse(), but returns a ParsedSource that reparse() can update after an edit: its 'program' attribute is the
+    AST, None if the parsing failed.
+    """
+    if lexer is None:
+        lexer = IndentLexer()
+    if diagnostics is not None:
+        lexer.diagnostics = diagnostics
+
+    stream = lexer.tokenize(source)
+    checkpoints, tokens = stream.checkpoints, stream.tokens
+    starts = [k for k in range(len(checkpoints)) if statement_start(stream, k)]
+
+    # The whole source is parsed at once (faster than segment by segment) with its own diagnostics, then the statements
+    # are split among the segments: a segment starting with a NEWLINE is a blank line, every other one holds one statement.
+    # If there are syntax errors the segments are parsed one by one instead, to know which ones fail.
+    diagnostics = lexer.diagnostics
+    lexer.diagnostics = diag.Diagnostics()
+    lexer.replay(stream)
+    try:
+        program = parse(None, lexer, engine=engine)
+        failed = program is None or bool(lexer.diagnostics)
+    finally:
+        lexer.diagnostics = diagnostics
+
+    blank = [checkpoints.tokens[k] < len(tokens) and tokens[checkpoints.tokens[k]].type == 'NEWLINE' for k in starts]
+    if not failed and len(program) == blank.count(False):
+        statements = iter(program)
+        nodes = [[] if is_blank else [next(statements)] for is_blank in blank]
+    else:
+        nodes = parse_segments(stream, starts, None, lexer, engine)
+    return ParsedSource(stream, array('l', (stream.checkpoints.offsets[k] for k in starts)), nodes)
+
+def reparse(parsed, start, end, text, lexer=None, diagnostics=None, engine='yacc'):
+    """
+    Updates a ParsedSource after the edit that replaces the characters from start to end with text.
+    The tokens are updated with IndentLexer.relex(), then only the segments touched by the edit are parsed again: the
+    statements of all the other segments are the same objects of the old AST.
+    The old ParsedSource must not be used anymore (its tokens are moved to the new one).
+    Only the errors found in the relexed lines and in the parsed segments are reported to the diagnostics.
+    """
+    if lexer is None:
+        lexer = IndentLexer()
+    if diagnostics is not None:
+        lexer.diagnostics = diagnostics
+
+    offsets = parsed.offsets
+    delta = len(text) - (end - start)
+
+    # Segments touched by the edit. An edit at the start of a segment can also extend the one before (e.g. inserting an
+    # indented line), so the end of a segment is included too.
+    first = max(bisect_left(offsets, start) - 1, 0)
+    last = bisect_right(offsets, end) - 1
+
+    stream = lexer.relex(parsed.stream, start, end, text)
+
+    # The region is widened while its bounds no longer start a top-level statement in the new source, e.g. when a line
+    # is changed to 'else:' and joins the IF above it, or the edit removes a line break
+    while True:
+        k_first = checkpoint_at(stream, offsets[first])
+        if first == 0 or (k_first is not None and statement_start(stream, k_first)):
+            break
+        first -= 1
+    while last + 1 < len(offsets):
+        k_stop = checkpoint_at(stream, offsets[last + 1] + delta)
+        if k_stop is not None and statement_start(stream, k_stop):
+            break
+        last += 1
+    else:
+        k_stop = None
+
+    starts = [k for k in range(k_first, len(stream.checkpoints) if k_stop is None else k_stop)
+              if k == k_first or statement_start(stream, k)]
+    nodes = parse_segments(stream, starts, k_stop, lexer, engine)
+
+    new_offsets = offsets[:first]
+    new_offsets.extend(stream.checkpoints.offsets[k] for k in starts)
+    new_offsets.extend(map(delta.__add__, offsets[last + 1:]))
+    return ParsedSource(stream, new_offsets, parsed.nodes[:first] + nodes + parsed.nodes[last + 1:])
+
+# -----------------------------------------
 
 # --------Just for testing purposes--------
 if __name__ == '__main__':
@@ -313,4 +1107,6 @@ if workingOnTranspiler:
         pprint.pprint(result)
         print("\n Parsing completed successfully!")
     else:
-        print("\n Error during parsing (or empty input).")
\ No newline at end of file
+        print("\n Error during parsing (or empty input).")
+        for message in lexer.diagnostics.messages():
+            print(message)
\ No newline at end of file
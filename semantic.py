@@ -1,254 +1,1177 @@
 from parser import (
     Number, String, Boolean, Var, BinOp, UnaryOp, 
     AssignStat, PrintStat, IfStat, ForStat, InputExpr, 
-    FunctionDecl, FunctionCall, ExprStat, ReturnStat
+    FunctionDecl, FunctionCall, ExprStat, ReturnStat, ErrorStat,
+    LazyBody, symbol_key, param_keys, parse
 )
+import time
+
+from diagnostics import Diagnostics, SemanticError
+from ast_arena import NONE, KIND
+from visitor import Visitor, handles, steps, visits, run_steps
+from symbol_table import SymbolTable
+from inference_cache import code_signature, cache_key
 
 """
 Semantic analysis component current approach.
 """
 
-class SemanticAnalyzer:
+# Value of SemanticAnalyzer.context when no type being inferred depends on the calls in progress
+NO_CONTEXT = float('inf')
+
+class AnalysisBudget:
+    """
+    Limits of the call-site type inference, so the analysis time stays bounded on any input (None = no limit):
+    - max_specializations: argument type tuples a function body is analyzed for. At the next new tuple the function is
+      widened: its parameters are all 'any' and the type of that single summary is used for all its new calls
+    - max_visits: function bodies analyzed in the whole analysis. Once they are used up, every function is widened at its
+      next new tuple, so at most one more visit per function is done
+    - max_depth: nested calls being inferred. A deeper call has type 'any' without analyzing the body
+    The counters record what the limits changed: visits (bodies analyzed), widened (functions) and cut (calls too deep).
+    Widening only loses precision: 'any' is accepted everywhere, so the errors found are a subset of the unbounded ones.
+    """
+    def __init__(self, max_specializations=16, max_visits=10000, max_depth=100):
+        self.max_specializations = max_specializations
+        self.max_visits = max_visits
+        self.max_depth = max_depth
+        self.visits = self.widened = self.cut = 0
+
+    def exceeded(self, func_entry):
+        """True if the function must be widened before analyzing its body for a new argument type tuple"""
+        return ((self.max_specializations is not None and len(func_entry['cache']) >= self.max_specializations) or
+                (self.max_visits is not None and self.visits >= self.max_visits))
+
+class FunctionProfile:
+    """
+    Analysis cost of a function declaration, recorded by AnalysisProfile:
+    - calls: calls analyzed. hits: found in the cache of the function. visits: body analyzed. stored: read from the
+      inference cache. widened: given the summary of a widened function (see AnalysisBudget). cutoffs: type 'any' given to
+      a recursive call or to a call deeper than the budget
+    - specializations: argument type tuples the body was analyzed for
+    - inclusive, exclusive: seconds spent analyzing the body, with and without the bodies of the functions it calls
+    """
+    __slots__ = ('name', 'body', 'calls', 'hits', 'visits', 'stored', 'widened', 'cutoffs', 'specializations',
+                 'inclusive', 'exclusive', 'active')
+
+    def __init__(self, name, body):
+        self.name = name
+        self.body = body  # kept alive: its id identifies the declaration
+        self.calls = self.hits = self.visits = self.stored = self.widened = self.cutoffs = 0
+        self.specializations = set()
+        self.inclusive = self.exclusive = 0.0
+        self.active = 0  # visits in progress, so the inclusive time of a recursion is counted once
+
+    @property
+    def misses(self):
+        return self.calls - self.hits
+
+class AnalysisProfile:
+    """
+    Opt-in instrumentation of SemanticAnalyzer(profile=AnalysisProfile()): the cost of every function declaration (see
+    FunctionProfile) and of every call edge (caller -> callee, None for the top-level statements), to find the functions
+    and the call chains that dominate the analysis. Without a profile the analyzer doesn't pay for it.
+    report() returns the results as a dictionary, summary() as text.
+    """
     def __init__(self):
-        self.symbol_table = [{}]
-        self.call_stack = set()
+        self.functions = {}  # (name, id(body)) -> FunctionProfile
+        self.edges = {}      # (caller, callee) FunctionProfile pair -> [body visits, inclusive seconds]
+        self.stack = []      # [FunctionProfile, start time, seconds in nested visits] of the visits in progress
+
+    def function(self, name, body):
+        """Profile of the declaration of a function (the same for all its definitions, e.g. in every call of the
+        function declaring it)"""
+        key = (name, id(body))
+        profile = self.functions.get(key)
+        if profile is None:
+            profile = self.functions[key] = FunctionProfile(name, body)
+        return profile
+
+    def enter(self, function, arg_types):
+        """Starts the visit of the body of a function"""
+        function.visits += 1
+        function.specializations.add(arg_types)
+        function.active += 1
+        self.stack.append([function, time.perf_counter(), 0.0])
+
+    def exit(self):
+        """Ends the visit started by the last enter()"""
+        function, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        function.active -= 1
+        function.exclusive += elapsed - nested
+        if not function.active:
+            function.inclusive += elapsed
+        caller = None
+        if self.stack:
+            self.stack[-1][2] += elapsed
+            caller = self.stack[-1][0]
+        edge = self.edges.setdefault((caller, function), [0, 0.0])
+        edge[0] += 1
+        edge[1] += elapsed
+
+    def hottest_chain(self):
+        """Call chain from a top-level call following, at every step, the callee with the largest inclusive time"""
+        chain, caller, seen = [], None, set()
+        while True:
+            callees = [(edge[1], callee) for (source, callee), edge in self.edges.items()
+                       if source is caller and callee not in seen]
+            if not callees:
+                return chain
+            caller = max(callees, key=lambda item: item[0])[1]
+            seen.add(caller)
+            chain.append(caller)
+
+    def report(self):
+        """The profile of every function (by inclusive time) and the hottest call chain, as dictionaries and lists"""
+        functions = sorted(self.functions.values(), key=lambda function: -function.inclusive)
+        return {
+            'functions': [{
+                'name': function.name,
+                'calls': function.calls,
+                'hits': function.hits,
+                'misses': function.misses,
+                'visits': function.visits,
+                'stored': function.stored,
+                'widened': function.widened,
+                'cutoffs': function.cutoffs,
+                'specializations': len(function.specializations),
+                'inclusive_ms': function.inclusive * 1000,
+                'exclusive_ms': function.exclusive * 1000,
+            } for function in functions],
+            'hottest_chain': [function.name for function in self.hottest_chain()],
+        }
+
+    def summary(self, limit=10):
+        """Plain text summary: the functions with the largest inclusive time and the hottest call chain"""
+        report = self.report()
+        total = sum(function['visits'] for function in report['functions'])
+        hits = sum(function['hits'] for function in report['functions'])
+        calls = sum(function['calls'] for function in report['functions'])
+        lines = [f"{len(report['functions'])} functions, {calls} calls, {hits} cache hits, {total} body visits",
+                 f"{'FUNCTION':<24}{'SPECS':>7}{'VISITS':>8}{'HITS':>8}{'MISSES':>8}{'CUTOFFS':>9}"
+                 f"{'INCL (ms)':>11}{'EXCL (ms)':>11}"]
+        for function in report['functions'][:limit]:
+            lines.append(f"{function['name']:<24}{function['specializations']:>7}{function['visits']:>8}"
+                         f"{function['hits']:>8}{function['misses']:>8}{function['cutoffs']:>9}"
+                         f"{function['inclusive_ms']:>11.2f}{function['exclusive_ms']:>11.2f}")
+        if len(report['functions']) > limit:
+            lines.append(f"... {len(report['functions']) - limit} more functions")
+        lines.append("Hottest call chain: " + (" -> ".join(report['hottest_chain']) or "none"))
+        return "\n".join(lines)
+
+class SemanticAnalyzer(Visitor):
+    def __init__(self, diagnostics=None, iterative=False, inference_cache=None, budget=None, profile=None):
+        self.symbol_table = SymbolTable()
+        self.call_stack = {}  # (function key, argument types) -> position, for the calls being inferred
+        # Position of the outermost call in progress that the types being inferred depend on (see call_type)
+        self.context = NO_CONTEXT
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        self.arena = None  # AST walked by visit_arena
+        self.budget = budget  # AnalysisBudget, or None for an unbounded inference
+        self.profile = profile  # AnalysisProfile, or None
+
+        # inference_cache.InferenceCache shared with other analyses, if any
+        self.inference_cache = inference_cache
+        self.rebound = set()  # global keys bound again to another type or function
+        self.inferred = []    # (func_entry, arg_types, type, position, dependent) for the types inferred by the calls in progress
+        if inference_cache is not None:
+            self.lookup = self.tracked_lookup
+        if iterative:
+            # Explicit stack instead of recursion (see visitor.Visitor.walk), for very deep trees
+            self.visit = self.walk
+            self.visit_arena = self.walk_arena
 
 # --------------Helper methods-------------
 
     def enter_scope(self):
-        """Appends a new scope dictionary { } to the stack"""
-        self.symbol_table.append({})
+        """Opens a new scope in the symbol table"""
+        self.symbol_table.enter()
     
     def exit_scope(self):
-        """Removes the current scope dictionary { } from the stack"""
-        self.symbol_table.pop()
+        """Closes the current scope, dropping its definitions"""
+        self.symbol_table.exit()
 
     def define(self, name, type_):
-        """Define a new variable or function to the current scope"""
-        self.symbol_table[-1][name] = type_
+        """Define a new variable or function to the current scope (name is the key returned by symbol_key)"""
+        if self.inference_cache is not None and len(self.symbol_table) == 1:
+            previous = self.symbol_table.lookup(name)
+            if previous is not None and previous is not type_ and (isinstance(previous, dict) or previous != type_):
+                self.rebound.add(name)
+        self.symbol_table.define(name, type_)
 
     def lookup(self, name):
         """
-        Searches for a variable starting from the current scope in reverse to the global scope [0].
+        Finds a variable in the innermost scope defining it, in constant time (see symbol_table.SymbolTable).
         - Returns the type if the variable is found, otherwise returns None
         """
-        for scope in reversed(self.symbol_table):
-            if name in scope:
-                return scope[name]
-        return None
+        return self.symbol_table.lookup(name)
+
+    def tracked_lookup(self, name):
+        """
+        Same as lookup() with an inference cache: reading a binding of an outer call in progress makes the types being
+        inferred depend on it (the scope of the call at position p has depth p + 1)
+        """
+        binding = self.symbol_table.binding(name)
+        if binding is None:
+            return None
+        depth, value = binding
+        if 0 < depth < len(self.symbol_table) - 1:
+            self.context = min(self.context, depth - 1)
+        return value
 
 # -----------------------------------------
 
-    def visit(self, node):
+# ---------------Type rules----------------
+# Shared by the walker of the dataclass tree (visit) and the one of the arena (visit_arena)
+
+    def var_type(self, name, sym_id):
+        """Type of a variable use. A function used as a variable has type 'function'"""
+        val = self.lookup(symbol_key(name, sym_id))
+        if val is None:
+            raise SemanticError('undefined-variable', f"Semantic Error: variable '{name}' is not defined.")
+        
+        if isinstance(val, dict) and val.get('tag') == 'function':  # if val is a dictionary it means it is a function used as variable
+            return 'function'
+
+        return val
+
+    def binop_type(self, op, left_type, right_type):
+        """Type of a binary operation from the types of its operands"""
+        rule = self.BINOP_RULES.get(op)
+        if rule is None:
+            raise Exception(f"Unknown operator: '{op}'")
+        return rule(self, op, left_type, right_type)
+
+    # '+' can handle arithmetic sums and string concatenation
+    def sum_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'any'
+
+        if (left_type == 'str' and right_type == 'int') or \
+            (left_type == 'int' and right_type == 'str'):
+            raise SemanticError('type-mismatch', f"Semantic Error: type mismatch in sum. Cannot add {left_type} with {right_type}.")
+        return left_type
+
+    def product_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'any'
+
+        if left_type == 'int' and right_type == 'int':
+            return 'int'
+
+        if (left_type == 'str' and right_type == 'int') or (left_type == 'int' and right_type == 'str'):
+            return 'str'
+
+        raise SemanticError('type-mismatch', f"Semantic Error: type mismatch in multiplication. Cannot multiply {left_type} with {right_type}.")
+
+    # '-', '/' are just used for arithmetics operations
+    def arithmetic_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'any'
+
+        if left_type == 'str' or right_type == 'str':
+            raise SemanticError('type-mismatch', f"Semantic Error: '{op}' doesn't accept strings.")
+
+        return 'int'
+
+    def equality_type(self, op, left_type, right_type):
+        # No type checking needed because we can compare different types and it return False -> 1 == '1' return False.
+        return 'bool'
+
+    def comparison_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'bool'
+
+        if left_type != right_type:
+            raise SemanticError('type-mismatch', f"Semantic Error: type mismatch in comparison. Cannot compare {left_type} with {right_type}.")
+
+        return 'bool'
+
+    def logic_type(self, op, left_type, right_type):
+        if left_type == right_type:
+            return left_type
+
+        return 'any'
+
+    # Operator -> type rule, resolved once instead of matching the operator at every BinOp
+    BINOP_RULES = {
+        '+': sum_type,
+        '*': product_type,
+        '-': arithmetic_type, '/': arithmetic_type,
+        '==': equality_type, '!=': equality_type,
+        '>': comparison_type, '<': comparison_type, '>=': comparison_type, '<=': comparison_type,
+        'and': logic_type, 'or': logic_type
+    }
+
+    def unary_type(self, op, expr_type):
+        """Type of a unary operation: 'not' for boolean values, '-' for negative numbers"""
+        if op == 'not':
+            return 'bool'
+
+        if op == '-':
+            if expr_type == 'str':
+                raise SemanticError('type-mismatch', "Semantic Error: cannot use '-' on a string.")
+            return 'int'
+
+        raise Exception(f"Unknown operator: '{op}'")
+
+    def if_type(self, true_type, false_type):
+        """Type of an IF statement from the types of its blocks"""
+        if true_type and false_type and (true_type == false_type):
+            return true_type
+        
+        if true_type: return true_type
+        if false_type: return false_type
+        return None
+
+    def check_return(self):
+        if len(self.symbol_table) <= 1:
+            raise SemanticError('return-outside-function', "Semantic Error: 'return' statement outside function")
+
+    def check_range(self, start_type, end_type):
+        if start_type not in ['int', 'any'] or end_type not in ['int', 'any']:
+            raise SemanticError('range-type', "Semantic Error: FOR loop requires integers.")
+
+    def assign_type(self, name, sym_id, value_type):
+        """Defines the assigned variable. An assignment has the type of its value"""
+        self.define(symbol_key(name, sym_id), value_type)
+        return value_type
+
+    def define_function(self, key, params, body, names=(), name=None):
         """
-        Navigates through the AST nodes generate by the parser.
-        - Returns the type for the expressions: Number, String, Boolean, InputExpr, AssignStat, Var, BinOp, UnaryOp
-        - Returns None for the statements: PrintStat, ExprStat, ReturnStat, IfStat, ForStat, FunctionDecl
+        Defines a function. Its body (a list of statements or an arena Block) is analyzed at every call with new argument types.
+        names are the parameter names, used by the inference cache, and name the function name, used by the profile.
         """
-        match node:
+        func_entry = {
+            'tag': 'function',
+            'params': params,
+            'names': names,
+            'body': body,
+            'cache': {},
+            'context': set()  # argument types whose cached type depends on the calls that were in progress
+        }
+        if self.profile is not None:
+            func_entry['profile'] = self.profile.function(name, body)
+        self.define(key, func_entry)
 
-            case list(statements):
-                last_type = None
-                for stmt in statements:
-                    res = self.visit(stmt)
+    def function_entry(self, name, sym_id, arg_count):
+        """
+        Looks up the called function checking that it exists and that it takes arg_count arguments.
+        - Returns its entry in the symbol table
+        """
+        func_entry = self.lookup(symbol_key(name, sym_id))
 
-                    if res is not None:
-                        last_type = res
-                return last_type
-            
-            case Number(_):  return 'int'
-            case String(_):  return 'str'
-            case Boolean(_): return 'bool'
-            case InputExpr(_): return 'str'
-
-            case AssignStat(name, value):
-                value_type = self.visit(value)
-                self.define(name, value_type)
-                return value_type
-            
-            case Var(name):
-                val = self.lookup(name)
-                if val is None:
-                    raise Exception(f"Semantic Error: variable '{name}' is not defined.")
-                
-                if isinstance(val, dict) and val.get('tag') == 'function':  # if val is a dictionary it means it is a function used as variable
-                    return 'function'
-
-                return val
-            
-            # '+' can handle arithmetic sums and string concatenation
-            case BinOp(left, '+', right):
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == 'any' or right_type == 'any':
-                    return 'any'
-
-                if (left_type == 'str' and right_type == 'int') or \
-                    (left_type == 'int' and right_type == 'str'):
-                    raise Exception(f"Semantic Error: type mismatch in sum. Cannot add {left_type} with {right_type}.")
-                return left_type
-            
-            case BinOp(left, '*', right):
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == 'any' or right_type == 'any':
-                    return 'any'
-                
-                if left_type == 'int' and right_type == 'int':
-                    return 'int'
-                
-                if (left_type == 'str' and right_type == 'int') or (left_type == 'int' and right_type == 'str'):
-                    return 'str'
-                
-                raise Exception(f"Semantic Error: type mismatch in multiplication. Cannot multiply {left_type} with {right_type}.")
-            
-            # '-', '*', '/' are just used for arithmetics operations
-            case BinOp(left, op, right) if op in ['-', '/']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == 'any' or right_type == 'any':
-                    return 'any'
-
-                if left_type == 'str' or right_type == 'str':
-                    raise Exception(f"Semantic Error: '{op}' doesn't accept strings.")
-                
-                return 'int'
-            
-            case BinOp(left, op, right) if op in ['==', '!=']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-                # No type checking needed because we can compare different types and it return False -> 1 == '1' return False.
-                return 'bool'   
-            
-            # '>', '<', '>=', '<=' end in this section
-            case BinOp(left, op, right) if op in ['>', '<', '>=', '<=']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-                
-                if left_type == 'any' or right_type == 'any':
-                    return 'bool'
-                
-                if left_type != right_type:
-                    raise Exception(f"Semantic Error: type mismatch in comparison. Cannot compare {left_type} with {right_type}.")
-                
-                return 'bool'
-                
-            # 'and', 'or' end in this section
-            case BinOp(left, op, right) if op in ['and', 'or']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == right_type:
-                    return left_type
-                
+        if not func_entry:
+            raise SemanticError('undefined-function', f"Semantic Error: function '{name}' is not defined.")
+        
+        if not isinstance(func_entry, dict) or func_entry.get('tag') != 'function':
+            raise SemanticError('not-a-function', f"Semantic Error: '{name}' is not a function")
+        
+        params = func_entry['params']
+        if len(params) != arg_count:
+            raise SemanticError('argument-count', f"Arg count mismatch for '{name}'. Expected {len(params)}, got {arg_count}.")
+
+        return func_entry
+
+    def cached_type(self, func_entry, arg_types):
+        """
+        Most calls are already in the cache: it is read without starting the steps of call_type (unless the profile
+        counts the hits).
+        - Returns the cached type, or None if call_type has to infer it
+        """
+        cached = func_entry['cache'].get(arg_types)
+        if cached is not None and arg_types not in func_entry['context'] and self.profile is None:
+            return cached
+        return None
+
+    def call_type(self, key, func_entry, arg_types):
+        """
+        Infers the return type of a call visiting the body of the function, once for every tuple of argument types.
+        A recursive call with the same argument types has type 'any'. With a budget (see AnalysisBudget) the function can
+        be widened, or the call cut, instead.
+        It is a generator of steps (see visitor.run_steps): the body is yielded to be visited.
+        A type depending on the calls in progress (through a recursive call, or reading their variables) is marked in the
+        'context' of the function: the calls in progress when it is read again depend on it too.
+        """
+        profile = func_entry['profile'] if self.profile is not None else None
+        if profile is not None:
+            profile.calls += 1
+
+        if arg_types in func_entry['cache']:
+            if profile is not None:
+                profile.hits += 1
+            if arg_types in func_entry['context'] and self.call_stack:
+                self.context = -1
+            return func_entry['cache'][arg_types]
+        
+        call_signature = (key, arg_types)
+        position = self.call_stack.get(call_signature)
+        if position is not None:
+            if profile is not None:
+                profile.cutoffs += 1
+            self.context = min(self.context, position)
+            return 'any'
+
+        budget = self.budget
+        if budget is not None:
+            # The types given by the budget depend on the order of the analysis: they are never stored in the
+            # inference cache, and the types depending on them neither
+            if budget.max_depth is not None and len(self.call_stack) >= budget.max_depth:
+                budget.cut += 1
+                if profile is not None:
+                    profile.cutoffs += 1
+                if self.call_stack:
+                    self.context = -1
                 return 'any'
-            
-            # 'not' for boolean values
-            case UnaryOp('not', expr):
-                self.visit(expr)
-                return 'bool'
-            
-            # '-' for negative numbers
-            case UnaryOp('-', expr):
-                expr_type = self.visit(expr)
-                if expr_type == 'str':
-                    raise Exception("Semantic Error: cannot use '-' on a string.")
-                return 'int'
-            
-            case PrintStat(value):
-                self.visit(value)
 
-            case ExprStat(expr):
-                self.visit(expr)
+            widened = ('any',) * len(arg_types)
+            if arg_types != widened and (func_entry.get('widened') or budget.exceeded(func_entry)):
+                if not func_entry.get('widened'):
+                    func_entry['widened'] = True
+                    budget.widened += 1
+                if profile is not None:
+                    profile.widened += 1
+                summary = yield from self.call_type(key, func_entry, widened)
+                if self.call_stack:
+                    self.context = -1
+                func_entry['cache'][arg_types] = summary
+                func_entry['context'].add(arg_types)
+                return summary
+
+        body_node = func_entry['body']
+        if isinstance(body_node, LazyBody):
+            # Parsed lazily (see parser.parse): the body is parsed at the first call of the function
+            body_node = func_entry['body'] = body_node.parse()
+
+        stored_key = closure = None
+        if self.inference_cache is not None:
+            stored_key, closure = self.inference_key(func_entry, arg_types)
+            stored = self.inference_cache.get(stored_key) if stored_key is not None else None
+            if stored is not None and self.replay(stored[1], closure):
+                if profile is not None:
+                    profile.stored += 1
+                func_entry['cache'][arg_types] = stored[0]
+                if self.call_stack:
+                    self.inferred.append((func_entry, arg_types, stored[0], len(self.call_stack), False))
+                return stored[0]
+
+        position = self.call_stack[call_signature] = len(self.call_stack)
+        start = len(self.inferred)
+        self.enter_scope()
+
+        try:
+            for param_name, arg_type in zip(func_entry['params'], arg_types):
+                self.define(param_name, arg_type)
+
+            if budget is not None:
+                budget.visits += 1
+            if profile is not None:
+                self.profile.enter(profile, arg_types)
+            try:
+                inferred_ret_type = yield body_node
+            finally:
+                if profile is not None:
+                    self.profile.exit()
+
+            if inferred_ret_type is None:
+                inferred_ret_type = 'any'
             
-            case ReturnStat(value):
-                if len(self.symbol_table) <= 1:
-                    raise Exception("Semantic Error: 'return' statement outside function")
-                
-                if value is not None:
-                    return self.visit(value)
-                return 'any'
+            func_entry['cache'][arg_types] = inferred_ret_type
+            dependent = self.context < position
+            if dependent:
+                func_entry['context'].add(arg_types)
+            if self.inference_cache is not None:
+                if stored_key is not None and not dependent:
+                    self.store(stored_key, inferred_ret_type, closure, start, position)
+                self.inferred.append((func_entry, arg_types, inferred_ret_type, position, dependent))
+            return inferred_ret_type
+        
+        finally:
+            self.exit_scope()
+            del self.call_stack[call_signature]
+            # The types inferred inside this call don't make the calls around it depend on it
+            if self.context >= position or not self.call_stack:
+                self.context = NO_CONTEXT
+            if not self.call_stack:
+                self.inferred.clear()
+
+# -----------------------------------------
+
+# -------------Inference cache-------------
+# With an inference_cache.InferenceCache, the type of a call is read from it instead of inferred when the key of the
+# call (see inference_key) was stored by another analysis. The types that the call inferred for other functions (kept
+# in their entries, and read by the next calls without looking at the variables again) are stored too, so reading the
+# cache leaves the same types in the entries as inferring the call.
+
+    def function_signature(self, func_entry):
+        """
+        Structure of a function (see inference_cache.function_signature), computed once for every definition and
+        remembered by the inference cache for the same body.
+        - Returns None if the function can't be stored in the inference cache
+        """
+        if 'signature' not in func_entry:
+            body = func_entry['body']
+            # Arena bodies and bodies not parsed yet are never stored
+            func_entry['signature'] = (self.inference_cache.signature(func_entry['names'], body)
+                                       if isinstance(body, list) else None)
+        return func_entry['signature']
+
+    def inference_key(self, func_entry, arg_types):
+        """
+        Key of a call in the inference cache: the structure of the function, the argument types, the types of the global
+        names it reads and, for the functions among them, their structure and the types of the names they read.
+        The call isn't stored if one of those names:
+        - is bound in a call in progress: the call would depend on it
+        - has been bound again to another type: the types in the entries of the functions reading it may be the old ones
+        - is a function being inferred (a recursive call would have type 'any'), or with types depending on other calls
+        - Returns the key and the entries of the functions by name, or (None, None) if the call can't be stored
+        """
+        signature = self.function_signature(func_entry)
+        if signature is None:
+            return None, None
+
+        running = {key for key, _ in self.call_stack}
+        environment, closure = {}, {}
+        pending = [signature]
+        while pending:
+            for name, sym_id in pending.pop()[1]:
+                if name in environment:
+                    continue
+                key = symbol_key(name, sym_id)
+                binding = self.symbol_table.binding(key)
+                if binding is None:
+                    environment[name] = None
+                    continue
+
+                depth, value = binding
+                if depth > 0 or key in self.rebound:
+                    return None, None
+                if isinstance(value, dict):
+                    callee = self.function_signature(value)
+                    if callee is None or value['context'] or key in running:
+                        return None, None
+                    environment[name] = 'function ' + callee[0]
+                    closure[name] = value
+                    pending.append(callee)
+                else:
+                    environment[name] = value
+        return cache_key(code_signature(type(self)), signature[0], arg_types, sorted(environment.items())), closure
+
+    def store(self, stored_key, type_, closure, start, position):
+        """
+        Stores the type of the call at the given position in the inference cache, with the types inferred for the
+        functions of the closure since self.inferred[start]. Nothing is stored if one of them depends on the call.
+        """
+        names = {id(entry): name for name, entry in closure.items()}
+        inferred = []
+        for entry, arg_types, inferred_type, inferred_position, dependent in self.inferred[start:]:
+            name = names.get(id(entry))
+            if name is None:
+                # Function defined inside the call
+                continue
+            if dependent:
+                return
+            inferred.append([name, list(arg_types), inferred_type, inferred_position - position])
+        self.inference_cache.put(stored_key, [type_, inferred])
+
+    def replay(self, inferred, closure):
+        """
+        Puts in the entries of the closure the types inferred by a call read from the inference cache, as if the call
+        had been inferred: the types inferred inside a call whose type was already in its entry are skipped.
+        - Returns False, changing nothing, if an entry has another type for the same arguments
+        """
+        types = []
+        for name, arg_types, type_, level in inferred:
+            entry = closure.get(name)
+            arg_types = tuple(arg_types)
+            present = entry['cache'].get(arg_types) if entry is not None else None
+            if entry is None or (present is not None and present != type_):
+                return False
+            types.append((entry, arg_types, type_, level, present is not None))
+
+        # In reverse order, the types inferred inside a call (at a deeper level) come right after it
+        position = len(self.call_stack)
+        added, skip = [], None
+        for entry, arg_types, type_, level, present in reversed(types):
+            if skip is not None and level > skip:
+                continue
+            skip = level if present else None
+            if not present:
+                entry['cache'][arg_types] = type_
+                added.append((entry, arg_types, type_, position + level, False))
+        if self.call_stack:
+            self.inferred.extend(reversed(added))
+        return True
+
+# -----------------------------------------
+
+    def analyze(self, program):
+        """
+        Visits the top-level statements of the program recording the semantic errors in the diagnostics, instead of stopping
+        at the first one. A variable whose assignment failed is defined as 'any', so its uses don't report other errors.
+        - Returns True if no error was found
+        """
+        found = len(self.diagnostics)
+        for stmt in program:
+            try:
+                self.visit(stmt)
+            except SemanticError as e:
+                self.diagnostics.add('semantic', e.code, str(e))
+                if isinstance(stmt, AssignStat):
+                    self.define(symbol_key(stmt.name, stmt.sym_id), 'any')
+        return len(self.diagnostics) == found
+
+# ---------------Walker steps--------------
+# Shared by the walker of the dataclass tree (visit) and the one of the arena (visit_arena): generators of steps (see
+# visitor.run_steps) taking the fields of a node, which yield its children (tree nodes or arena indices) to visit them.
+# They return the type for the expressions and for the blocks, and None for the other statements.
+
+    def block_steps(self, statements):
+        last_type = None
+        for stmt in statements:
+            res = yield stmt
+
+            if res is not None:
+                last_type = res
+        return last_type
+
+    def assign_steps(self, name, sym_id, value):
+        return self.assign_type(name, sym_id, (yield value))
+
+    def binop_steps(self, op, left, right):
+        left_type = yield left
+        right_type = yield right
+        return self.binop_type(op, left_type, right_type)
 
-            # IF statement
-            case IfStat(condition, true_block, false_block):
-                self.visit(condition)
-                true_type = self.visit(true_block)
-                false_type = self.visit(false_block) if false_block else None
-
-                if true_type and false_type and (true_type == false_type):
-                    return true_type
-                
-                if true_type: return true_type
-                if false_type: return false_type
+    def unary_steps(self, op, expr):
+        return self.unary_type(op, (yield expr))
+
+    def value_steps(self, value):
+        """PrintStat and ExprStat"""
+        yield value
+
+    def return_steps(self, value):
+        self.check_return()
+
+        if value is not None:
+            return (yield value)
+        return 'any'
+
+    def if_steps(self, condition, true_block, false_block):
+        yield condition
+        true_type = yield true_block
+        false_type = (yield false_block) if false_block is not None else None
+        return self.if_type(true_type, false_type)
+
+    def for_steps(self, iterator, iterator_id, start, end, body):
+        self.define(symbol_key(iterator, iterator_id), 'int')
+
+        start_type = yield start
+        self.check_range(start_type, (yield end))
+        return (yield body)
+
+    def call_steps(self, name, sym_id, args):
+        func_entry = self.function_entry(name, sym_id, len(args))
+        arg_types = []
+        for arg in args:
+            arg_types.append((yield arg))
+        arg_types = tuple(arg_types)
+        cached = self.cached_type(func_entry, arg_types)
+        if cached is not None:
+            return cached
+        return (yield from self.call_type(symbol_key(name, sym_id), func_entry, arg_types))
+
+# -----------------------------------------
+
+# ------------Recursive handlers-----------
+# Steps of the most frequent nodes written as plain recursive code, which visits the children with visit (self.visit, or
+# self.visit_arena) instead of yielding them: visit() calls them instead of resuming a generator for every child (see
+# visitor.visits). walk() still runs the steps.
+
+    def block_type(self, statements, visit):
+        last_type = None
+        for stmt in statements:
+            res = visit(stmt)
+
+            if res is not None:
+                last_type = res
+        return last_type
+
+    def if_result(self, condition, true_block, false_block, visit):
+        visit(condition)
+        true_type = visit(true_block)
+        false_type = visit(false_block) if false_block is not None else None
+        return self.if_type(true_type, false_type)
+
+    def for_result(self, iterator, iterator_id, start, end, body, visit):
+        self.define(symbol_key(iterator, iterator_id), 'int')
+
+        start_type = visit(start)
+        self.check_range(start_type, visit(end))
+        return visit(body)
+
+    def call_result(self, name, sym_id, args, visit):
+        func_entry = self.function_entry(name, sym_id, len(args))
+        arg_types = tuple([visit(arg) for arg in args])
+        cached = self.cached_type(func_entry, arg_types)
+        if cached is not None:
+            return cached
+        return run_steps(self.call_type(symbol_key(name, sym_id), func_entry, arg_types), visit)
+
+# -----------------------------------------
+
+# ---------------Tree walker---------------
+# visit(node) (see visitor.Visitor) returns the type of a node of the dataclass tree
+
+    @handles(Number)
+    def visit_number(self, node): return 'int'
+
+    @handles(String, InputExpr)
+    def visit_string(self, node): return 'str'
+
+    @handles(Boolean)
+    def visit_boolean(self, node): return 'bool'
+
+    @handles(Var)
+    def visit_var(self, node):
+        return self.var_type(node.name, node.sym_id)
+
+    @handles(FunctionDecl)
+    def visit_function(self, node):
+        self.define_function(symbol_key(node.name, node.sym_id), param_keys(node.params, node.param_ids), node.body,
+                             node.params, node.name)
+
+    # Statement skipped by the parser after a syntax error
+    @handles(ErrorStat)
+    def visit_error(self, node):
+        return None
+
+    @steps(list)
+    def walk_block(self, statements):
+        return self.block_steps(statements)
+
+    @steps(AssignStat)
+    def walk_assign(self, node):
+        return self.assign_steps(node.name, node.sym_id, node.value)
+
+    @steps(BinOp)
+    def walk_binop(self, node):
+        return self.binop_steps(node.op, node.left, node.right)
+
+    @steps(UnaryOp)
+    def walk_unary(self, node):
+        return self.unary_steps(node.op, node.expr)
+
+    @steps(PrintStat)
+    def walk_print(self, node):
+        return self.value_steps(node.value)
+
+    @steps(ExprStat)
+    def walk_expr(self, node):
+        return self.value_steps(node.expr)
+
+    @steps(ReturnStat)
+    def visit_return(self, node):
+        return self.return_steps(node.value)
+
+    @steps(IfStat)
+    def walk_if(self, node):
+        return self.if_steps(node.condition, node.true_block, node.false_block or None)
+
+    @steps(ForStat)
+    def walk_for(self, node):
+        return self.for_steps(node.iterator, node.iterator_id, node.start, node.end, node.body)
+
+    @steps(FunctionCall)
+    def walk_call(self, node):
+        return self.call_steps(node.name, node.sym_id, node.args)
+
+    @visits(list)
+    def visit_block(self, statements):
+        return self.block_type(statements, self.visit)
+
+    @visits(AssignStat)
+    def visit_assign(self, node):
+        return self.assign_type(node.name, node.sym_id, self.visit(node.value))
+
+    @visits(BinOp)
+    def visit_binop(self, node):
+        return self.binop_type(node.op, self.visit(node.left), self.visit(node.right))
+
+    @visits(UnaryOp)
+    def visit_unary(self, node):
+        return self.unary_type(node.op, self.visit(node.expr))
+
+    @visits(PrintStat)
+    def visit_print(self, node):
+        self.visit(node.value)
+
+    @visits(ExprStat)
+    def visit_expr(self, node):
+        self.visit(node.expr)
+
+    @visits(IfStat)
+    def visit_if(self, node):
+        return self.if_result(node.condition, node.true_block, node.false_block or None, self.visit)
+
+    @visits(ForStat)
+    def visit_for(self, node):
+        return self.for_result(node.iterator, node.iterator_id, node.start, node.end, node.body, self.visit)
+
+    @visits(FunctionCall)
+    def visit_call(self, node):
+        return self.call_result(node.name, node.sym_id, node.args, self.visit)
+
+# -----------------------------------------
+
+# ---------------Arena walker--------------
+# visit_arena(index) (see visitor.Visitor) returns the type of the node at the given index of self.arena, dispatched on
+# its kind ID
+
+    def analyze_arena(self, arena):
+        """Same as analyze() for an AST stored in an ast_arena.Arena"""
+        self.arena = arena
+        found = len(self.diagnostics)
+        for stmt in arena.block(arena.root):
+            try:
+                self.visit_arena(stmt)
+            except SemanticError as e:
+                self.diagnostics.add('semantic', e.code, str(e))
+                if arena.kinds[stmt] == KIND['AssignStat']:
+                    self.define(symbol_key(arena.value(stmt), arena.sym_id(stmt)), 'any')
+        return len(self.diagnostics) == found
+
+    @handles(KIND['Number'])
+    def visit_arena_number(self, index): return 'int'
+
+    @handles(KIND['String'], KIND['InputExpr'])
+    def visit_arena_string(self, index): return 'str'
+
+    @handles(KIND['Boolean'])
+    def visit_arena_boolean(self, index): return 'bool'
+
+    @handles(KIND['Var'])
+    def visit_arena_var(self, index):
+        return self.var_type(self.arena.value(index), self.arena.sym_id(index))
+
+    @handles(KIND['FunctionDecl'])
+    def visit_arena_function(self, index):
+        arena = self.arena
+        name = arena.value(index)
+        params = [symbol_key(param, sym_id) for param, sym_id in arena.params(index)]
+        self.define_function(symbol_key(name, arena.sym_id(index)), params, arena.second[index], name=name)
+
+    @handles(KIND['ErrorStat'])
+    def visit_arena_error(self, index):
+        return None
+
+    @steps(KIND['Block'])
+    def walk_arena_block(self, index):
+        return self.block_steps(self.arena.block(index))
+
+    @steps(KIND['AssignStat'])
+    def walk_arena_assign(self, index):
+        arena = self.arena
+        return self.assign_steps(arena.value(index), arena.sym_id(index), arena.first[index])
+
+    @steps(KIND['BinOp'])
+    def walk_arena_binop(self, index):
+        arena = self.arena
+        return self.binop_steps(arena.op(index), arena.first[index], arena.second[index])
+
+    @steps(KIND['UnaryOp'])
+    def walk_arena_unary(self, index):
+        return self.unary_steps(self.arena.op(index), self.arena.first[index])
+
+    @steps(KIND['PrintStat'], KIND['ExprStat'])
+    def walk_arena_value(self, index):
+        return self.value_steps(self.arena.first[index])
+
+    @steps(KIND['ReturnStat'])
+    def visit_arena_return(self, index):
+        first = self.arena.first[index]
+        return self.return_steps(None if first == NONE else first)
+
+    @steps(KIND['IfStat'])
+    def walk_arena_if(self, index):
+        arena = self.arena
+        third = arena.third[index]
+        return self.if_steps(arena.first[index], arena.second[index],
+                             third if third != NONE and arena.block(third) else None)
+
+    @steps(KIND['ForStat'])
+    def walk_arena_for(self, index):
+        arena = self.arena
+        return self.for_steps(arena.value(index), arena.sym_id(index), arena.first[index], arena.second[index],
+                              arena.third[index])
+
+    @steps(KIND['FunctionCall'])
+    def walk_arena_call(self, index):
+        arena = self.arena
+        return self.call_steps(arena.value(index), arena.sym_id(index), arena.block(arena.first[index]))
+
+    @visits(KIND['Block'])
+    def visit_arena_block(self, index):
+        return self.block_type(self.arena.block(index), self.visit_arena)
+
+    @visits(KIND['AssignStat'])
+    def visit_arena_assign(self, index):
+        arena = self.arena
+        return self.assign_type(arena.value(index), arena.sym_id(index), self.visit_arena(arena.first[index]))
+
+    @visits(KIND['BinOp'])
+    def visit_arena_binop(self, index):
+        arena = self.arena
+        return self.binop_type(arena.op(index), self.visit_arena(arena.first[index]),
+                               self.visit_arena(arena.second[index]))
+
+    @visits(KIND['UnaryOp'])
+    def visit_arena_unary(self, index):
+        return self.unary_type(self.arena.op(index), self.visit_arena(self.arena.first[index]))
+
+    @visits(KIND['PrintStat'], KIND['ExprStat'])
+    def visit_arena_value(self, index):
+        self.visit_arena(self.arena.first[index])
+
+    @visits(KIND['IfStat'])
+    def visit_arena_if(self, index):
+        arena = self.arena
+        third = arena.third[index]
+        return self.if_result(arena.first[index], arena.second[index],
+                              third if third != NONE and arena.block(third) else None, self.visit_arena)
+
+    @visits(KIND['ForStat'])
+    def visit_arena_for(self, index):
+        arena = self.arena
+        return self.for_result(arena.value(index), arena.sym_id(index), arena.first[index], arena.second[index],
+                               arena.third[index], self.visit_arena)
+
+    @visits(KIND['FunctionCall'])
+    def visit_arena_call(self, index):
+        arena = self.arena
+        return self.call_result(arena.value(index), arena.sym_id(index), arena.block(arena.first[index]),
+                                self.visit_arena)
+
+# -----------------------------------------
+
+# ----------Incremental analysis-----------
+
+class StatementRecord:
+    """
+    What the analysis of a top-level statement depended on and changed, recorded by IncrementalAnalyzer:
+    - reads: the global keys it looked up (functions called from its calls included)
+    - effects: in order, ('define', key, value) for the global bindings and ('infer', key, func_entry, arg_types, type,
+      dependent) for the return types inferred for global functions (dependent: added to the 'context' of the entry)
+    - errors: (code, message) of its semantic errors
+    """
+    __slots__ = ('node', 'reads', 'effects', 'errors')
+
+    def __init__(self, node, reads, effects, errors):
+        self.node = node
+        self.reads = reads
+        self.effects = effects
+        self.errors = errors
+
+class IncrementalAnalyzer(SemanticAnalyzer):
+    """
+    SemanticAnalyzer for editors, analyzing the same program again after each edit (e.g. the 'program' of a
+    parser.ParsedSource updated by reparse, which keeps the nodes of the statements not touched by the edit).
+    Every analyze() records a StatementRecord for each top-level statement. The next one reuses the record of an unchanged
+    statement (the same node object, in the same order) instead of visiting it, applying its effects and errors again,
+    unless it read a dirty key: a key written by a statement that was removed or whose effects changed when it was
+    analyzed again. The errors are the same as the ones of a new SemanticAnalyzer on the whole program.
+    - reused, rechecked: statements reused and analyzed by the last analyze()
+    """
+    def __init__(self, iterative=False):
+        super().__init__(iterative=iterative)
+        self.records = []
+        self.reused = self.rechecked = 0
+        # Reads and effects of the statement being analyzed
+        self.reads = set()
+        self.effects = []
+
+    def lookup(self, name):
+        binding = self.symbol_table.binding(name)
+        if binding is None:
+            self.reads.add(name)
+            return None
+        if binding[0] == 0:
+            self.reads.add(name)
+        return binding[1]
+
+    def define(self, name, type_):
+        if len(self.symbol_table) == 1:
+            self.effects.append(('define', name, type_))
+        super().define(name, type_)
+
+    def call_type(self, key, func_entry, arg_types):
+        known = arg_types in func_entry['cache']
+        type_ = yield from super().call_type(key, func_entry, arg_types)
+        if not known and arg_types in func_entry['cache'] and self.symbol_table.global_value(key) is func_entry:
+            self.effects.append(('infer', key, func_entry, arg_types, type_, arg_types in func_entry['context']))
+        return type_
+
+    def analyze(self, program, diagnostics=None):
+        """
+        Analyzes the program, reusing the records of the previous analysis where possible. The errors are recorded in the
+        given diagnostics, or in a new Diagnostics object (the 'diagnostics' attribute).
+        - Returns True if no error was found
+        """
+        self.symbol_table = SymbolTable()
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        self.reused = self.rechecked = 0
+        found = len(self.diagnostics)
+
+        old = self.records
+        matches = self.match(program, old)
+        dirty = set()
+        matched = set(matches)
+        for index, record in enumerate(old):
+            if index not in matched:
+                dirty.update(effect[1] for effect in record.effects)
+
+        entries = {}  # id(function entry of the previous analysis) -> entry of this one
+        records = []
+        for stmt, index in zip(program, matches):
+            record = old[index] if index is not None else None
+            if record is not None and record.reads.isdisjoint(dirty):
+                new_record = self.replay(record, entries)
+                if new_record is not None:
+                    records.append(new_record)
+                    self.reused += 1
+                    continue
+
+            new_record = self.analyze_statement(stmt)
+            records.append(new_record)
+            self.rechecked += 1
+            if record is None or not same_effects(record.effects, new_record.effects, entries):
+                dirty.update(effect[1] for effect in new_record.effects)
+                if record is not None:
+                    dirty.update(effect[1] for effect in record.effects)
+
+        self.records = records
+        return len(self.diagnostics) == found
+
+    @staticmethod
+    def match(program, old):
+        """
+        Index of the record of the previous analysis of every statement of the program, or None for a new statement.
+        The matched records keep their order: a statement moved before another one is a new statement.
+        """
+        by_node = None
+        matches, last = [], -1
+        for stmt in program:
+            # Most statements are the next one of the previous program
+            if last + 1 < len(old) and old[last + 1].node is stmt:
+                last += 1
+                matches.append(last)
+                continue
+
+            if by_node is None:
+                by_node = {}
+                for index in reversed(range(len(old))):
+                    by_node.setdefault(id(old[index].node), []).append(index)
+            candidates = by_node.get(id(stmt), [])
+            while candidates and candidates[-1] <= last:
+                candidates.pop()
+            if candidates:
+                last = candidates.pop()
+                matches.append(last)
+            else:
+                matches.append(None)
+        return matches
+
+    def analyze_statement(self, stmt):
+        """Visits a top-level statement as analyze() does, recording its reads, effects and errors"""
+        self.reads, self.effects = set(), []
+        errors = []
+        try:
+            self.visit(stmt)
+        except SemanticError as e:
+            errors.append((e.code, str(e)))
+            self.diagnostics.add('semantic', e.code, str(e))
+            if isinstance(stmt, AssignStat):
+                self.define(symbol_key(stmt.name, stmt.sym_id), 'any')
+        return StatementRecord(stmt, frozenset(self.reads), self.effects, errors)
+
+    def replay(self, record, entries):
+        """
+        Applies the effects and the errors of an unchanged statement instead of visiting it. The functions it defines get
+        new entries, with only the return types inferred from here on.
+        - Returns the record of the statement in this analysis, or None (changing nothing) if a function it inferred
+          types for has no entry in this analysis
+        """
+        created = set()
+        for effect in record.effects:
+            if effect[0] == 'define':
+                if isinstance(effect[2], dict):
+                    created.add(id(effect[2]))
+            elif id(effect[2]) not in entries and id(effect[2]) not in created:
                 return None
 
-            case ForStat(iterator, start, end, body):
-                self.define(iterator, 'int')
-
-                start_type = self.visit(start)
-                end_type = self.visit(end)
-
-                if start_type not in ['int', 'any'] or end_type not in ['int', 'any']:
-                    raise Exception("Semantic Error: FOR loop requires integers.")
-                
-                return self.visit(body)
-                
-
-            case FunctionDecl(name, params, body):
-                func_entry = {
-                    'tag': 'function',
-                    'params': params,
-                    'body': body,
-                    'cache': {}
-                }
-                self.define(name, func_entry)
-
-            case FunctionCall(name, args):
-                func_entry = self.lookup(name)
-
-                if not func_entry:
-                    raise Exception(f"Semantic Error: function '{name}' is not defined.")
-                
-                if not isinstance(func_entry, dict) or func_entry.get('tag') != 'function':
-                    raise Exception(f"Semantic Error: '{name}' is not a function")
-                
-                params = func_entry['params']
-                if len(params) != len(args):
-                    raise Exception(f"Arg count mismatch for '{name}'. Expected {len(params)}, got {len(args)}.")
-                
-                arg_types = tuple([self.visit(arg) for arg in args])
-
-                if arg_types in func_entry['cache']:
-                    return func_entry['cache'][arg_types]
-                
-                call_signature = (name, arg_types)
-                if call_signature in self.call_stack:
-                    return 'any'
-                
-                self.call_stack.add(call_signature)
-                self.enter_scope()
-
-                try:
-                    for param_name, arg_type in zip(params, arg_types):
-                        self.define(param_name, arg_type)
-                    
-                    body_node = func_entry['body']
-
-                    inferred_ret_type = self.visit(body_node)
-
-                    if inferred_ret_type is None:
-                        inferred_ret_type = 'any'
-                    
-                    func_entry['cache'][arg_types] = inferred_ret_type
-                    return inferred_ret_type
-                
-                finally:
-                    self.exit_scope()
-                    self.call_stack.remove(call_signature)
-
-            case _:
-                raise Exception(f"Unknown AST node: '{node}'")
+        self.effects = []
+        for effect in record.effects:
+            if effect[0] == 'define':
+                _, key, value = effect
+                if isinstance(value, dict):
+                    entry = {**value, 'cache': {}, 'context': set()}
+                    entry.pop('widened', None)
+                    value = entries[id(effect[2])] = entry
+                self.define(key, value)
+            else:
+                _, key, entry, arg_types, type_, dependent = effect
+                entry = entries[id(entry)]
+                entry['cache'][arg_types] = type_
+                if dependent:
+                    entry['context'].add(arg_types)
+                self.effects.append(('infer', key, entry, arg_types, type_, dependent))
+
+        for code, message in record.errors:
+            self.diagnostics.add('semantic', code, message)
+        return StatementRecord(record.node, record.reads, self.effects, record.errors)
+
+def same_effects(old, new, entries):
+    """
+    Tells if a statement analyzed again had the same effects as in the previous analysis: the same types, and entries of
+    the same function declarations, which are then mapped in entries (see IncrementalAnalyzer.analyze)
+    """
+    if len(old) != len(new):
+        return False
+    mapped = {}
+    for old_effect, new_effect in zip(old, new):
+        if old_effect[:2] != new_effect[:2]:
+            return False
+        if old_effect[0] == 'define':
+            old_value, new_value = old_effect[2], new_effect[2]
+            if isinstance(old_value, dict) and isinstance(new_value, dict):
+                if old_value['body'] is not new_value['body'] or old_value['params'] != new_value['params']:
+                    return False
+                mapped[id(old_value)] = new_value
+            elif old_value != new_value or isinstance(old_value, dict) or isinstance(new_value, dict):
+                return False
+        else:
+            if old_effect[3:] != new_effect[3:]:
+                return False
+            if (mapped.get(id(old_effect[2])) or entries.get(id(old_effect[2]))) is not new_effect[2]:
+                return False
+    entries.update(mapped)
+    return True
+
+# -----------------------------------------
+
+def check(source, diagnostics=None, lexer=None, inference_cache=None, budget=None):
+    """
+    Check-only mode (lexing, parsing and semantic analysis, without code generation). The source is parsed with lazy
+    function bodies, so the functions that are never called are only skimmed: their syntax errors are not found.
+    An inference_cache.InferenceCache shared by the checks skips the functions already inferred by the previous ones.
+    The inference is bounded by the given AnalysisBudget, or by the default one.
+    - Returns True if no error was found
+    """
+    diagnostics = Diagnostics() if diagnostics is None else diagnostics
+    program = parse(source, lexer, diagnostics, engine='descent', lazy=True)
+    if program is None or diagnostics:
+        return False
+    analyzer = SemanticAnalyzer(diagnostics, inference_cache=inference_cache,
+                                budget=AnalysisBudget() if budget is None else budget)
+    return analyzer.analyze(program) and not diagnostics
 
@@ -0,0 +1,251 @@
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from parser import FunctionDecl, parse
+from diagnostics import Diagnostics
+from visitor import steps
+import semantic
+import semantic_static
+
+"""
+Benchmark harness comparing the semantic analysis strategies: the call-site inference of semantic.py (every function
+body analyzed once for every tuple of argument types) and the static analysis of semantic_static.py (every body analyzed
+once at its declaration, with parameters of type 'any').
+The programs are generated with a given number of functions, call fan-out, argument type diversity and block nesting.
+Every strategy analyzes the same parsed tree and reports wall time, peak memory of the Python allocations, function body
+visits and size of the symbol table. The results are saved as JSON, and compared with a previous file to find
+regressions between versions.
+
+Usage: python semantic_bench.py [results.json [baseline.json]]
+"""
+
+FORMAT_VERSION = 1
+
+# Literals of the argument types, in the order they are introduced by the type diversity
+LITERALS = ['1', '"s"', 'True']
+
+# ------------Synthetic programs-----------
+
+def generate_program(functions, fan_out, types, nesting, seed=0):
+    """
+    Generates a program of the given number of functions. Every function calls fan_out of the following ones (so the call
+    graph has no cycles) passing its parameters and literals of the first 'types' argument types (1 to 3), inside
+    'nesting' nested if/for blocks. The top-level statements call every function with arguments of those types.
+    The operations are valid for any argument type, so the program passes the semantic analysis of both strategies.
+    """
+    rnd = random.Random(seed)
+    literals = LITERALS[:types]
+
+    def argument():
+        return rnd.choice(['p', 'q'] + literals)
+
+    lines = []
+    # semantic_static.py analyzes a body at its declaration: the callees are declared first
+    for index in reversed(range(functions)):
+        lines.append(f"def f{index}(p, q):")
+        pad = '    '
+        for level in range(nesting):
+            lines.append(f"{pad}if p == q:" if level % 2 == 0 else f"{pad}for i in range(0, 2):")
+            pad += '    '
+        lines += [f"{pad}r = p == q", f"{pad}t = p + p"]
+        callees = range(index + 1, functions)
+        for callee in rnd.sample(callees, min(fan_out, len(callees))):
+            lines.append(f"{pad}r = f{callee}({argument()}, {argument()})")
+        lines.append("    return p")
+
+    for index in range(functions):
+        lines.append(f"print(f{index}({rnd.choice(literals)}, {rnd.choice(literals)}))")
+    return "\n".join(lines) + "\n"
+
+# -----------------------------------------
+
+# ---------------Strategies----------------
+
+class Strategy:
+    """
+    Semantic analysis strategy compared by the harness. analyze(tree) runs a new analyzer on a parsed program and returns
+    it: visits(analyzer) and table_size(analyzer) read the body visits and the number of entries of its symbol table.
+    """
+    name = None
+
+    def create(self, diagnostics):
+        raise NotImplementedError
+
+    def analyze(self, tree):
+        analyzer = self.create(Diagnostics())
+        analyzer.analyze(tree)
+        return analyzer
+
+    def visits(self, analyzer):
+        raise NotImplementedError
+
+    def table_size(self, analyzer):
+        """Global bindings, plus the return types stored in the function entries"""
+        raise NotImplementedError
+
+class InferenceStrategy(Strategy):
+    """semantic.py, optionally with the limits of a semantic.AnalysisBudget"""
+    def __init__(self, name='semantic', **limits):
+        self.name = name
+        self.limits = limits
+
+    def create(self, diagnostics):
+        # Without limits the budget only counts the visits
+        limits = {'max_specializations': None, 'max_visits': None, 'max_depth': None, **self.limits}
+        return semantic.SemanticAnalyzer(diagnostics, budget=semantic.AnalysisBudget(**limits))
+
+    def visits(self, analyzer):
+        return analyzer.budget.visits
+
+    def table_size(self, analyzer):
+        scope = analyzer.symbol_table.scope(0)
+        return len(scope) + sum(len(value['cache']) for value in scope.values() if isinstance(value, dict))
+
+class CountingStaticAnalyzer(semantic_static.SemanticAnalyzer):
+    """semantic_static.SemanticAnalyzer counting the function bodies it visits"""
+    def __init__(self, diagnostics=None):
+        super().__init__(diagnostics)
+        self.visits = 0
+
+    @steps(FunctionDecl)
+    def function_steps(self, node):
+        self.visits += 1
+        return (yield from super().function_steps(node))
+
+class StaticStrategy(Strategy):
+    """semantic_static.py"""
+    name = 'semantic_static'
+
+    def create(self, diagnostics):
+        return CountingStaticAnalyzer(diagnostics)
+
+    def visits(self, analyzer):
+        return analyzer.visits
+
+    def table_size(self, analyzer):
+        scope = analyzer.symbol_table.scope(0)
+        return len(scope) + sum(1 for value in scope.values() if isinstance(value, dict))
+
+# Strategies compared by default
+STRATEGIES = [InferenceStrategy(), InferenceStrategy('semantic (budget)', max_specializations=4), StaticStrategy()]
+
+# -----------------------------------------
+
+# ----------------Harness------------------
+
+# Programs measured by default: (functions, fan_out, types, nesting)
+CONFIGS = [
+    (100, 2, 1, 0),
+    (100, 2, 3, 0),
+    (100, 4, 3, 2),
+    (400, 2, 3, 1),
+    (400, 4, 3, 3),
+]
+
+def measure(strategy, tree, repeat=3):
+    """Runs a strategy on a parsed program. Returns its result record (times in ms, memory in KB)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        strategy.analyze(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        analyzer = strategy.analyze(tree)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'strategy': strategy.name,
+        'time_ms': round(best * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'visits': strategy.visits(analyzer),
+        'table_size': strategy.table_size(analyzer),
+        'errors': len(analyzer.diagnostics),
+    }
+
+def run(configs=CONFIGS, strategies=STRATEGIES, seed=0):
+    """Measures every strategy on the program of every configuration. Returns the results document"""
+    results = []
+    for functions, fan_out, types, nesting in configs:
+        tree = parse(generate_program(functions, fan_out, types, nesting, seed))
+        program = {'functions': functions, 'fan_out': fan_out, 'types': types, 'nesting': nesting, 'seed': seed}
+        for strategy in strategies:
+            results.append({'program': program, **measure(strategy, tree)})
+    return {'version': FORMAT_VERSION, 'python': platform.python_version(), 'results': results}
+
+def program_label(program):
+    """Short name of a program configuration: <functions>f x<fan-out> t<argument types> n<nesting>"""
+    return "{functions}f x{fan_out} t{types} n{nesting}".format(**program)
+
+def result_key(result):
+    """Identity of a result across runs: the program configuration and the strategy"""
+    program = result['program']
+    return (program['functions'], program['fan_out'], program['types'], program['nesting'], program['seed'],
+            result['strategy'])
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Compares two results documents.
+    - Returns the regressions as messages: a time more than tolerance slower, more visits or a larger table
+    """
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        label = f"{result['strategy']} on {program_label(result['program'])}"
+        if result['time_ms'] > old['time_ms'] * (1 + tolerance):
+            regressions.append(f"{label}: time {old['time_ms']:.1f} -> {result['time_ms']:.1f} ms")
+        for field in ('visits', 'table_size'):
+            if result[field] > old[field]:
+                regressions.append(f"{label}: {field} {old[field]} -> {result[field]}")
+    return regressions
+
+def save(document, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported results format in '{path}'")
+    return document
+
+def print_results(document):
+    """Prints the results in the table layout of benchmark.py"""
+    header = ["PROGRAM", "STRATEGY", "TIME (ms)", "PEAK (KB)", "VISITS", "TABLE SIZE"]
+    line = "| " + " | ".join(f"{h:<18}" for h in header) + " |"
+    print("-" * len(line))
+    print(line)
+    print("-" * len(line))
+    for result in document['results']:
+        row = [program_label(result['program']), result['strategy'], result['time_ms'], result['peak_kb'], result['visits'], result['table_size']]
+        print("| " + " | ".join(f"{str(c):<18}" for c in row) + " |")
+    print("-" * len(line))
+
+# -----------------------------------------
+
+if __name__ == '__main__':
+    document = run()
+    print("Programs: <functions>f x<fan-out> t<argument types> n<nesting>")
+    print_results(document)
+
+    if len(sys.argv) > 1:
+        save(document, sys.argv[1])
+        print(f"Results saved in: {sys.argv[1]}")
+    if len(sys.argv) > 2:
+        regressions = compare(load(sys.argv[2]), document)
+        for message in regressions:
+            print(f"- REGRESSION {message}")
+        print(f"{len(regressions)} regressions against {sys.argv[2]}")
+        sys.exit(1 if regressions else 0)
@@ -1,41 +1,46 @@
 from parser import (
     Number, String, Boolean, Var, BinOp, UnaryOp, 
     AssignStat, PrintStat, IfStat, ForStat, InputExpr, 
-    FunctionDecl, FunctionCall, ExprStat, ReturnStat
+    FunctionDecl, FunctionCall, ExprStat, ReturnStat, ErrorStat,
+    symbol_key, param_keys
 )
+from diagnostics import Diagnostics, SemanticError
+from visitor import Visitor, handles, steps, visits
+from symbol_table import SymbolTable
 
 """
 Implementation with a static approach to the semantic analyser. Provided to allow comparison with the current approach (semantic.py)
 on type inference in the symbol table.
 """
 
-class SemanticAnalyzer:
-    def __init__(self):
-        self.symbol_table = [{}]
+class SemanticAnalyzer(Visitor):
+    def __init__(self, diagnostics=None, iterative=False):
+        self.symbol_table = SymbolTable()
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        if iterative:
+            # Explicit stack instead of recursion (see visitor.Visitor.walk), for very deep trees
+            self.visit = self.walk
 
 # --------------Helper methods-------------
 
     def enter_scope(self):
-        """Appends a new scope dictionary { } to the stack"""
-        self.symbol_table.append({})
+        """Opens a new scope in the symbol table"""
+        self.symbol_table.enter()
     
     def exit_scope(self):
-        """Removes the current scope dictionary { } from the stack"""
-        self.symbol_table.pop()
+        """Closes the current scope, dropping its definitions"""
+        self.symbol_table.exit()
 
     def define(self, name, type_):
-        """Define a new variable or function to the current scope"""
-        self.symbol_table[-1][name] = type_
+        """Define a new variable or function to the current scope (name is the key returned by symbol_key)"""
+        self.symbol_table.define(name, type_)
 
     def lookup(self, name):
         """
-        Searches for a variable starting from the current scope in reverse to the global scope [0].
+        Finds a variable in the innermost scope defining it (see symbol_table.SymbolTable).
         - Returns the type if the variable is found, otherwise returns None
         """
-        for scope in reversed(self.symbol_table):
-            if name in scope:
-                return scope[name]
-        return None
+        return self.symbol_table.lookup(name)
     
     def update_function_return_type(self, name, ret_type):
         """
@@ -43,213 +48,348 @@ class SemanticAnalyzer:
         During the declaration of the function the return type is set to 'any'.
         After the visit of the body, it is possible to update the real return type.
         """
-        for scope in reversed(self.symbol_table):
-            if name in scope:
-                entry = scope[name]
-                if isinstance(entry, dict) and entry.get('tag') == 'function':
-                    entry['ret_type'] = ret_type
-                    return
+        entry = self.lookup(name)
+        if isinstance(entry, dict) and entry.get('tag') == 'function':
+            entry['ret_type'] = ret_type
 
 # -----------------------------------------
 
-    def visit(self, node):
+    def analyze(self, program):
+        """
+        Visits the top-level statements of the program recording the semantic errors in the diagnostics, instead of stopping
+        at the first one. A variable whose assignment failed is defined as 'any', so its uses don't report other errors.
+        - Returns True if no error was found
+        """
+        found = len(self.diagnostics)
+        for stmt in program:
+            try:
+                self.visit(stmt)
+            except SemanticError as e:
+                self.diagnostics.add('semantic', e.code, str(e))
+                if isinstance(stmt, AssignStat):
+                    self.define(symbol_key(stmt.name, stmt.sym_id), 'any')
+        return len(self.diagnostics) == found
+
+# ---------------Type rules----------------
+# Shared by the steps and by the recursive handlers of visit(), from the types of the children
+
+    def sum_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'any'
+
+        if (left_type == 'str' and right_type == 'int') or \
+            (left_type == 'int' and right_type == 'str'):
+            raise SemanticError('type-mismatch', f"Semantic Error: type mismatch in sum. Cannot add {left_type} with {right_type}.")
+        return left_type
+
+    def product_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'any'
+
+        if left_type == 'int' and right_type == 'int':
+            return 'int'
+
+        if (left_type == 'str' and right_type == 'int') or (left_type == 'int' and right_type == 'str'):
+            return 'str'
+
+        raise SemanticError('type-mismatch', f"Semantic Error: type mismatch in multiplication. Cannot multiply {left_type} with {right_type}.")
+
+    def arithmetic_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'any'
+
+        if left_type == 'str' or right_type == 'str':
+            raise SemanticError('type-mismatch', f"Semantic Error: '{op}' doesn't accept strings.")
+
+        return 'int'
+
+    def equality_type(self, op, left_type, right_type):
+        # No type checking needed because we can compare different types and it return False -> 1 == '1' return False.
+        return 'bool'
+
+    def comparison_type(self, op, left_type, right_type):
+        if left_type == 'any' or right_type == 'any':
+            return 'bool'
+
+        if left_type != right_type:
+            raise SemanticError('type-mismatch', f"Semantic Error: type mismatch in comparison. Cannot compare {left_type} with {right_type}.")
+
+        return 'bool'
+
+    def logic_type(self, op, left_type, right_type):
+        if left_type == right_type:
+            return left_type
+
+        return 'any'
+
+    def assign_type(self, node, value_type):
+        """Defines the assigned variable. An assignment has the type of its value"""
+        self.define(symbol_key(node.name, node.sym_id), value_type)
+        return value_type
+
+    def negative_type(self, expr_type):
+        if expr_type == 'str':
+            raise SemanticError('type-mismatch', "Semantic Error: cannot use '-' on a string.")
+        return 'int'
+
+    def check_range(self, start_type, end_type):
+        if start_type not in ['int', 'any'] or end_type not in ['int', 'any']:
+            raise SemanticError('range-type', "Semantic Error: FOR loop requires integers.")
+
+    def declare_function(self, node):
+        """Defines the function declared by a FunctionDecl, with return type 'any' until its body is visited"""
+        func_entry = {
+            'tag': 'function',
+            'params': param_keys(node.params, node.param_ids),
+            'ret_type': 'any'   # if this is not modified it means that we didn't find any other type
+        }
+        self.define(symbol_key(node.name, node.sym_id), func_entry)
+        return func_entry
+
+    def called_function(self, node):
         """
-        Navigates through the AST nodes generate by the parser.
-        - Returns the type for the expressions: Number, String, Boolean, InputExpr, AssignStat, Var, BinOp, UnaryOp
-        - Returns None for the statements: PrintStat, ExprStat, ReturnStat, IfStat, ForStat, FunctionDecl
+        Looks up the function of a FunctionCall checking that it exists and that it takes the given number of arguments.
+        - Returns its entry in the symbol table
         """
-        match node:
-
-            case list(statements):
-                for stmt in statements:
-                    self.visit(stmt)
-                return
-            
-            case Number(_):  return 'int'
-            case String(_):  return 'str'
-            case Boolean(_): return 'bool'
-            case InputExpr(_): return 'str'
-
-            case AssignStat(name, value):
-                value_type = self.visit(value)
-                self.define(name, value_type)
-                return value_type
-            
-            case Var(name):
-                val = self.lookup(name)
-                if val is None:
-                    raise Exception(f"Semantic Error: variable '{name}' is not defined.")
-                
-                if isinstance(val, dict) and val.get('tag') == 'function':  # if val is a dictionary it means it is a function used as variable
-                    return 'function'
-
-                return val
-            
-            # '+' can handle arithmetic sums and string concatenation
-            case BinOp(left, '+', right):
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == 'any' or right_type == 'any':
-                    return 'any'
-
-                if (left_type == 'str' and right_type == 'int') or \
-                    (left_type == 'int' and right_type == 'str'):
-                    raise Exception(f"Semantic Error: type mismatch in sum. Cannot add {left_type} with {right_type}.")
-                return left_type
-            
-            case BinOp(left, '*', right):
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == 'any' or right_type == 'any':
-                    return 'any'
-                
-                if left_type == 'int' and right_type == 'int':
-                    return 'int'
-                
-                if (left_type == 'str' and right_type == 'int') or (left_type == 'int' and right_type == 'str'):
-                    return 'str'
-                
-                raise Exception(f"Semantic Error: type mismatch in multiplication. Cannot multiply {left_type} with {right_type}.")
-            
-            # '-', '*', '/' are just used for arithmetics operations
-            case BinOp(left, op, right) if op in ['-', '/']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == 'any' or right_type == 'any':
-                    return 'any'
-
-                if left_type == 'str' or right_type == 'str':
-                    raise Exception(f"Semantic Error: '{op}' doesn't accept strings.")
-                
-                return 'int'
-            
-            case BinOp(left, op, right) if op in ['==', '!=']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-                # No type checking needed because we can compare different types and it return False -> 1 == '1' return False.
-                return 'bool'   
-            
-            # '>', '<', '>=', '<=' end in this section
-            case BinOp(left, op, right) if op in ['>', '<', '>=', '<=']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-                
-                if left_type == 'any' or right_type == 'any':
-                    return 'bool'
-                
-                if left_type != right_type:
-                    raise Exception(f"Semantic Error: type mismatch in comparison. Cannot compare {left_type} with {right_type}.")
-                
-                return 'bool'
-                
-            # 'and', 'or' end in this section
-            case BinOp(left, op, right) if op in ['and', 'or']:
-                left_type = self.visit(left)
-                right_type = self.visit(right)
-
-                if left_type == right_type:
-                    return left_type
-                
-                return 'any'
-            
-            # 'not' for boolean values
-            case UnaryOp('not', expr):
-                self.visit(expr)
-                return 'bool'
-            
-            # '-' for negative numbers
-            case UnaryOp('-', expr):
-                expr_type = self.visit(expr)
-                if expr_type == 'str':
-                    raise Exception("Semantic Error: cannot use '-' on a string.")
-                return 'int'
-            
-            case PrintStat(value):
-                self.visit(value)
-
-            case ExprStat(expr):
-                self.visit(expr)
-            
-            case ReturnStat(value):
-                if len(self.symbol_table) <= 1:
-                    raise Exception("Semantic Error: 'return' statement outside function")
-                
-                if value is not None:
-                    return self.visit(value)
-                return 'any'
-
-            # IF statement without ELSE
-            case IfStat(condition, true_block, None):
-                self.visit(condition)
-                self.visit(true_block)
-
-            # IF statement with ELSE
-            case IfStat(condition, true_block, false_block):
-                self.visit(condition)
-                self.visit(true_block)
-                self.visit(false_block)
-
-            case ForStat(iterator, start, end, body):
-                self.define(iterator, 'int')
-
-                start_type = self.visit(start)
-                end_type = self.visit(end)
-
-                if start_type not in ['int', 'any'] or end_type not in ['int', 'any']:
-                    raise Exception("Semantic Error: FOR loop requires integers.")
-                
-                self.visit(body)
-
-            case FunctionDecl(name, params, body):
-                func_entry = {
-                    'tag': 'function',
-                    'params': params,
-                    'ret_type': 'any'   # if this is not modified it means that we didn't find any other type
-                }
-                self.define(name, func_entry)
-
-                self.enter_scope()
-
-                for p in params:
-                    self.define(p, 'any')   # because we don't infer input types of params
-
-                inferred_type = 'any'
-
-                try:
-                    for stmt in body:
-                        stmt_type = self.visit(stmt)
-
-                        if isinstance(stmt, ReturnStat):
-                            inferred_type = stmt_type   # we always take the last returned type. We overwrite eventual multiple subsequent returns
-                finally:
-                    self.exit_scope()
-
-                self.update_function_return_type(name, inferred_type)
-
-            case FunctionCall(name, args):
-                func_entry = self.lookup(name)
-
-                if not func_entry:
-                    raise Exception(f"Semantic Error: function '{name}' is not defined.")
-                
-                if not isinstance(func_entry, dict) or func_entry.get('tag') != 'function':
-                    raise Exception(f"Semantic Error: '{name}' is not a function")
-                
-                param_count = len(func_entry['params'])
-                arg_count = len(args)
-
-                if param_count != arg_count:
-                    raise Exception(f"Semantic Error: Function '{name}' expects {param_count} arguments, but got {arg_count}.")
-                
-                for arg in args:
-                    self.visit(arg)
-                
-                return func_entry['ret_type']
-
-            case _:
-                raise Exception(f"Unknown AST node: '{node}'")
+        name, args = node.name, node.args
+        func_entry = self.lookup(symbol_key(name, node.sym_id))
+
+        if not func_entry:
+            raise SemanticError('undefined-function', f"Semantic Error: function '{name}' is not defined.")
+
+        if not isinstance(func_entry, dict) or func_entry.get('tag') != 'function':
+            raise SemanticError('not-a-function', f"Semantic Error: '{name}' is not a function")
+
+        param_count = len(func_entry['params'])
+        arg_count = len(args)
+
+        if param_count != arg_count:
+            raise SemanticError('argument-count', f"Semantic Error: Function '{name}' expects {param_count} arguments, but got {arg_count}.")
+
+        return func_entry
+
+# -----------------------------------------
+
+# ---------------Tree walker---------------
+# visit(node) (see visitor.Visitor) returns the type for the expressions (Number, String, Boolean, InputExpr, AssignStat,
+# Var, BinOp, UnaryOp) and None for the statements (PrintStat, ExprStat, ReturnStat, IfStat, ForStat, FunctionDecl).
+# The nodes with children are handled by generators of steps: they yield the children instead of visiting them.
+# The BinOp and UnaryOp generators are selected by the operator too. The most frequent nodes also have a recursive
+# handler, which visit() calls instead of running their steps (see visitor.visits).
 
+    @handles(Number)
+    def visit_number(self, node): return 'int'
+
+    @handles(String, InputExpr)
+    def visit_string(self, node): return 'str'
+
+    @handles(Boolean)
+    def visit_boolean(self, node): return 'bool'
+
+    @handles(Var)
+    def visit_var(self, node):
+        name = node.name
+        val = self.lookup(symbol_key(name, node.sym_id))
+        if val is None:
+            raise SemanticError('undefined-variable', f"Semantic Error: variable '{name}' is not defined.")
+
+        if isinstance(val, dict) and val.get('tag') == 'function':  # if val is a dictionary it means it is a function used as variable
+            return 'function'
+
+        return val
+
+    # Statement skipped by the parser after a syntax error
+    @handles(ErrorStat)
+    def visit_error(self, node):
+        return None
+
+    @steps(list)
+    def block_steps(self, statements):
+        for stmt in statements:
+            yield stmt
+        return
+
+    @steps(AssignStat)
+    def assign_steps(self, node):
+        return self.assign_type(node, (yield node.value))
+
+    # '+' can handle arithmetic sums and string concatenation
+    @steps((BinOp, '+'))
+    def sum_steps(self, node):
+        return self.sum_type(node.op, (yield node.left), (yield node.right))
+
+    @steps((BinOp, '*'))
+    def product_steps(self, node):
+        return self.product_type(node.op, (yield node.left), (yield node.right))
+
+    # '-', '/' are just used for arithmetics operations
+    @steps((BinOp, '-'), (BinOp, '/'))
+    def arithmetic_steps(self, node):
+        return self.arithmetic_type(node.op, (yield node.left), (yield node.right))
+
+    @steps((BinOp, '=='), (BinOp, '!='))
+    def equality_steps(self, node):
+        return self.equality_type(node.op, (yield node.left), (yield node.right))
+
+    # '>', '<', '>=', '<=' end in this section
+    @steps((BinOp, '>'), (BinOp, '<'), (BinOp, '>='), (BinOp, '<='))
+    def comparison_steps(self, node):
+        return self.comparison_type(node.op, (yield node.left), (yield node.right))
+
+    # 'and', 'or' end in this section
+    @steps((BinOp, 'and'), (BinOp, 'or'))
+    def logic_steps(self, node):
+        return self.logic_type(node.op, (yield node.left), (yield node.right))
+
+    # 'not' for boolean values
+    @steps((UnaryOp, 'not'))
+    def not_steps(self, node):
+        yield node.expr
+        return 'bool'
+
+    # '-' for negative numbers
+    @steps((UnaryOp, '-'))
+    def negative_steps(self, node):
+        return self.negative_type((yield node.expr))
+
+    @steps(PrintStat)
+    def print_steps(self, node):
+        yield node.value
+
+    @steps(ExprStat)
+    def expr_steps(self, node):
+        yield node.expr
+
+    @steps(ReturnStat)
+    def return_steps(self, node):
+        if len(self.symbol_table) <= 1:
+            raise SemanticError('return-outside-function', "Semantic Error: 'return' statement outside function")
+
+        if node.value is not None:
+            return (yield node.value)
+        return 'any'
+
+    # IF statement, with or without ELSE
+    @steps(IfStat)
+    def if_steps(self, node):
+        yield node.condition
+        yield node.true_block
+        if node.false_block is not None:
+            yield node.false_block
+
+    @steps(ForStat)
+    def for_steps(self, node):
+        self.define(symbol_key(node.iterator, node.iterator_id), 'int')
+
+        start_type = yield node.start
+        self.check_range(start_type, (yield node.end))
+        yield node.body
+
+    @steps(FunctionDecl)
+    def function_steps(self, node):
+        name, sym_id = node.name, node.sym_id
+        func_entry = self.declare_function(node)
+
+        self.enter_scope()
+
+        for p in func_entry['params']:
+            self.define(p, 'any')   # because we don't infer input types of params
+
+        inferred_type = 'any'
+
+        try:
+            for stmt in node.body:
+                stmt_type = yield stmt
+
+                if isinstance(stmt, ReturnStat):
+                    inferred_type = stmt_type   # we always take the last returned type. We overwrite eventual multiple subsequent returns
+        finally:
+            self.exit_scope()
+
+        self.update_function_return_type(symbol_key(name, sym_id), inferred_type)
+
+    @steps(FunctionCall)
+    def call_steps(self, node):
+        func_entry = self.called_function(node)
+        for arg in node.args:
+            yield arg
+
+        return func_entry['ret_type']
+
+# -----------------------------------------
 
+# ------------Recursive handlers-----------
+# Same steps as above for the most frequent nodes, visiting the children with self.visit instead of yielding them
+
+    @visits(list)
+    def visit_block(self, statements):
+        for stmt in statements:
+            self.visit(stmt)
+
+    @visits(AssignStat)
+    def visit_assign(self, node):
+        return self.assign_type(node, self.visit(node.value))
+
+    @visits((BinOp, '+'))
+    def visit_sum(self, node):
+        return self.sum_type(node.op, self.visit(node.left), self.visit(node.right))
+
+    @visits((BinOp, '*'))
+    def visit_product(self, node):
+        return self.product_type(node.op, self.visit(node.left), self.visit(node.right))
+
+    @visits((BinOp, '-'), (BinOp, '/'))
+    def visit_arithmetic(self, node):
+        return self.arithmetic_type(node.op, self.visit(node.left), self.visit(node.right))
+
+    @visits((BinOp, '=='), (BinOp, '!='))
+    def visit_equality(self, node):
+        return self.equality_type(node.op, self.visit(node.left), self.visit(node.right))
+
+    @visits((BinOp, '>'), (BinOp, '<'), (BinOp, '>='), (BinOp, '<='))
+    def visit_comparison(self, node):
+        return self.comparison_type(node.op, self.visit(node.left), self.visit(node.right))
+
+    @visits((BinOp, 'and'), (BinOp, 'or'))
+    def visit_logic(self, node):
+        return self.logic_type(node.op, self.visit(node.left), self.visit(node.right))
+
+    @visits((UnaryOp, 'not'))
+    def visit_not(self, node):
+        self.visit(node.expr)
+        return 'bool'
+
+    @visits((UnaryOp, '-'))
+    def visit_negative(self, node):
+        return self.negative_type(self.visit(node.expr))
+
+    @visits(PrintStat)
+    def visit_print(self, node):
+        self.visit(node.value)
+
+    @visits(ExprStat)
+    def visit_expr(self, node):
+        self.visit(node.expr)
+
+    @visits(IfStat)
+    def visit_if(self, node):
+        self.visit(node.condition)
+        self.visit(node.true_block)
+        if node.false_block is not None:
+            self.visit(node.false_block)
+
+    @visits(ForStat)
+    def visit_for(self, node):
+        self.define(symbol_key(node.iterator, node.iterator_id), 'int')
+
+        start_type = self.visit(node.start)
+        self.check_range(start_type, self.visit(node.end))
+        self.visit(node.body)
+
+    @visits(FunctionCall)
+    def visit_call(self, node):
+        func_entry = self.called_function(node)
+        for arg in node.args:
+            self.visit(arg)
+
+        return func_entry['ret_type']
@@ -0,0 +1,71 @@
+"""
+Scoped symbol table shared by the semantic analyzer and the code generator.
+Instead of a stack of dictionaries searched from the innermost scope at every lookup, every key has its own stack of
+bindings (the innermost last) and every open scope an undo log of the keys it defined: lookup, define and the exit
+from a scope are O(1) amortized, whatever the depth of the scopes.
+"""
+
+class SymbolTable:
+    """
+    Keys are the ones returned by parser.symbol_key. The global scope is always open.
+    - bindings: key -> list of (depth, value), one for every open scope defining the key
+    - log: for every open scope (index = depth), the keys it defined
+    """
+    __slots__ = ('bindings', 'log')
+
+    def __init__(self):
+        self.bindings = {}
+        self.log = [[]]
+
+    def __len__(self):
+        """Number of open scopes (1 in the global scope)"""
+        return len(self.log)
+
+    def __contains__(self, key):
+        return key in self.bindings
+
+    def enter(self):
+        """Opens a new innermost scope"""
+        self.log.append([])
+
+    def exit(self):
+        """Closes the innermost scope, dropping its bindings"""
+        bindings = self.bindings
+        for key in self.log.pop():
+            stack = bindings[key]
+            if len(stack) == 1:
+                del bindings[key]
+            else:
+                stack.pop()
+
+    def define(self, key, value):
+        """Binds the key in the innermost scope, replacing its binding if it is already defined there"""
+        depth = len(self.log) - 1
+        stack = self.bindings.get(key)
+        if stack is None:
+            self.bindings[key] = [(depth, value)]
+        elif stack[-1][0] == depth:
+            stack[-1] = (depth, value)
+            return
+        else:
+            stack.append((depth, value))
+        self.log[-1].append(key)
+
+    def lookup(self, key):
+        """Value of the key in the innermost scope defining it, or None if it isn't defined"""
+        stack = self.bindings.get(key)
+        return stack[-1][1] if stack is not None else None
+
+    def binding(self, key):
+        """(depth, value) of the innermost binding of the key, or None if it isn't defined"""
+        stack = self.bindings.get(key)
+        return stack[-1] if stack is not None else None
+
+    def global_value(self, key):
+        """Value of the key in the global scope, or None if it isn't defined there"""
+        stack = self.bindings.get(key)
+        return stack[0][1] if stack is not None and stack[0][0] == 0 else None
+
+    def scope(self, depth=0):
+        """Bindings defined in the scope at the given depth (0 = global), in definition order"""
+        return {key: next(value for d, value in self.bindings[key] if d == depth) for key in self.log[depth]}
@@ -0,0 +1,122 @@
+import hashlib
+import importlib.util
+import os
+import sys
+
+import ply
+
+"""
+Persistent cache for the PLY lexer and parser tables.
+Building the master regex of the lexer and the LALR automaton of the parser is done every time the modules are imported.
+The tables are stored as Python modules whose name contains a hash of the token and grammar rules, so a change of the
+rules produces a new file and the stale one is simply ignored.
+
+The cache is controlled by the PY2JS_TABLE_CACHE environment variable:
+- not set: tables are read from the 'tables' folder next to the package (or bundled by PyInstaller) and from the user cache folder
+- '0': the cache is disabled and the tables are rebuilt in memory at every import
+- any other value: it is used as the only cache folder
+"""
+
+CACHE_ENV = 'PY2JS_TABLE_CACHE'
+TABLES_DIR = 'tables'
+
+# --------------Cache folders--------------
+
+def enabled():
+    """Returns False if the table cache has been disabled through the environment"""
+    return os.environ.get(CACHE_ENV, '') != '0'
+
+def bundled_dir():
+    """Folder of the precomputed tables shipped with the package. Works for dev and PyInstaller."""
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+
+    return os.path.join(base_path, TABLES_DIR)
+
+def user_dir():
+    """Per-user cache folder, used when the package folder is read-only (e.g. frozen executable)"""
+    if os.name == 'nt':
+        base_path = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base_path = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(base_path, 'py2js', TABLES_DIR)
+
+def search_dirs():
+    """Folders where the tables are looked up, in order of priority"""
+    override = os.environ.get(CACHE_ENV, '')
+    if override and override != '0':
+        return [override]
+    return [bundled_dir(), user_dir()]
+
+def write_dir():
+    """
+    Returns the first folder where new tables can be written, or None if there is none.
+    The bundled folder is skipped inside the frozen executable since it is extracted to a temporary folder.
+    """
+    candidates = search_dirs()
+    if getattr(sys, 'frozen', False) and len(candidates) > 1:
+        candidates = candidates[1:]
+
+    for directory in candidates:
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(directory, os.W_OK):
+            return directory
+    return None
+
+# -----------------------------------------
+
+# --------------Table modules--------------
+
+def table_name(prefix, *rules):
+    """
+    Builds the module name of a table from a hash of the rules that generated it.
+    The PLY version is part of the hash because the table format depends on it.
+    """
+    digest = hashlib.sha256(repr((ply.__version__,) + rules).encode('utf-8')).hexdigest()
+    return f"{prefix}_{digest[:16]}"
+
+def find_table(filename):
+    """
+    Searches a table file in the cache folders.
+    - Returns the path if the file is found, otherwise returns None
+    """
+    for directory in search_dirs():
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def load_module(name):
+    """
+    Loads a table module from the cache folders without touching sys.path.
+    - Returns the module if found, otherwise returns None
+    """
+    path = find_table(name + '.py')
+    if path is None:
+        return None
+
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except Exception:
+        # Corrupted or partially written file: the table will be regenerated
+        return None
+
+# -----------------------------------------
+
+# Precompute the tables (e.g. before building the executable with PyInstaller)
+if __name__ == '__main__':
+    os.environ.setdefault(CACHE_ENV, bundled_dir())
+    import parser
+
+    print(f"Tables written in: {search_dirs()[0]}")
+    for name in sorted(os.listdir(search_dirs()[0])):
+        print(f"- {name}")
@@ -0,0 +1,497 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import ast_codec
+import inference_cache
+import lexer
+import parser
+import semantic_static
+from ast_arena import Arena
+from diagnostics import Diagnostics
+from semantic import SemanticAnalyzer, IncrementalAnalyzer, AnalysisBudget, AnalysisProfile
+from inference_cache import InferenceCache
+from codegen import CodeGenerator
+from benchmark import synthetic_program, random_statements, library_program, mutate
+
+"""
+Differential tests of the interchangeable engines of the pipeline: every alternative engine must give exactly the same
+results of the reference one over a corpus of generated programs, edge cases and the sources of this repository.
+- lexer: the hand-written Scanner against the PLY lexer (IndentLexer(engine='scanner') / engine='ply')
+- parser: the hand-written DescentParser against the ply.yacc parser (parse(engine='descent') / engine='yacc')
+- arena: parse(arena=True) against the arena of the tree, and the arena walkers of the semantic analysis and of the code
+  generation against the tree ones (recursive and iterative)
+- threads: parse() called from several threads at the same time against the same calls made one at a time
+- parse cache: the key of an AST in the cache against changes of the code of the lexer and of the parser
+- incremental lexing: the token stream spliced by IndentLexer.relex() after an edit against a full tokenize()
+- incremental parsing: the AST updated by reparse() after an edit against a full parse()
+- AST codec: the AST decoded from its encoding (and read from the parse cache) against the parsed one
+- lazy bodies: the errors of parse(lazy=True) and of the analysis against the ones of an eager parse
+- shared nodes: parse(share=True) against the plain tree, and its JavaScript
+- walkers: the iterative walkers (explicit stack) against the recursive ones
+- analysis options: the errors of SemanticAnalyzer with an inference cache, a budget or a profile against the plain one
+- incremental analysis: the errors of IncrementalAnalyzer after an edit against a new SemanticAnalyzer
+- parallel code generation: CodeGenerator.generate_parallel() against generate_arena()
+These checks are also run, on larger inputs, by the benchmarks of the same features in benchmark.py.
+Usage: python tester_engines.py (or python -m unittest tester_engines)
+"""
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# Inputs that exercise the corner cases of the lexer: illegal characters, unterminated strings, tabs and CRLF, non-ASCII
+# digits, inconsistent dedents, blank lines with spaces, escapes and a comment at the end of the file
+LEXER_EDGE_CASES = ["", "x = 1", "x = 1 ! 2\n", "a = 'unterminated\nb = 2\n", "\tx = 1\r\n", "x = \u0661\u0662\n",
+                    "if a:\n  b = 1\n c = 2\n", "x = 1\n    \ny = 2\n\n\n", "print(\"a\\\\\")  # c\n#"]
+
+def repository_sources():
+    """The Python sources of this repository, full of characters that are illegal for the transpiler"""
+    sources = []
+    for filename in sorted(os.listdir(FOLDER)):
+        if filename.endswith('.py'):
+            with open(os.path.join(FOLDER, filename), encoding='utf-8') as f:
+                sources.append(f.read())
+    return sources
+
+def token_stream(source, engine, indent=True):
+    """Tokens (type, value, line, offset, column) and diagnostics of a source lexed with the given base engine"""
+    diagnostics = Diagnostics()
+    base = lexer.ENGINES[engine]()
+    base.lineno = 1
+    base.diagnostics = diagnostics
+    lex_obj = lexer.IndentLexer(base, diagnostics=diagnostics) if indent else base
+    lex_obj.input(source)
+    tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos, getattr(tok, 'column', None))
+              for tok in iter(lex_obj.token, None)]
+    return tokens, diagnostics.records
+
+class LexerEnginesTest(unittest.TestCase):
+    """The Scanner must produce the token stream and the errors of the PLY lexer"""
+
+    corpus = [synthetic_program(100, seed) for seed in range(10)] + LEXER_EDGE_CASES + repository_sources()
+
+    def check(self, indent):
+        for source in self.corpus:
+            with self.subTest(source=source[:60]):
+                self.assertEqual(token_stream(source, 'scanner', indent), token_stream(source, 'ply', indent))
+
+    def test_raw_tokens(self):
+        self.check(indent=False)
+
+    def test_indented_tokens(self):
+        self.check(indent=True)
+
+# Inputs that exercise the corner cases of the grammar: empty input, missing operands and blocks, misplaced indentation,
+# chained comparisons (non-associative), empty and trailing-comma argument and parameter lists, illegal characters
+PARSER_EDGE_CASES = ["", "\n", "x = \n", "if a:\nx = 1\n", "  x = 1\n", "a < b < c\n", "f(,)\n", "def h(p,):\n    x = 1\n",
+                     "x = ) $ 1\ny = @ 2\n"]
+
+def parse_result(source, engine):
+    """AST of a source parsed with the given engine, and its lexer and parser diagnostics"""
+    diagnostics = Diagnostics()
+    ast = parser.parse(source, lexer.IndentLexer(engine='scanner'), diagnostics, engine=engine)
+    return ast, [record for record in diagnostics if record.stage == 'lexer'], \
+        [record for record in diagnostics if record.stage == 'parser']
+
+def flat(ast):
+    """Arrays of the arena of a tree: unlike the dataclass equality they compare the symbol IDs too"""
+    arena = Arena.from_tree(ast)
+    return (arena.kinds, arena.ops, arena.first, arena.second, arena.third, arena.refs, arena.syms, arena.items,
+            arena.values)
+
+class ParserEnginesTest(unittest.TestCase):
+    """
+    The DescentParser must build the AST of the yacc parser (symbol IDs included) for valid programs and, for broken ones,
+    report the first syntax error of the yacc parser and return None. The lexer errors are the same in both cases.
+    """
+
+    valid = [synthetic_program(50, seed) for seed in range(10)] + [random_statements(40, seed) for seed in range(100)]
+    # Every valid program broken in two ways
+    broken = [mutate(source, random.Random(seed)) for seed, source in enumerate(valid * 2)] + PARSER_EDGE_CASES
+
+    def test_valid_programs(self):
+        for source in self.valid:
+            with self.subTest(source=source[:60]):
+                expected, expected_lexer, expected_parser = parse_result(source, 'yacc')
+                actual, actual_lexer, actual_parser = parse_result(source, 'descent')
+                self.assertEqual(actual_lexer, expected_lexer)
+                if expected_parser:  # a random program can still have a syntax error
+                    continue
+                self.assertEqual(actual_parser, [])
+                self.assertEqual(flat(actual), flat(expected))
+
+    def test_broken_programs(self):
+        for source in self.broken:
+            with self.subTest(source=source[:60]):
+                expected, expected_lexer, expected_parser = parse_result(source, 'yacc')
+                actual, actual_lexer, actual_parser = parse_result(source, 'descent')
+                self.assertEqual(actual_lexer, expected_lexer)
+                if not expected_parser:  # the mutation kept the program valid
+                    self.assertEqual(flat(actual), flat(expected))
+                    continue
+                self.assertIsNone(actual)
+                self.assertEqual(actual_parser, expected_parser[:1])
+
+def walker_results(ast, use_arena, iterative):
+    """Semantic diagnostics and JavaScript code of an AST (a tree, or an arena if use_arena)"""
+    analyzer = SemanticAnalyzer(diagnostics=Diagnostics(), iterative=iterative)
+    codegen = CodeGenerator(iterative=iterative)
+    if use_arena:
+        analyzer.analyze_arena(ast)
+        return analyzer.diagnostics.records, codegen.generate_arena(ast)
+    analyzer.analyze(ast)
+    return analyzer.diagnostics.records, codegen.generate(ast)
+
+class ArenaTest(unittest.TestCase):
+    """
+    With both engines, the parser must build directly the arena of the dataclass tree (Arena.from_tree), with the same
+    diagnostics, and walking the arena must give the semantic errors and the JavaScript of walking the tree
+    """
+
+    corpus = ParserEnginesTest.valid[:60] + ParserEnginesTest.broken[:60] + PARSER_EDGE_CASES
+
+    def test_arena_parse(self):
+        for engine in ('yacc', 'descent'):
+            for source in self.corpus:
+                with self.subTest(engine=engine, source=source[:60]):
+                    tree_diagnostics, arena_diagnostics = Diagnostics(), Diagnostics()
+                    tree = parser.parse(source, lexer.IndentLexer(engine='scanner'), tree_diagnostics, engine=engine)
+                    arena = parser.parse(source, lexer.IndentLexer(engine='scanner'), arena_diagnostics, engine=engine,
+                                         arena=True)
+                    self.assertEqual(arena_diagnostics.records, tree_diagnostics.records)
+                    if tree is None:
+                        self.assertIsNone(arena)
+                        continue
+                    # The nodes are stored in the order of the reductions (and the ones discarded by the error recovery
+                    # stay in the arena), so the trees are compared
+                    self.assertEqual(flat(arena.to_tree()), flat(tree))
+
+    def test_arena_walkers(self):
+        for source in self.corpus:
+            tree = parser.parse(source, diagnostics=Diagnostics())
+            if tree is None:
+                continue
+            arena = parser.parse(source, diagnostics=Diagnostics(), arena=True)
+            for iterative in (False, True):
+                with self.subTest(iterative=iterative, source=source[:60]):
+                    self.assertEqual(walker_results(arena, True, iterative), walker_results(tree, False, iterative))
+
+    def test_parts(self):
+        """A part with every other top-level statement (see Arena.part) must hold the same statements of the arena"""
+        for engine in ('yacc', 'descent'):
+            for source in self.corpus:
+                arena = parser.parse(source, diagnostics=Diagnostics(), engine=engine, arena=True)
+                if arena is None:
+                    continue
+                for arena in (arena, Arena.from_tree(arena.to_tree())):
+                    statements = arena.block(arena.root)[::2]
+                    ranges = arena.statement_ranges()[::2]
+                    part = Arena.from_part(arena.part(ranges))
+                    with self.subTest(engine=engine, source=source[:60]):
+                        self.assertEqual([flat([part.node(stmt)]) for stmt in statements],
+                                         [flat([arena.node(stmt)]) for stmt in statements])
+
+def yacc_result(source):
+    """AST (as arena arrays) and diagnostics of a source parsed with the yacc engine"""
+    diagnostics = Diagnostics()
+    ast = parser.parse(source, diagnostics=diagnostics)
+    return (None if ast is None else flat(ast)), diagnostics.records
+
+class ThreadsTest(unittest.TestCase):
+    """
+    Concurrent compilations must not interfere: the yacc parser keeps the state of a parsing (and of the error recovery)
+    on the parser object, so every thread must use its own
+    """
+
+    def test_concurrent_parses(self):
+        sources = ParserEnginesTest.valid[:40] + ParserEnginesTest.broken[:160]
+        expected = [yacc_result(source) for source in sources]
+        # Frequent thread switches, so the parsings are interleaved in the middle of their rules
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        try:
+            with ThreadPoolExecutor(8) as pool:
+                actual = list(pool.map(yacc_result, sources))
+        finally:
+            sys.setswitchinterval(interval)
+        for source, actual_result, expected_result in zip(sources, actual, expected):
+            with self.subTest(source=source[:60]):
+                self.assertEqual(actual_result, expected_result)
+
+class ParseCacheTest(unittest.TestCase):
+    """The key of the parse cache must change with the code of the lexer and of the parser, not only with their rules"""
+
+    def changed_key(self, owner, name, replacement):
+        """Key of a source with the function or method name of owner replaced"""
+        original = vars(owner)[name]
+        setattr(owner, name, replacement)
+        inference_cache.CODE_SIGNATURES.pop(owner, None)
+        ast_codec.BUILDER_SIGNATURE = None
+        try:
+            return ast_codec.cache_key("x = 'a'\n", 'yacc')
+        finally:
+            setattr(owner, name, original)
+            inference_cache.CODE_SIGNATURES.pop(owner, None)
+            ast_codec.BUILDER_SIGNATURE = None
+
+    def test_code_changes(self):
+        key = ast_codec.cache_key("x = 'a'\n", 'yacc')
+        string_rule = lexer.t_STRING
+        # Same regular expression (docstring), another action
+        def t_STRING(t):
+            t.value = t.value[1:]
+            return t
+        t_STRING.__doc__ = string_rule.__doc__
+
+        changes = [(lexer, 't_STRING', t_STRING), (parser, 'p_statement_print', lambda p: None),
+                   (parser, 'symbol', lambda p, n: None), (parser.DescentParser, 'literal', lambda self: None)]
+        for owner, name, replacement in changes:
+            with self.subTest(name=name):
+                self.assertNotEqual(self.changed_key(owner, name, replacement), key)
+        self.assertEqual(ast_codec.cache_key("x = 'a'\n", 'yacc'), key)
+
+# Text inserted by the random edits: indentation and newlines (misaligned lines included), blocks, names and brackets
+EDIT_PIECES = ['\n', ' ', '  ', '    ', '\n  ', '\n    x = 1', 'if a:\n', ' \n', 'z', '1', '(', ')', '#c', '\n\n', "'s'",
+               'def f(p):\n']
+
+class RelexTest(unittest.TestCase):
+    """After random edits, relex() must give the tokens (columns included) of a full tokenization of the edited source"""
+
+    def test_random_edits(self):
+        rnd = random.Random(0)
+        for engine in ('ply', 'scanner'):
+            for seed in range(100):
+                stream = lexer.IndentLexer(engine=engine).tokenize(random_statements(15, seed))
+                for _ in range(10):
+                    data = stream.data
+                    start = rnd.randint(0, len(data))
+                    end = min(len(data), start + rnd.choice([0, 0, 1, 2, 4]))
+                    text = ''.join(rnd.choice(EDIT_PIECES) for _ in range(rnd.randint(0, 2)))
+                    stream = lexer.IndentLexer(engine=engine).relex(stream, start, end, text)
+                    expected = lexer.IndentLexer(engine=engine).tokenize(stream.data)
+                    with self.subTest(engine=engine, seed=seed, edit=(start, end, text)):
+                        self.assertEqual([(tok.type, tok.value, tok.lineno, tok.lexpos, tok.column) for tok in stream.tokens],
+                                         [(tok.type, tok.value, tok.lineno, tok.lexpos, tok.column) for tok in expected.tokens])
+
+class IncrementalParseTest(unittest.TestCase):
+    """
+    After random edits, the AST updated by reparse() must be the one of a full parse of the edited source (None if it
+    has syntax errors)
+    """
+
+    def test_random_edits(self):
+        rnd = random.Random(0)
+        for engine in ('yacc', 'descent'):
+            for seed in range(30):
+                parsed = parser.parse_incremental(random_statements(15, seed), lexer.IndentLexer(engine='scanner'),
+                                                  engine=engine)
+                for _ in range(5):
+                    data = parsed.stream.data
+                    start = rnd.randint(0, len(data))
+                    end = min(len(data), start + rnd.choice([0, 0, 1, 2, 4]))
+                    text = ''.join(rnd.choice(EDIT_PIECES) for _ in range(rnd.randint(0, 2)))
+                    parsed = parser.reparse(parsed, start, end, text, lexer.IndentLexer(engine='scanner'), engine=engine)
+
+                    diagnostics = Diagnostics()
+                    expected = parser.parse(parsed.stream.data, lexer.IndentLexer(engine='scanner'), diagnostics,
+                                            engine=engine)
+                    if any(record.stage == 'parser' for record in diagnostics):
+                        expected = None
+                    # The symbol IDs are not compared: the identifiers are interned in the order the lexer meets them
+                    with self.subTest(engine=engine, seed=seed, edit=(start, end, text)):
+                        self.assertEqual(parsed.program, expected)
+
+class CodecTest(unittest.TestCase):
+    """The AST decoded from its encoding, or read from the parse cache, must be the parsed one"""
+
+    corpus = [synthetic_program(50, seed) for seed in range(5)] + [random_statements(40, seed) for seed in range(50)]
+
+    def test_round_trip(self):
+        for source in self.corpus:
+            tree = parser.parse(source, diagnostics=Diagnostics())
+            if tree is None:
+                continue
+            with self.subTest(source=source[:60]):
+                self.assertEqual(flat(ast_codec.decode(ast_codec.encode(tree))), flat(tree))
+
+    def test_deep_round_trip(self):
+        # Deeper than the recursion limit. Compared through the encoding: the dataclass equality is recursive
+        deep = parser.Number(0)
+        for index in range(5000):
+            deep = parser.BinOp(deep, '+', parser.Number(index)) if index % 2 else parser.UnaryOp('-', deep)
+        data = ast_codec.encode([parser.PrintStat(deep)])
+        self.assertEqual(ast_codec.encode(ast_codec.decode(data)), data)
+
+    def test_parse_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ[ast_codec.CACHE_ENV] = directory
+            try:
+                for source in self.corpus[:10]:
+                    expected = parser.parse(source, diagnostics=Diagnostics())
+                    if expected is None:
+                        continue
+                    with self.subTest(source=source[:60]):
+                        # A miss, then a hit
+                        self.assertEqual(flat(ast_codec.parse_cached(source)), flat(expected))
+                        self.assertEqual(flat(ast_codec.parse_cached(source)), flat(expected))
+            finally:
+                del os.environ[ast_codec.CACHE_ENV]
+
+def messages(analyzer, tree):
+    """Semantic errors of a tree analyzed by the given analyzer"""
+    analyzer.analyze(tree)
+    return analyzer.diagnostics.messages()
+
+class LazyBodiesTest(unittest.TestCase):
+    """With the function bodies parsed lazily, the check must report the errors of an eager parse"""
+
+    def check(self, source, lazy):
+        diagnostics = Diagnostics()
+        program = parser.parse(source, lexer.IndentLexer(engine='scanner'), diagnostics, engine='descent', lazy=lazy)
+        SemanticAnalyzer(diagnostics).analyze(program)
+        return diagnostics.messages()
+
+    def test_same_errors(self):
+        # Valid programs, and programs with semantic errors in called and uncalled functions
+        for seed in range(10):
+            source = library_program(30, 0.3, seed)
+            broken = source.replace("    return p\n", "    return p + 's'\n", seed + 1)
+            for program in (source, broken):
+                with self.subTest(seed=seed, broken=program is broken):
+                    self.assertEqual(self.check(program, True), self.check(program, False))
+
+class SharedNodesTest(unittest.TestCase):
+    """parse(share=True) must build a tree equal to the plain one, with the same JavaScript"""
+
+    def test_shared_trees(self):
+        for engine in ('yacc', 'descent'):
+            for source in [synthetic_program(100, seed) for seed in range(5)] + ParserEnginesTest.valid[10:40]:
+                plain = parser.parse(source, lexer.IndentLexer(engine='scanner'), Diagnostics(), engine=engine)
+                if plain is None:
+                    continue
+                shared = parser.parse(source, lexer.IndentLexer(engine='scanner'), Diagnostics(), engine=engine,
+                                      share=True)
+                with self.subTest(engine=engine, source=source[:60]):
+                    self.assertEqual(flat(shared), flat(plain))
+                    self.assertEqual(CodeGenerator().generate(shared), CodeGenerator().generate(plain))
+
+# Walkers compared in recursive and iterative mode: their results on a tree
+WALKERS = {
+    'semantic': lambda tree, iterative: messages(SemanticAnalyzer(Diagnostics(), iterative=iterative), tree),
+    'semantic_static': lambda tree, iterative: messages(semantic_static.SemanticAnalyzer(Diagnostics(), iterative=iterative),
+                                                        tree),
+    'codegen': lambda tree, iterative: CodeGenerator(iterative=iterative).generate(tree),
+}
+
+class WalkersTest(unittest.TestCase):
+    """The iterative walkers must give the results of the recursive ones, on ordinary and on deep (but not too deep) trees"""
+
+    corpus = ParserEnginesTest.valid[:60] + [
+        "a = 1\nx = " + " + ".join(["a"] * 200) + "\nprint(x)\n",
+        "a = 1\nx = " + "-" * 200 + "a\nprint(x)\n",
+        "a = 1\n" + "".join(f"{' ' * level}if a < {level}:\n" for level in range(60)) + f"{' ' * 60}a = a + 1\nprint(a)\n",
+    ]
+
+    def test_iterative_walkers(self):
+        for source in self.corpus:
+            tree = parser.parse(source, diagnostics=Diagnostics())
+            if tree is None:
+                continue
+            for name, walker in WALKERS.items():
+                with self.subTest(walker=name, source=source[:60]):
+                    self.assertEqual(walker(tree, True), walker(tree, False))
+
+class AnalysisOptionsTest(unittest.TestCase):
+    """
+    The options of SemanticAnalyzer must not change the errors: a shared inference cache and a profile never do, a budget
+    reports a subset of them, and the same ones when it neither widens a function nor cuts a call
+    """
+
+    corpus = [library_program(20, 0.5, seed) for seed in range(10)] + [random_statements(30, seed) for seed in range(40)]
+    trees = None
+
+    def setUp(self):
+        if AnalysisOptionsTest.trees is None:
+            trees = [parser.parse(source, diagnostics=Diagnostics()) for source in self.corpus]
+            AnalysisOptionsTest.trees = [tree for tree in trees if tree is not None]
+
+    def test_inference_cache(self):
+        # Filled by the other programs of the corpus too
+        shared = InferenceCache()
+        for index, tree in enumerate(self.trees):
+            with self.subTest(program=index):
+                expected = messages(SemanticAnalyzer(Diagnostics()), tree)
+                self.assertEqual(messages(SemanticAnalyzer(Diagnostics(), inference_cache=shared), tree), expected)
+                self.assertEqual(messages(SemanticAnalyzer(Diagnostics(), inference_cache=shared), tree), expected)
+        self.assertGreater(shared.hits, 0)
+
+    def test_budget(self):
+        for index, tree in enumerate(self.trees):
+            budget = AnalysisBudget(max_specializations=2, max_visits=50, max_depth=3)
+            bounded = messages(SemanticAnalyzer(Diagnostics(), budget=budget), tree)
+            unbounded = messages(SemanticAnalyzer(Diagnostics()), tree)
+            with self.subTest(program=index):
+                self.assertLessEqual(set(bounded), set(unbounded))
+                if not budget.widened and not budget.cut:
+                    self.assertEqual(bounded, unbounded)
+
+    def test_profile(self):
+        for index, tree in enumerate(self.trees):
+            for iterative in (False, True):
+                with self.subTest(program=index, iterative=iterative):
+                    self.assertEqual(messages(SemanticAnalyzer(Diagnostics(), iterative=iterative,
+                                                               profile=AnalysisProfile()), tree),
+                                     messages(SemanticAnalyzer(Diagnostics(), iterative=iterative), tree))
+
+class IncrementalAnalyzerTest(unittest.TestCase):
+    """
+    After every edit of a function body or of a call argument (applied with reparse()), IncrementalAnalyzer must report
+    the errors of a new SemanticAnalyzer on the whole program
+    """
+
+    def test_edits(self):
+        functions = 50
+        rnd = random.Random(0)
+        parsed = parser.parse_incremental(library_program(functions, 1.0), lexer.IndentLexer(engine='scanner'))
+        analyzer = IncrementalAnalyzer()
+        analyzer.analyze(parsed.program)
+        for index in range(40):
+            data = parsed.stream.data
+            target = rnd.randrange(functions)
+            if index % 2 == 0:
+                # The last line of the body returns p, p * 2 or p + 's' (an error)
+                start = data.index("    return p", data.index(f"def lib{target}(p):"))
+                end = data.index("\n", start)
+                text = rnd.choice(["    return p", "    return p * 2", "    return p + 's'"])
+            else:
+                start = data.index(f"print(lib{target}(") + len(f"print(lib{target}(")
+                end = data.index(")", start)
+                text = rnd.choice([str(target), "'s'", "True"])
+            parsed = parser.reparse(parsed, start, end, text, lexer.IndentLexer(engine='scanner'))
+
+            analyzer.analyze(parsed.program)
+            with self.subTest(edit=index):
+                self.assertEqual(analyzer.diagnostics.messages(),
+                                 messages(SemanticAnalyzer(Diagnostics()), parsed.program))
+
+class ParallelCodegenTest(unittest.TestCase):
+    """generate_parallel() must return the code of generate_arena(), whatever the number of workers"""
+
+    def test_parallel_code(self):
+        corpus = [random_statements(40, seed) for seed in range(20)] + [library_program(30, 0.2, seed) for seed in range(5)]
+        with ProcessPoolExecutor(2) as pool:
+            for source in corpus:
+                # A function assigning a global declared before it
+                arena = parser.parse("a = 0\n" + source + "def last(p):\n    a = p\n    return a\n",
+                                     diagnostics=Diagnostics(), arena=True)
+                if arena is None:
+                    continue
+                serial = CodeGenerator().generate_arena(arena)
+                for workers in (2, 3):
+                    with self.subTest(workers=workers, source=source[:60]):
+                        self.assertEqual(CodeGenerator().generate_parallel(arena, workers, pool), serial)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -57,7 +57,7 @@ def run_manual_test():
 
     # Print final symbol table state
     print("--- FINAL SYMBOL TABLE STATE ---")
-    global_scope = analyzer.symbol_table[0]
+    global_scope = analyzer.symbol_table.scope(0)
     
     for name, value in global_scope.items():
         if isinstance(value, dict) and value.get('tag') == 'function':
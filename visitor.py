@@ -0,0 +1,234 @@
+from operator import attrgetter
+
+"""
+Base class of the tree walkers (the semantic analyzers, the code generator and the AST visualizer).
+Instead of testing every node against a chain of class patterns, a walker declares one handler method per node class
+with the @handles decorator, and visit() finds the handler of a node with a single lookup in a dispatch table built
+once for every walker class.
+The handlers of the nodes with children are written once, as generators (declared with @steps) that yield the children
+to visit and receive their results. walk() runs them with an explicit stack, so the depth of the tree is limited only by
+the memory. visit() runs them with run_steps, recursing in Python for every child, so the depth of the tree is bounded
+by the recursion limit.
+Resuming a generator for every child costs about as much as visiting it, so the most frequent nodes can also have a
+plain recursive handler for visit() (declared with @visits), which applies the same rule as their generator (a helper
+method called by both) to the results of self.visit on the children.
+The same dispatch tables walk an ast_arena.Arena (visit_arena() and walk_arena()): its nodes are indices, dispatched on
+their kind ID (ast_arena.KIND) instead of their class.
+"""
+
+def handles(*keys):
+    """
+    Marks a method of a Visitor as the handler of the given node classes.
+    A key can also be a (class, operator) pair: the method then handles only the nodes of that class (BinOp, UnaryOp)
+    with that operator, the other ones go to the handler of the class, if any.
+    An int key is the kind ID of the arena nodes handled by the method, which receives their index.
+    """
+    def mark(method):
+        method.handles = getattr(method, 'handles', ()) + keys
+        return method
+    return mark
+
+def steps(*keys):
+    """
+    Marks a generator method as the handler of the given node classes, with the same keys of @handles.
+    Instead of visiting a child, the generator yields it and receives its result: 'value_type = yield node.value'.
+    The method can also return the generator of another method (e.g. a rule shared by several node classes).
+    """
+    def mark(method):
+        method.steps = getattr(method, 'steps', ()) + keys
+        return method
+    return mark
+
+def visits(*keys):
+    """
+    Marks a method as the handler of the given node classes in visit() only, with the same keys of @handles: unlike a
+    @handles handler it visits the children itself (calling self.visit, or self.visit_arena), so the same classes must
+    also have a generator of steps, which walk() runs instead.
+    A subclass that redefines the generator (or the handler) of a class drops the inherited @visits handler of the class.
+    """
+    def mark(method):
+        method.visits = getattr(method, 'visits', ()) + keys
+        return method
+    return mark
+
+def run_steps(steps, visit):
+    """
+    Runs a generator of steps recursively: every node it yields is visited with visit and its result is sent back.
+    An exception raised by visit is thrown into the generator, as if it had called visit itself.
+    - Returns the value returned by the generator
+    """
+    send = steps.send
+    try:
+        node = next(steps)
+        while True:
+            try:
+                value = visit(node)
+            except Exception as e:
+                node = steps.throw(e)
+            else:
+                node = send(value)
+    except StopIteration as stop:
+        return stop.value
+
+def recursive(method, visit_name):
+    """
+    Handler of visit() (or of visit_arena()) for a generator of steps: the generator is run as in run_steps, visiting
+    the children with the method of the walker named visit_name
+    """
+    get_visit = attrgetter(visit_name)
+    def handler(self, node):
+        steps = method(self, node)
+        visit, send = get_visit(self), steps.send
+        try:
+            child = next(steps)
+            while True:
+                try:
+                    value = visit(child)
+                except Exception as e:
+                    child = steps.throw(e)
+                else:
+                    child = send(value)
+        except StopIteration as stop:
+            return stop.value
+    return handler
+
+class DispatchTable(dict):
+    """
+    Node class (or arena kind ID) -> handler. A class without a handler takes the one of its closest base class (as a
+    class pattern would match it), or the fallback: the result is stored, so it is searched only once.
+    """
+    def __init__(self, handlers, fallback):
+        super().__init__(handlers)
+        self.fallback = fallback
+
+    def __missing__(self, cls):
+        bases = cls.__mro__[1:] if isinstance(cls, type) else ()
+        handler = next((self[base] for base in bases if base in self), self.fallback)
+        self[cls] = handler
+        return handler
+
+def operator_dispatch(operators, default):
+    """Handler of a class with handlers for single operators: the operator of the node selects one of them"""
+    def dispatch(self, node, *args):
+        return operators.get(node.op, default)(self, node, *args)
+    return dispatch
+
+def by_class(handlers, fallback):
+    """
+    Handlers by node class from handlers by key: the (class, operator) keys of a class are merged in one operator_dispatch,
+    with the handler of the class (or the fallback) for the other operators
+    """
+    by_key, operators = {}, {}
+    for key, handler in handlers.items():
+        if isinstance(key, tuple):
+            node_class, op = key
+            operators.setdefault(node_class, {})[op] = handler
+        else:
+            by_key[key] = handler
+
+    for node_class, by_op in operators.items():
+        by_key[node_class] = operator_dispatch(by_op, by_key.get(node_class, fallback))
+    return by_key
+
+class Visitor:
+    """
+    visit(node) calls the handler of the class of the node. Nodes without a handler go to generic_visit, which raises.
+    The handlers (and inherited ones) are collected when the subclass is created, in the class attributes 'dispatch'
+    (used by visit) and 'step_dispatch' (used by walk).
+    A class has either a handler (@handles), which must not visit other nodes, or a generator of steps (@steps). Both
+    are used by visit() and walk(): a class with both takes the handler in visit(), as a faster path. A class with a
+    generator can also have a recursive handler (@visits), used by visit() instead of the generator.
+    visit_arena(index) and walk_arena(index) are the same for the node at the given index of self.arena.
+    """
+    arena = None  # ast_arena.Arena walked by visit_arena() and walk_arena()
+    dispatch = DispatchTable({}, None)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        handlers, generators = cls.collect('handles'), cls.collect('steps')
+        visitors = cls.collect('visits', overridden_by=('handles', 'steps'))
+        missing = [key for key in visitors if key not in generators]
+        if missing:
+            raise TypeError(f"{cls.__name__}: @visits handlers without a generator of steps: {missing}")
+
+        visit_handlers = {key: recursive(generator, 'visit_arena' if isinstance(key, int) else 'visit')
+                          for key, generator in generators.items()}
+        visit_handlers.update(handlers)
+        visit_handlers.update(visitors)
+        cls.dispatch = DispatchTable(by_class(visit_handlers, cls.generic_visit), cls.generic_visit)
+
+        step_handlers = {key: (handler, False) for key, handler in by_class(handlers, cls.generic_visit).items()}
+        step_handlers.update((key, (generator, True))
+                             for key, generator in by_class(generators, cls.generic_visit).items())
+        cls.step_dispatch = DispatchTable(step_handlers, (cls.generic_visit, False))
+
+    @classmethod
+    def collect(cls, mark, overridden_by=()):
+        """
+        Methods marked with the given decorator ('handles', 'steps' or 'visits'), by key (node class, (class, operator)
+        pair or kind ID). A key marked in a class with one of the decorators in overridden_by drops the methods
+        inherited for that key.
+        """
+        handlers = {}
+        # From the base classes to cls, so a subclass overrides the handlers it redefines
+        for klass in reversed(cls.__mro__):
+            methods = vars(klass).values()
+            for other in overridden_by:
+                for method in methods:
+                    for key in getattr(method, other, ()):
+                        handlers.pop(key, None)
+            for method in methods:
+                for key in getattr(method, mark, ()):
+                    handlers[key] = method
+        return handlers
+
+    def visit(self, node):
+        return self.dispatch[node.__class__](self, node)
+
+    def visit_arena(self, index):
+        return self.dispatch[self.arena.kinds[index]](self, index)
+
+    def walk(self, node, kinds=None):
+        """
+        Same as visit(node) without recursion, so the depth of the tree is limited only by the memory.
+        The generators of the nodes being visited are kept on a stack: the one on top is resumed with the result of the
+        last visited node until it yields the next node, or returns the result of its own node.
+        With kinds (the kind IDs of an arena) the nodes are arena indices, dispatched on their kind.
+        """
+        table = self.step_dispatch
+        stack = []
+        while True:
+            handler, nested = table[node.__class__ if kinds is None else kinds[node]]
+            gen = value = error = None
+            try:
+                if nested:
+                    gen = handler(self, node)
+                else:
+                    value = handler(self, node)
+            except Exception as e:
+                error = e
+
+            # Resumes the generators waiting for a result (or an exception) until one of them yields the next node
+            while True:
+                if gen is None:
+                    if not stack:
+                        if error is not None:
+                            raise error
+                        return value
+                    gen = stack.pop()
+                try:
+                    node = gen.send(value) if error is None else gen.throw(error)
+                except StopIteration as stop:
+                    gen, value, error = None, stop.value, None
+                except Exception as e:
+                    gen, error = None, e
+                else:
+                    stack.append(gen)
+                    break
+
+    def walk_arena(self, index):
+        """Same as visit_arena(index) without recursion"""
+        return self.walk(index, self.arena.kinds)
+
+    def generic_visit(self, node, *args):
+        raise Exception(f"Unknown AST node: '{node}'")